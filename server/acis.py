@@ -0,0 +1,277 @@
+"""
+Shared HTTP client for the NOAA RCC-ACIS web services (StnData, StnMeta, ...)
+
+One pooled client is opened on app startup and closed on shutdown so every ACIS call reuses
+keep-alive connections. ACIS queries are read-only, so transient failures are retried with
+jittered exponential backoff.
+
+stream_array() yields the rows of a large response (e.g. a 25-year StnData "data" array) as they
+arrive, so memory stays flat no matter how long the requested date range is.
+
+Every attempt is recorded in metrics: its latency, outcome (HTTP status or "error") and bytes.
+
+Set ACIS_BASE_URL to point the app at a local ACIS stand-in, or pass a custom httpx transport
+to start_client() in tests.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+
+import metrics
+
+ACIS_BASE_URL = os.environ.get("ACIS_BASE_URL", "https://data.rcc-acis.org")
+
+# connection pool
+MAX_CONNECTIONS = 16
+MAX_KEEPALIVE_CONNECTIONS = 8
+KEEPALIVE_EXPIRY = 30.0
+DEFAULT_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 10.0
+
+# retry policy
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client = None
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+async def start_client(base_url: str = None, transport: httpx.AsyncBaseTransport = None):
+    """
+    Open the shared client. Called from the app startup hook
+    """
+    global _client
+    if _client is not None:
+        return _client
+    _client = httpx.AsyncClient(
+        base_url=base_url or ACIS_BASE_URL,
+        timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        http2=transport is None and _http2_available(),
+        transport=transport
+    )
+    return _client
+
+async def close_client():
+    """
+    Close the shared client. Called from the app shutdown hook
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def get_client():
+    # scripts and tests that never ran the startup hook get a client on first use
+    if _client is None:
+        await start_client()
+    return _client
+
+def _record(path: str, started: float, outcome: str, num_bytes: int = 0):
+    # one request attempt; outcome is the HTTP status, or "error" when no response completed
+    metrics.acisRequests.labels(path, outcome).inc()
+    metrics.acisRequestDuration.labels(path).observe(time.perf_counter() - started)
+    if num_bytes:
+        metrics.acisResponseBytes.labels(path).inc(num_bytes)
+
+def _backoff(attempt: int):
+    # "full jitter": sleep anywhere between 0 and the capped exponential delay
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+async def post(path: str, body: dict, timeout: float = None):
+    """
+    POST a JSON query to an ACIS endpoint (e.g. "/StnData") and return the decoded response
+    Retries transport errors and 429/5xx responses up to MAX_RETRIES times
+    """
+    client = await get_client()
+    request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=body, timeout=request_timeout)
+            _record(path, started, str(response.status_code), response.num_bytes_downloaded)
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
+                response.raise_for_status()
+                return response.json()
+            reason = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            _record(path, started, "error")
+            if attempt >= MAX_RETRIES:
+                raise
+            reason = repr(e)
+        delay = _backoff(attempt)
+        attempt += 1
+        metrics.acisRetries.labels(path).inc()
+        print(f"ACIS {path} failed ({reason}), retry {attempt}/{MAX_RETRIES} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+class ArrayStreamParser:
+    """
+    Incrementally pull the elements of one array member (e.g. "data") out of a streamed top-level
+    JSON object. Other members (e.g. "meta", "error") are decoded whole into `members`.
+    feed() returns the elements completed by each chunk of text.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.members = {}
+        self.found = False
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._member = None
+
+    def _skip_whitespace(self):
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else None
+
+    def _decode(self, final: bool):
+        # a value ending exactly at the buffer end may be a truncated number; wait for more text
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            return False, None
+        if end == len(self._buffer) and not final:
+            return False, None
+        self._pos = end
+        return True, value
+
+    def feed(self, text: str, final: bool = False) -> list:
+        self._buffer += text
+        elements = []
+        while True:
+            char = self._skip_whitespace()
+            if char is None:
+                break
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError("ACIS response is not a JSON object")
+                self._pos += 1
+                self._state = "key"
+            elif self._state == "key":
+                if char == ",":
+                    self._pos += 1
+                    continue
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                done, key = self._decode(final)
+                if not done:
+                    break
+                self._member = key
+                self._state = "colon"
+            elif self._state == "colon":
+                if char != ":":
+                    raise ValueError("Malformed ACIS response")
+                self._pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                if self._member == self.key and char == "[":
+                    self._pos += 1
+                    self.found = True
+                    self._state = "elements"
+                    continue
+                done, value = self._decode(final)
+                if not done:
+                    break
+                self.members[self._member] = value
+                self._state = "key"
+            elif self._state == "elements":
+                if char == ",":
+                    self._pos += 1
+                    continue
+                if char == "]":
+                    self._pos += 1
+                    self._state = "key"
+                    continue
+                done, element = self._decode(final)
+                if not done:
+                    break
+                elements.append(element)
+            else:
+                # trailing text after the closing brace
+                self._pos = len(self._buffer)
+        # drop consumed text so the buffer only holds the element being received
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        return elements
+
+    def close(self) -> list:
+        elements = self.feed("", final=True)
+        if self._state != "done":
+            raise ValueError("Truncated ACIS response")
+        if not self.found:
+            raise ValueError(self.members.get("error") or f"ACIS response has no '{self.key}' array")
+        return elements
+
+async def stream_array(path: str, body: dict, key: str = "data", timeout: float = None, members: dict = None):
+    """
+    POST a JSON query to an ACIS endpoint and yield the elements of the response's `key` array as
+    they are received. Other top-level members (e.g. "meta") are copied into `members` if given.
+    Failures before the first element is yielded are retried like post(); later ones are raised.
+    """
+    client = await get_client()
+    request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+    attempt = 0
+    yielded = False
+    while True:
+        started = time.perf_counter()
+        response = None
+        complete = False
+        try:
+            async with client.stream("POST", path, json=body, timeout=request_timeout) as response:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
+                    response.raise_for_status()
+                    parser = ArrayStreamParser(key)
+                    async for text in response.aiter_text():
+                        for element in parser.feed(text):
+                            if members is not None and not yielded:
+                                members.update(parser.members)
+                            yielded = True
+                            yield element
+                    for element in parser.close():
+                        yielded = True
+                        yield element
+                    complete = True
+                    if members is not None:
+                        members.update(parser.members)
+                    return
+                reason = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            if attempt >= MAX_RETRIES or yielded:
+                raise
+            reason = repr(e)
+        finally:
+            # timed until the body is consumed; a 2xx body cut short counts as an error
+            if response is None or (response.is_success and not complete):
+                _record(path, started, "error", response.num_bytes_downloaded if response is not None else 0)
+            else:
+                _record(path, started, str(response.status_code), response.num_bytes_downloaded)
+        delay = _backoff(attempt)
+        attempt += 1
+        metrics.acisRetries.labels(path).inc()
+        print(f"ACIS {path} failed ({reason}), retry {attempt}/{MAX_RETRIES} in {delay:.2f}s")
+        await asyncio.sleep(delay)
@@ -0,0 +1,121 @@
+"""
+Local stand-in for the RCC-ACIS web services, serving the synthetic fixtures in benchmarks.synthetic
+
+Answers POST /StnData (sid, sDate, eDate), POST /MultiStnData (sids, sDate, eDate) and POST
+/StnMeta (state or bbox) for every capital's station, so ingestion and station lookups can be
+exercised without touching NOAA. --latency-ms adds a fixed delay before each response to mimic a
+remote server. Each response also counts towards GET /requests, so a run can check how many
+round trips ingestion made.
+
+Run from the server directory, then point the app at it with ACIS_BASE_URL:
+    python -m benchmarks.fake_acis --port 8790
+    ACIS_BASE_URL=http://127.0.0.1:8790 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+
+from fastapi import FastAPI, Request, Response
+
+from benchmarks import synthetic
+
+MISSING_ROW = [["M", synthetic.OBSERVATION_TIME]] * 9
+
+def create_app(latency_ms: float = 0) -> FastAPI:
+    app = FastAPI()
+    stations = synthetic.stations()
+    request_counts = {}
+
+    def reply(payload: dict) -> Response:
+        return Response(json.dumps(payload, separators=(",", ":")), media_type="application/json")
+
+    async def delay(request: Request):
+        request_counts[request.url.path] = request_counts.get(request.url.path, 0) + 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    def parse_window(body: dict):
+        try:
+            return datetime.date.fromisoformat(body["sDate"]), datetime.date.fromisoformat(body["eDate"])
+        except (KeyError, ValueError):
+            return None
+
+    @app.post("/StnData")
+    async def stn_data(request: Request):
+        body = await request.json()
+        await delay(request)
+        sid = body.get("sid")
+        station = stations.get(sid)
+        if station is None:
+            return reply({"error": f"unknown sid {sid}"})
+        window = parse_window(body)
+        if window is None:
+            return reply({"error": "bad sDate/eDate"})
+        start, end = window
+        rows = synthetic.stn_data_rows(sid, station["lat"], start, end)
+        return reply({
+            "meta": {"state": station["state"], "sids": [sid], "uid": station["uid"], "name": station["city"]},
+            "data": rows
+        })
+
+    @app.post("/MultiStnData")
+    async def multi_stn_data(request: Request):
+        body = await request.json()
+        await delay(request)
+        window = parse_window(body)
+        if window is None:
+            return reply({"error": "bad sDate/eDate"})
+        start, end = window
+        data = []
+        for sid in body.get("sids", "").split(","):
+            station = stations.get(sid)
+            if station is None:
+                continue
+            rows = {row[0]: row[1:] for row in synthetic.stn_data_rows(sid, station["lat"], start, end)}
+            if not rows:
+                continue
+            # like ACIS: no dates in the rows, one row per day from sDate to eDate, missing outside the fixture
+            days = (end - start).days + 1
+            data.append({
+                "meta": {"name": station["city"], "state": station["state"], "sids": [sid], "uid": station["uid"]},
+                "data": [
+                    rows.get((start + datetime.timedelta(days=offset)).isoformat(), MISSING_ROW)
+                    for offset in range(days)
+                ]
+            })
+        return reply({"data": data})
+
+    @app.get("/requests")
+    async def get_requests():
+        return request_counts
+
+    @app.post("/StnMeta")
+    async def stn_meta(request: Request):
+        body = await request.json()
+        await delay(request)
+        states = set(body["state"].split(",")) if body.get("state") else None
+        bbox = [float(value) for value in body["bbox"].split(",")] if body.get("bbox") else None
+        meta = []
+        for sid, station in stations.items():
+            if states is not None and station["state"] not in states:
+                continue
+            if bbox is not None:
+                west, south, east, north = bbox
+                if not (west <= station["lon"] <= east and south <= station["lat"] <= north):
+                    continue
+            meta.append(synthetic.station_meta(station, sid))
+        return reply({"meta": meta})
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local ACIS stand-in serving synthetic fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every response")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms), host=args.host, port=args.port, log_level="warning")
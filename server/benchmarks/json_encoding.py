@@ -0,0 +1,113 @@
+"""
+CPU cost of encoding a 366-day /weather/year JSON body, FastAPI's way against the prebuilt path
+
+Builds one leap year of days in a CitySeries (no database), then times each path with
+time.process_time over --requests encodings:
+
+- jsonable_encoder: what returning the list from the endpoint costs, i.e. FastAPI's
+  jsonable_encoder followed by JSONResponse.render
+- prebuilt_json:    formats.encode_json with the standard json fallback
+- prebuilt_orjson:  formats.encode_json with orjson (skipped when it isn't installed)
+
+Every path starts from series.recordsAt, so the timings differ only in serialization. The bodies
+are checked to decode to the same document before anything is timed.
+
+Run from the server directory:
+    python -m benchmarks.json_encoding [--requests 2000] [--climatology]
+"""
+
+import argparse
+import datetime
+import json
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import formats
+from db.cache import CitySeries
+
+YEAR = 2024
+
+def build_series() -> CitySeries:
+    rng = np.random.default_rng(7)
+    start = datetime.date(YEAR, 1, 1).toordinal()
+    days = datetime.date(YEAR, 12, 31).toordinal() - start + 1
+    maxTemp = rng.integers(0, 100, days).astype(np.int16)
+    minTemp = (maxTemp - rng.integers(1, 25, days)).astype(np.int16)
+    precip = np.where(rng.random(days) < 0.3, rng.integers(1, 150, days), 0).astype(np.int16)
+    return CitySeries(
+        "Anchorage, AK", ["ANCthr 9"], np.arange(start, start + days, dtype=np.int32),
+        np.zeros(days, dtype=np.int16), minTemp, maxTemp, precip
+    )
+
+def with_climatology(data: list) -> list:
+    # the two extra floats serve_days adds per day for ?climatology=true
+    for day in data:
+        day["departure"] = round(day["maxTemp"] / 7 - 5, 1)
+        day["percentile"] = round(day["minTemp"] / 1.3, 1)
+    return data
+
+def fastapi_body(data: list) -> bytes:
+    return JSONResponse(content=None).render(jsonable_encoder(data))
+
+def json_body(data: list) -> bytes:
+    encoder = formats.orjson
+    formats.orjson = None
+    try:
+        return formats.encode_json(data)
+    finally:
+        formats.orjson = encoder
+
+def orjson_body(data: list) -> bytes:
+    return formats.encode_json(data)
+
+def time_path(encode, records, requests: int) -> dict:
+    started = time.process_time()
+    for _ in range(requests):
+        encode(records())
+    cpu = time.process_time() - started
+    return {"cpu_us_per_request": round(cpu / requests * 1e6, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="encodings timed per path")
+    parser.add_argument("--climatology", action="store_true", help="include the departure/percentile fields")
+    args = parser.parse_args()
+
+    series = build_series()
+    lo, hi = series.bounds(datetime.date(YEAR, 1, 1), datetime.date(YEAR, 12, 31))
+
+    def records():
+        data = series.recordsAt(lo, hi)
+        return with_climatology(data) if args.climatology else data
+
+    paths = {"jsonable_encoder": fastapi_body, "prebuilt_json": json_body}
+    if formats.orjson is not None:
+        paths["prebuilt_orjson"] = orjson_body
+    expected = json.loads(fastapi_body(records()))
+    for name, encode in paths.items():
+        if json.loads(encode(records())) != expected:
+            raise SystemExit(f"{name} produced a different document")
+
+    started = time.process_time()
+    for _ in range(args.requests):
+        records()
+    build_us = (time.process_time() - started) / args.requests * 1e6
+
+    results = {name: time_path(encode, records, args.requests) for name, encode in paths.items()}
+    baseline = results["jsonable_encoder"]["cpu_us_per_request"]
+    for result in results.values():
+        result["serialize_us_per_request"] = round(result["cpu_us_per_request"] - build_us, 1)
+        result["cpu_reduction"] = round(1 - result["cpu_us_per_request"] / baseline, 3)
+    print(json.dumps({
+        "days": hi - lo,
+        "requests": args.requests,
+        "body_bytes": len(fastapi_body(records())),
+        "records_us_per_request": round(build_us, 1),
+        "paths": results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
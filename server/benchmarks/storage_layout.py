@@ -0,0 +1,153 @@
+"""
+Compare the legacy weatherByDay layout with the clustered one produced by db.migrations
+
+Builds a synthetic legacy database (51 cities x 25 years by default), copies it, migrates the
+copy, then reports file sizes and timings for random one-year range scans on each.
+
+Run from the server directory:
+    python -m benchmarks.storage_layout [--cities 51] [--years 25] [--scans 2000]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from db import migrations
+
+START_YEAR = 2000
+
+LEGACY_SCHEMA = [
+    'CREATE TABLE "weatherByDay" (id INTEGER NOT NULL, city VARCHAR, station_id VARCHAR, date DATE, '
+    '"minTemp" NUMERIC, "maxTemp" NUMERIC, precipitation NUMERIC(5, 2), PRIMARY KEY (id))',
+    'CREATE INDEX "ix_weatherByDay_id" ON "weatherByDay" (id)',
+    'CREATE INDEX "ix_weatherByDay_city" ON "weatherByDay" (city)',
+    'CREATE INDEX "ix_weatherByDay_date" ON "weatherByDay" (date)',
+]
+
+LEGACY_YEAR_QUERY = (
+    'SELECT id, city, station_id, date, "minTemp", "maxTemp", precipitation FROM "weatherByDay" '
+    'WHERE date >= ? AND date <= ? AND city = ? ORDER BY date'
+)
+
+CLUSTERED_YEAR_QUERY = (
+    'SELECT w.date, s.sid, w."minTemp", w."maxTemp", w."precipHundredths" FROM "weatherByDay" w '
+    'JOIN station s ON s.id = w.station_key '
+    'WHERE w.city_key = (SELECT id FROM city WHERE name = ?) AND w.date >= ? AND w.date <= ? '
+    'ORDER BY w.date'
+)
+
+def build_legacy_db(path: str, cities: int, years: int):
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    start = datetime.date(START_YEAR, 1, 1)
+    end = datetime.date(START_YEAR + years, 1, 1)
+    # the original ingest wrote one city at a time, so rows arrive city-major like a real backfill
+    for cityIndex in range(cities):
+        city = f"City {cityIndex:02d}, ST"
+        station_id = f"{100000 + cityIndex} 2"
+        rows = []
+        day = start
+        while day < end:
+            high = rng.randint(10, 100)
+            rows.append((
+                city, station_id, day.isoformat(), high - rng.randint(5, 30), high,
+                rng.choice([0.0, 0.0, 0.0, 0.01, round(rng.random(), 2)])
+            ))
+            day += datetime.timedelta(days=1)
+        conn.executemany(
+            'INSERT INTO "weatherByDay" (city, station_id, date, "minTemp", "maxTemp", precipitation) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+    conn.commit()
+    conn.close()
+
+def time_scans(conn, query_args: list) -> dict:
+    timings = []
+    rows = 0
+    for run in query_args:
+        started = time.perf_counter()
+        rows += len(run())
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "scans": len(timings),
+        "rows": rows,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p99_ms": timings[int(len(timings) * 0.99)] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=51)
+    parser.add_argument("--years", type=int, default=25)
+    parser.add_argument("--scans", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="weatherquilt-bench-")
+    try:
+        legacy_path = os.path.join(workdir, "legacy.db")
+        clustered_path = os.path.join(workdir, "clustered.db")
+        build_legacy_db(legacy_path, args.cities, args.years)
+        # VACUUM both so sizes compare layouts rather than insert fragmentation
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("VACUUM")
+        conn.close()
+        shutil.copyfile(legacy_path, clustered_path)
+
+        conn = sqlite3.connect(clustered_path)
+        started = time.perf_counter()
+        migrations.migrateWeatherByDayLayout(conn)
+        migration_seconds = time.perf_counter() - started
+        conn.close()
+
+        rng = random.Random(7)
+        picks = [
+            (f"City {rng.randrange(args.cities):02d}, ST", START_YEAR + rng.randrange(args.years))
+            for _ in range(args.scans)
+        ]
+
+        legacy = sqlite3.connect(legacy_path)
+        legacy_scans = time_scans(legacy, [
+            (lambda city=city, year=year: legacy.execute(
+                LEGACY_YEAR_QUERY, (f"{year}-01-01", f"{year}-12-31", city)
+            ).fetchall())
+            for city, year in picks
+        ])
+        legacy.close()
+
+        clustered = sqlite3.connect(clustered_path)
+        clustered_scans = time_scans(clustered, [
+            (lambda city=city, year=year: clustered.execute(
+                CLUSTERED_YEAR_QUERY,
+                (city, datetime.date(year, 1, 1).toordinal(), datetime.date(year, 12, 31).toordinal())
+            ).fetchall())
+            for city, year in picks
+        ])
+        clustered.close()
+
+        legacy_bytes = os.path.getsize(legacy_path)
+        clustered_bytes = os.path.getsize(clustered_path)
+        print(json.dumps({
+            "cities": args.cities,
+            "years": args.years,
+            "migration_seconds": round(migration_seconds, 3),
+            "legacy": {"db_bytes": legacy_bytes, "year_scan": legacy_scans},
+            "clustered": {"db_bytes": clustered_bytes, "year_scan": clustered_scans},
+            "size_ratio": round(clustered_bytes / legacy_bytes, 3),
+            "year_scan_speedup": round(legacy_scans["mean_ms"] / clustered_scans["mean_ms"], 2),
+        }, indent=2))
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+End-to-end benchmark suite: ingest throughput, read latency and peak memory
+
+Builds a scratch working directory, writes synthetic StnData seed files for every capital
+(51 cities x 25 years by default, see benchmarks.synthetic), bulk loads them with db.seedDB,
+then starts benchmarks.fake_acis and the app (uvicorn main:app) as subprocesses, with the app's
+ACIS_BASE_URL pointed at the stand-in and the nightly sync turned off. It measures:
+
+- ingest: rows/s for the seed load and for the fetch endpoints (fetch-all-cities, fetch-city,
+  sync and fetch-all), timed server side from each job's start to finish
+- latency: p50/p90/p99 of /weather/year, /weather/month and /weather/cities over random
+  cities and periods, after one warm-up pass
+- memory: peak RSS of the seed loader and of the app process
+
+Results are written as JSON. --compare checks them against an earlier run and exits non-zero if
+any throughput, latency or memory figure got worse by more than --tolerance.
+
+Run from the server directory:
+    python -m benchmarks.suite [--years 25] [--requests 500] [--output bench.json]
+    python -m benchmarks.suite --compare bench-main.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import synthetic
+from db.cities import US_CAPITALS
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_TIMEOUT = 60.0
+JOB_TIMEOUT = 1800.0
+JOB_POLL_SECONDS = 0.2
+DEFAULT_TOLERANCE = 0.2
+
+# figures compared by --compare, and whether bigger is better
+HIGHER_IS_BETTER = ("rows_per_second",)
+LOWER_IS_BETTER = ("p50_ms", "p99_ms", "peak_rss_bytes")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def peak_rss_bytes(pid: int):
+    # VmHWM: the process's peak resident set size (Linux only)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def children_peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def prepare_workdir(workdir: str):
+    # the app resolves db/ and static/ relative to its working directory
+    os.makedirs(os.path.join(workdir, "db"))
+    os.makedirs(os.path.join(workdir, "static", "static"))
+    with open(os.path.join(workdir, "static", "index.html"), "w") as f:
+        f.write("<html></html>")
+
+def subprocess_env(**extra) -> dict:
+    env = dict(os.environ, PYTHONPATH=SERVER_DIR, PYTHONUNBUFFERED="1")
+    env.update(extra)
+    return env
+
+def wait_for_http(url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {STARTUP_TIMEOUT}s")
+
+def rate(rows: int, seconds: float) -> dict:
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None
+    }
+
+def bench_seed(workdir: str, cities, start: datetime.date, end: datetime.date) -> dict:
+    seed_dir = os.path.join(workdir, "seed")
+    paths = synthetic.write_seed_files(seed_dir, start, end, cities)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "db.seedDB", *paths],
+        cwd=workdir, env=subprocess_env(), capture_output=True, text=True
+    )
+    seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"seeding failed:\n{result.stderr}")
+    # last line: "seeded <rows> days from <files> files in <seconds>s"
+    rows = int(result.stdout.strip().splitlines()[-1].split()[1])
+    shutil.rmtree(seed_dir)
+    return dict(rate(rows, seconds), files=len(paths), peak_rss_bytes=children_peak_rss_bytes())
+
+def run_job(client: httpx.Client, path: str, params: dict) -> dict:
+    """
+    Queue an ingestion job and wait for it; rows/s over the job's own started_at..finished_at
+    """
+    response = client.post(path, params=params)
+    response.raise_for_status()
+    job_id = response.json()["id"]
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"job {job_id} ({path}) did not finish within {JOB_TIMEOUT}s")
+        time.sleep(JOB_POLL_SECONDS)
+    progress = job["progress"]
+    rows = progress["records_added"] + progress["records_updated"]
+    seconds = 0.0
+    if job["started_at"] and job["finished_at"]:
+        seconds = (
+            datetime.datetime.fromisoformat(job["finished_at"]) - datetime.datetime.fromisoformat(job["started_at"])
+        ).total_seconds()
+    return dict(rate(rows, seconds), status=job["status"], cities=progress["cities"], failed=progress["failed"])
+
+def bench_fetch_all(client: httpx.Client) -> dict:
+    # the one synchronous fetch endpoint: every Anchorage day since 2000 in one request
+    started = time.perf_counter()
+    response = client.get("/weather/fetch-all")
+    seconds = time.perf_counter() - started
+    response.raise_for_status()
+    return rate(response.json()["total_processed"], seconds)
+
+def percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+def time_requests(client: httpx.Client, requests: list) -> dict:
+    timings = []
+    errors = 0
+    for path, params in requests:
+        started = time.perf_counter()
+        response = client.get(path, params=params)
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors += 1
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p90_ms": round(percentile(timings, 0.9) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "max_ms": round(timings[-1] * 1000, 3),
+    }
+
+def bench_latency(client: httpx.Client, cities: list, first_year: int, last_year: int, count: int) -> dict:
+    rng = random.Random(42)
+    # one warm-up pass loads every city's series, so the timed requests measure the steady state
+    for city in cities:
+        client.get(f"/weather/year/{last_year}", params={"city": city})
+
+    def year_request():
+        return f"/weather/year/{rng.randint(first_year, last_year)}", {"city": rng.choice(cities)}
+
+    def month_request():
+        return f"/weather/month/{rng.randint(first_year, last_year)}/{rng.randint(1, 12)}", {"city": rng.choice(cities)}
+
+    return {
+        "year": time_requests(client, [year_request() for _ in range(count)]),
+        "month": time_requests(client, [month_request() for _ in range(count)]),
+        "cities": time_requests(client, [("/weather/cities", {}) for _ in range(count)]),
+    }
+
+def run(args) -> dict:
+    today = datetime.date.today()
+    first_year = today.year - args.years
+    last_year = today.year - 1
+    cities = sorted(US_CAPITALS)[:args.cities]
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "cities": len(cities),
+            "years": args.years,
+            "first_year": first_year,
+            "last_year": last_year,
+            "requests": args.requests,
+            "fetch_years": args.fetch_years,
+            "acis_latency_ms": args.acis_latency_ms,
+        },
+    }
+
+    workdir = tempfile.mkdtemp(prefix="weatherquilt-suite-")
+    processes = []
+    try:
+        prepare_workdir(workdir)
+        print(f"seeding {len(cities)} cities x {args.years} years", file=sys.stderr)
+        seed = bench_seed(workdir, cities, datetime.date(first_year, 1, 1), datetime.date(last_year, 12, 31))
+        seed_peak_rss = seed.pop("peak_rss_bytes")
+
+        acis_port, app_port = free_port(), free_port()
+        acis = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_acis", "--port", str(acis_port),
+             "--latency-ms", str(args.acis_latency_ms)],
+            cwd=SERVER_DIR, env=subprocess_env()
+        )
+        processes.append(acis)
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning"],
+            cwd=workdir, stdout=subprocess.DEVNULL,
+            env=subprocess_env(ACIS_BASE_URL=f"http://127.0.0.1:{acis_port}", WEATHER_NIGHTLY_SYNC_HOUR_UTC="24")
+        )
+        processes.append(app)
+        wait_for_http(f"http://127.0.0.1:{acis_port}/docs", acis)
+        wait_for_http(f"http://127.0.0.1:{app_port}/healthcheck", app)
+
+        with httpx.Client(base_url=f"http://127.0.0.1:{app_port}", timeout=JOB_TIMEOUT) as client:
+            print("measuring read latency", file=sys.stderr)
+            latency = bench_latency(client, cities, first_year, last_year, args.requests)
+
+            print("measuring ingest", file=sys.stderr)
+            ingest = {"seed": seed}
+            # every capital, the last fetch_years years: rewrites stored days, adds this year's
+            ingest["fetch_all_cities"] = run_job(client, "/weather/fetch-all-cities", {
+                "start_year": today.year - args.fetch_years + 1
+            })
+            # one city's whole history
+            ingest["fetch_city"] = run_job(client, "/weather/fetch-city", {
+                "city": cities[0], "start_year": first_year
+            })
+            # delta sync once everything is current: the per-city overhead of a no-op night
+            ingest["sync"] = run_job(client, "/weather/sync", {})
+            ingest["fetch_all"] = bench_fetch_all(client)
+
+        results["ingest"] = ingest
+        results["latency"] = latency
+        results["memory"] = {
+            "seed_peak_rss_bytes": seed_peak_rss,
+            "app_peak_rss_bytes": peak_rss_bytes(app.pid),
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def _figures(results: dict, prefix: str = ""):
+    # (dotted name, value, higher_is_better) for every comparable figure in a results dict
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _figures(value, f"{name}.")
+        elif isinstance(value, (int, float)):
+            if any(name.endswith(suffix) for suffix in HIGHER_IS_BETTER):
+                yield name, value, True
+            elif any(name.endswith(suffix) for suffix in LOWER_IS_BETTER):
+                yield name, value, False
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Rows of (name, baseline, current, relative change, regressed) for figures in both runs
+    """
+    previous = {name: value for name, value, _ in _figures(baseline)}
+    rows = []
+    for name, value, higher_is_better in _figures(results):
+        before = previous.get(name)
+        if not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better else change
+        rows.append((name, before, value, change, worse > tolerance))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=len(US_CAPITALS), help="capitals seeded and queried")
+    parser.add_argument("--years", type=int, default=25, help="years of history seeded per city")
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per read endpoint")
+    parser.add_argument("--fetch-years", type=int, default=2, help="years fetched by the fetch-all-cities job")
+    parser.add_argument("--acis-latency-ms", type=float, default=0, help="delay added by the fake ACIS server")
+    parser.add_argument("--output", help="results file (default: bench-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative regression before --compare fails")
+    args = parser.parse_args()
+
+    results = run(args)
+    output = args.output or f"bench-{results['commit'] or 'local'}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("parameters") != results["parameters"]:
+            print(f"warning: {args.compare} was run with different parameters: {baseline.get('parameters')}")
+        rows = compare(results, baseline, args.tolerance)
+        regressions = [row for row in rows if row[4]]
+        for name, before, value, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:45} {before:>14.3f} -> {value:>14.3f} {change:+8.1%}{flag}")
+        if regressions:
+            print(f"{len(regressions)} figures regressed by more than {args.tolerance:.0%} "
+                  f"against {args.compare} ({baseline.get('commit')})")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
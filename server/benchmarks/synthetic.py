@@ -0,0 +1,137 @@
+"""
+Deterministic synthetic ACIS data for the benchmark suite
+
+Each station's daily series is generated from FIXTURE_EPOCH to FIXTURE_HORIZON with a random
+generator seeded by its sid, so any date range of it is identical whoever asks: the seed files
+written by write_seed_files() and the rows served by benchmarks.fake_acis agree day for day.
+Temperatures follow a latitude-dependent seasonal cycle with day-to-day noise; precipitation is
+mostly dry days with occasional trace (T) and missing (M) values, like real StnData responses.
+"""
+
+import datetime
+import functools
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+from db.cities import US_CAPITALS
+
+FIXTURE_EPOCH = datetime.date(1990, 1, 1)
+FIXTURE_HORIZON = datetime.date(datetime.date.today().year + 1, 12, 31)
+
+MISSING_TEMPERATURE_RATE = 0.005
+WET_DAY_RATE = 0.3
+TRACE_RATE = 0.05
+MISSING_PRECIPITATION_RATE = 0.01
+
+# StnData rows carry nine [value, obs time] pairs in NOAA_ELEMS order (see main.NOAA_ELEMS)
+OBSERVATION_TIME = 24
+
+def _seed(sid: str) -> int:
+    return zlib.crc32(sid.encode())
+
+@functools.lru_cache(maxsize=None)
+def station_series(sid: str, lat: float):
+    """
+    (maxt, mint, pcpn) string arrays for every day from FIXTURE_EPOCH to FIXTURE_HORIZON
+    """
+    rng = np.random.default_rng(_seed(sid))
+    days = FIXTURE_HORIZON.toordinal() - FIXTURE_EPOCH.toordinal() + 1
+    day_of_year = (np.arange(days) + FIXTURE_EPOCH.timetuple().tm_yday - 1) % 365.25
+    annual_mean = 75 - 0.9 * (lat - 25)
+    amplitude = 8 + 0.7 * max(lat - 20, 0)
+    mean = annual_mean - amplitude * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    # day-to-day persistence, so warm and cold spells last a few days
+    noise = np.empty(days)
+    shocks = rng.normal(0, 4, days)
+    noise[0] = shocks[0]
+    for i in range(1, days):
+        noise[i] = 0.6 * noise[i - 1] + shocks[i]
+    spread = np.clip(rng.normal(18, 5, days), 2, 40)
+    maxt = np.round(mean + noise + spread / 2).astype(int)
+    mint = np.round(mean + noise - spread / 2).astype(int)
+
+    wet = rng.random(days) < WET_DAY_RATE
+    amounts = np.round(rng.gamma(0.7, 0.35, days), 2)
+    pcpn = np.where(wet & (amounts >= 0.01), np.char.mod("%.2f", amounts), "0.00")
+    pcpn = np.where(rng.random(days) < TRACE_RATE, "T", pcpn)
+    pcpn = np.where(rng.random(days) < MISSING_PRECIPITATION_RATE, "M", pcpn)
+
+    maxt_text = maxt.astype(str).astype(object)
+    mint_text = mint.astype(str).astype(object)
+    missing = rng.random(days) < MISSING_TEMPERATURE_RATE
+    maxt_text[missing] = "M"
+    return maxt_text, mint_text, pcpn.astype(object)
+
+def stn_data_rows(sid: str, lat: float, start: datetime.date, end: datetime.date) -> list:
+    """
+    StnData "data" rows for [start, end], clipped to the fixture span
+    """
+    start = max(start, FIXTURE_EPOCH)
+    end = min(end, FIXTURE_HORIZON)
+    if start > end:
+        return []
+    maxt, mint, pcpn = station_series(sid, lat)
+    lo = start.toordinal() - FIXTURE_EPOCH.toordinal()
+    hi = end.toordinal() - FIXTURE_EPOCH.toordinal() + 1
+    rows = []
+    for offset, high, low, precip in zip(range(lo, hi), maxt[lo:hi], mint[lo:hi], pcpn[lo:hi]):
+        day = datetime.date.fromordinal(FIXTURE_EPOCH.toordinal() + offset)
+        average = "M" if high == "M" else f"{(int(high) + int(low)) / 2:.1f}"
+        rows.append([
+            day.isoformat(),
+            [high, OBSERVATION_TIME], [low, OBSERVATION_TIME], [average, OBSERVATION_TIME],
+            ["0.0", OBSERVATION_TIME], ["0", OBSERVATION_TIME], ["0", OBSERVATION_TIME],
+            [precip, OBSERVATION_TIME], ["0.0", 0], ["0", 0]
+        ])
+    return rows
+
+def stations(cities=None) -> dict:
+    """
+    sid -> {"city", "lat", "lon", "state", "uid"} for the capitals' stations
+    """
+    result = {}
+    for uid, (city, info) in enumerate(sorted(US_CAPITALS.items()), start=1):
+        if cities is not None and city not in cities:
+            continue
+        result[info["station_id"]] = {
+            "city": city,
+            "lat": info["lat"],
+            "lon": info["lon"],
+            "state": city.rsplit(", ", 1)[1],
+            "uid": uid
+        }
+    return result
+
+def station_meta(station: dict, sid: str) -> dict:
+    # one StnMeta "meta" entry
+    return {
+        "uid": station["uid"],
+        "name": f"{station['city']} benchmark station",
+        "state": station["state"],
+        "sids": [sid],
+        "ll": [station["lon"], station["lat"]],
+        "valid_daterange": [
+            [FIXTURE_EPOCH.isoformat(), ""], [FIXTURE_EPOCH.isoformat(), ""], [FIXTURE_EPOCH.isoformat(), ""]
+        ]
+    }
+
+def write_seed_files(directory: str, start: datetime.date, end: datetime.date, cities=None) -> list:
+    """
+    One StnData JSON file per capital for [start, end], in the format db.seedDB loads
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for sid, station in stations(cities).items():
+        slug = re.sub(r"[^a-z0-9]+", "_", station["city"].lower()).strip("_")
+        path = os.path.join(directory, f"noaa_{slug}.json")
+        with open(path, "w") as f:
+            json.dump({
+                "meta": {"state": station["state"], "sids": [sid], "uid": station["uid"], "name": station["city"]},
+                "data": stn_data_rows(sid, station["lat"], start, end)
+            }, f, separators=(",", ":"))
+        paths.append(path)
+    return paths
@@ -0,0 +1,145 @@
+"""
+Vectorized daily climatology over a city's stored series
+
+For every calendar day (Feb 29 included) this computes smoothed normals of the daily mean, min and
+max temperature and percentile thresholds of the daily mean, pooling all years within
++/- SMOOTHING_HALF_WINDOW days. Each stored day also gets its departure from normal and its
+percentile rank. Everything is built in one NumPy pass per city from the SeriesCache arrays and
+kept until that city's series is reloaded, i.e. until new data is ingested.
+
+Temperatures are whole degrees, so the daily mean is a multiple of 0.5 and percentiles are exact
+mid-ranks read from a per-day histogram instead of sorting each pool.
+"""
+
+import threading
+import weakref
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from db.cache import CitySeries, seriesCache
+
+# days on either side of a calendar day pooled into its normals and percentiles
+SMOOTHING_HALF_WINDOW = 7
+THRESHOLD_PERCENTILES = (10, 25, 50, 75, 90)
+
+# positions in a leap year, so Feb 29 has its own slot and Mar 1 is always day 60
+DAYS_IN_LEAP_YEAR = 366
+_MONTH_OFFSETS = np.array([0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335])
+# date.toordinal() of 1970-01-01, the numpy datetime64 epoch
+_UNIX_EPOCH_ORDINAL = 719163
+
+def calendar_day_index(ordinals: np.ndarray) -> np.ndarray:
+    """
+    0-based day of a leap year (Jan 1 = 0, Feb 29 = 59, Dec 31 = 365) for date ordinals
+    """
+    days = (ordinals.astype(np.int64) - _UNIX_EPOCH_ORDINAL).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    month_index = months.astype(np.int64) % 12
+    day_of_month = (days - months).astype(np.int64)
+    return _MONTH_OFFSETS[month_index] + day_of_month
+
+def _circular_window_sum(values: np.ndarray, half_window: int) -> np.ndarray:
+    # sum over calendar days d-half_window .. d+half_window along axis 0, wrapping at the year end
+    padded = np.concatenate([values[-half_window:], values, values[:half_window]])
+    cumulative = np.cumsum(padded, axis=0)
+    cumulative = np.concatenate([np.zeros_like(cumulative[:1]), cumulative])
+    width = 2 * half_window + 1
+    return cumulative[width:] - cumulative[:-width]
+
+class Climatology:
+    """
+    Per-calendar-day normals/thresholds (length 366) and per-stored-day departure/percentile
+    (aligned with the CitySeries arrays)
+    """
+    __slots__ = (
+        "city", "firstYear", "lastYear", "normalMean", "normalMin", "normalMax",
+        "thresholds", "departure", "percentile"
+    )
+
+    def __init__(self, city, firstYear, lastYear, normalMean, normalMin, normalMax, thresholds, departure, percentile):
+        self.city = city
+        self.firstYear = firstYear
+        self.lastYear = lastYear
+        self.normalMean = normalMean
+        self.normalMin = normalMin
+        self.normalMax = normalMax
+        self.thresholds = thresholds
+        self.departure = departure
+        self.percentile = percentile
+
+def build_climatology(series: CitySeries) -> Climatology:
+    day_index = calendar_day_index(series.ordinals)
+    low = series.minTemp.astype(np.int32)
+    high = series.maxTemp.astype(np.int32)
+    # twice the daily mean keeps everything in integers
+    twice_mean = low + high
+
+    pooled_counts = _circular_window_sum(
+        np.bincount(day_index, minlength=DAYS_IN_LEAP_YEAR).astype(np.float64), SMOOTHING_HALF_WINDOW
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        def smoothed_normal(values):
+            sums = np.bincount(day_index, weights=values, minlength=DAYS_IN_LEAP_YEAR)
+            return _circular_window_sum(sums, SMOOTHING_HALF_WINDOW) / pooled_counts
+
+        normal_mean = smoothed_normal(twice_mean) / 2
+        normal_min = smoothed_normal(low)
+        normal_max = smoothed_normal(high)
+
+        # histogram of the daily mean per calendar day, pooled over the smoothing window
+        offset = int(twice_mean.min())
+        bins = twice_mean - offset
+        bin_count = int(bins.max()) + 1
+        histogram = np.bincount(
+            day_index * bin_count + bins, minlength=DAYS_IN_LEAP_YEAR * bin_count
+        ).reshape(DAYS_IN_LEAP_YEAR, bin_count)
+        pooled = _circular_window_sum(histogram, SMOOTHING_HALF_WINDOW)
+        cumulative = np.cumsum(pooled, axis=1)
+        totals = cumulative[:, -1]
+
+        # mid-rank: values below plus half of the ties
+        below = cumulative[day_index, bins] - pooled[day_index, bins]
+        percentile = (below + 0.5 * pooled[day_index, bins]) / totals[day_index] * 100
+
+        thresholds = np.empty((DAYS_IN_LEAP_YEAR, len(THRESHOLD_PERCENTILES)))
+        for column, q in enumerate(THRESHOLD_PERCENTILES):
+            # first bin whose cumulative count reaches q% of the pool
+            first_bin = (cumulative < (q / 100) * totals[:, None]).sum(axis=1)
+            thresholds[:, column] = np.where(totals > 0, (first_bin + offset) / 2, np.nan)
+
+    return Climatology(
+        series.city,
+        series.dateAt(0).year,
+        series.dateAt(-1).year,
+        normal_mean, normal_min, normal_max, thresholds,
+        (twice_mean / 2 - normal_mean[day_index]).astype(np.float32),
+        percentile.astype(np.float32),
+    )
+
+class ClimatologyCache:
+    """
+    Climatology per loaded CitySeries. Entries are keyed weakly on the series object, so when crud
+    invalidates a city (new data) or the series is evicted, its climatology goes with it
+    """
+
+    def __init__(self):
+        self._entries = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def for_series(self, series: CitySeries) -> Climatology:
+        with self._lock:
+            climatology = self._entries.get(series)
+        if climatology is None:
+            climatology = build_climatology(series)
+            with self._lock:
+                self._entries[series] = climatology
+        return climatology
+
+    def get(self, db: Session, city: str):
+        series = seriesCache.getSeries(db, city)
+        if series is None or len(series.ordinals) == 0:
+            return None, None
+        return series, self.for_series(series)
+
+climatologyCache = ClimatologyCache()
@@ -0,0 +1,175 @@
+"""
+Append-only archive of raw ACIS StnData rows
+
+Every fetched chunk is written once as gzip-compressed JSON under
+<root>/<station>/<year>/<fetched at>-<first day>-<last day>.json.gz, one file per station and
+year the chunk touches, and recorded as one line of <root>/manifest.jsonl. Files are never
+rewritten: a refetch of the same days lands in a new file further down the manifest, and
+replaying the manifest in order (later files win) rebuilds weatherByDay and everything derived
+from it without any NOAA requests.
+
+Run from server/:
+    python -m db.archive rebuild [--fresh]          # reload the database from the archive
+    python -m db.archive import db/noaa_anchorage.json
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from db import crud, migrations, models
+from db.elements import parseDay
+from db.database import engine
+from db.seedDB import loadPragmas, resolveCity, resolveStation
+
+ARCHIVE_ROOT = os.environ.get("WEATHER_ARCHIVE_DIR", "db/archive")
+MANIFEST_NAME = "manifest.jsonl"
+
+# days handed to crud.bulkInsertWeatherByDays at once while replaying the manifest
+REBUILD_BATCH_DAYS = 50000
+
+_manifestLock = threading.Lock()
+
+def _stationDir(stationId: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", stationId).strip("_")
+
+def appendRows(city: str, stationId: str, rows: list, root: str = ARCHIVE_ROOT, fetchedAt: datetime.datetime = None) -> list:
+    """
+    Archive one chunk of raw ACIS rows ([date, [maxt], [mint], ...]), split by year.
+    Returns the manifest entries written
+    """
+    if not rows:
+        return []
+    fetchedAt = fetchedAt or datetime.datetime.utcnow()
+    byYear = {}
+    for row in rows:
+        byYear.setdefault(row[0][:4], []).append(row)
+
+    entries = []
+    for year, yearRows in sorted(byYear.items()):
+        first, last = yearRows[0][0], yearRows[-1][0]
+        relativePath = os.path.join(
+            _stationDir(stationId), year, f"{fetchedAt:%Y%m%dT%H%M%S%f}-{first}-{last}.json.gz"
+        )
+        path = os.path.join(root, relativePath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # "x" refuses to replace an existing file, so archived files stay immutable
+        with gzip.open(path, "xt", encoding="utf-8") as f:
+            json.dump(yearRows, f, separators=(",", ":"))
+        entries.append({
+            "path": relativePath,
+            "city": city,
+            "station_id": stationId,
+            "year": int(year),
+            "first": first,
+            "last": last,
+            "rows": len(yearRows),
+            "bytes": os.path.getsize(path),
+            "fetchedAt": fetchedAt.isoformat()
+        })
+
+    lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+    with _manifestLock:
+        with open(os.path.join(root, MANIFEST_NAME), "a") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+    return entries
+
+def readManifest(root: str = ARCHIVE_ROOT) -> list:
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        # a torn final line from a crash mid-append is ignored; its file is simply not replayed
+        entries = []
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+def readRows(entry: dict, root: str = ARCHIVE_ROOT) -> list:
+    with gzip.open(os.path.join(root, entry["path"]), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+def rebuildFromArchive(root: str = ARCHIVE_ROOT, fresh: bool = False) -> dict:
+    """
+    Replay the manifest into the database in one transaction. fresh clears weatherByDay and its
+    rollups first, so the result is exactly what the archive holds; data versions keep counting
+    up so cached ETags from before the rebuild never match
+    """
+    connection = engine.raw_connection()
+    try:
+        migrations.migrateSchema(connection)
+    finally:
+        connection.close()
+    models.Base.metadata.create_all(bind=engine)
+
+    entries = readManifest(root)
+    written = 0
+    with engine.connect() as connection:
+        with loadPragmas(connection):
+            db = Session(bind=connection)
+            try:
+                if fresh:
+                    for model in (models.WeatherByDay, models.MonthlyRollup, models.YearlyRollup):
+                        db.execute(model.__table__.delete())
+                    db.execute(models.SyncState.__table__.update().values(lastDate=None))
+                batch = []
+                for entry in entries:
+                    batch.extend(
+                        record for record in (
+                            parseDay(row, entry["city"], entry["station_id"]) for row in readRows(entry, root)
+                        ) if record is not None
+                    )
+                    if len(batch) >= REBUILD_BATCH_DAYS:
+                        written += crud.bulkInsertWeatherByDays(db, batch, overwrite=True)
+                        batch = []
+                written += crud.bulkInsertWeatherByDays(db, batch, overwrite=True)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+    return {"files": len(entries), "written": written}
+
+def importFile(path: str, city: str = None, root: str = ARCHIVE_ROOT) -> list:
+    """
+    Archive an existing StnData JSON file (e.g. db/noaa_anchorage.json)
+    """
+    with open(path) as f:
+        fileData = json.load(f)
+    meta = fileData.get("meta") or {}
+    city = city or resolveCity(path, meta)
+    return appendRows(city, resolveStation(city, meta), fileData.get("data", []), root)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raw ACIS archive maintenance")
+    parser.add_argument("--root", default=ARCHIVE_ROOT, help="archive directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="reload the database from the archive")
+    rebuild.add_argument("--fresh", action="store_true", help="clear weatherByDay and rollups first")
+    importer = commands.add_parser("import", help="archive an existing StnData JSON file")
+    importer.add_argument("path")
+    importer.add_argument("--city", help="city the file belongs to")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "rebuild":
+        result = rebuildFromArchive(args.root, fresh=args.fresh)
+        print(f"rebuilt {result['written']} days from {result['files']} archive files "
+              f"in {time.perf_counter() - started:.2f}s")
+    else:
+        entries = importFile(args.path, args.city, args.root)
+        print(f"archived {sum(entry['rows'] for entry in entries)} days from {args.path} "
+              f"into {len(entries)} files")
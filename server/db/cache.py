@@ -0,0 +1,282 @@
+"""
+Process-local columnar cache of each city's full daily series
+
+Historical days never change once ingested, so /weather/year and /weather/month are answered by
+slicing contiguous NumPy arrays instead of running an ORM query per request. Entries are evicted
+least-recently-used once the total array size exceeds the memory budget, and crud invalidates a
+city whenever it writes rows for it.
+
+The cache is per process: with several uvicorn workers, ingestion only invalidates the worker that
+ran it, so run ingestion in the worker that serves reads (or a single worker).
+
+Only the columns every client reads are loaded up front. The other ACIS elements (db.elements)
+are read one column at a time the first time a request asks for them with ?fields=, so clients
+that only want temperatures never scan or hold them.
+"""
+
+import datetime
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import Integer, type_coerce
+from sqlalchemy.orm import Session
+
+import db.models as models
+from db import elements
+
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+# precipHundredths is never negative, so -1 marks a missing value
+MISSING_PRECIP = -1
+# element columns can be negative (departures); their stored values stay well inside int16
+MISSING_ELEMENT = -32768
+
+# the record shape returned without ?fields=, and every field a projection may name
+RECORD_FIELDS = ("city", "station_id", "date", "minTemp", "maxTemp", "precipitation")
+DAY_FIELDS = RECORD_FIELDS + elements.FIELDS
+
+class CitySeries:
+    """
+    One city's days as parallel arrays sorted by date ordinal
+    """
+    __slots__ = (
+        "city", "stations", "ordinals", "stationIndex", "minTemp", "maxTemp", "precipHundredths", "elements",
+        "__weakref__"
+    )
+
+    def __init__(self, city: str, stations: list, ordinals, stationIndex, minTemp, maxTemp, precipHundredths):
+        self.city = city
+        self.stations = stations
+        self.ordinals = ordinals
+        self.stationIndex = stationIndex
+        self.minTemp = minTemp
+        self.maxTemp = maxTemp
+        self.precipHundredths = precipHundredths
+        # element field -> int16 array aligned with ordinals, filled in by SeriesCache.loadElements
+        self.elements = {}
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.ordinals, self.stationIndex, self.minTemp, self.maxTemp, self.precipHundredths)
+        return sum(array.nbytes for array in arrays) + sum(array.nbytes for array in self.elements.values())
+
+    def bounds(self, startDate: datetime.date, endDate: datetime.date):
+        # [lo, hi) indexes of the days in [startDate, endDate]
+        lo = int(np.searchsorted(self.ordinals, startDate.toordinal(), side="left"))
+        hi = int(np.searchsorted(self.ordinals, endDate.toordinal(), side="right"))
+        return lo, hi
+
+    def records(self, startDate: datetime.date, endDate: datetime.date) -> list:
+        """
+        Days in [startDate, endDate] in the same dict shape as crud.getWeatherByDays
+        """
+        lo, hi = self.bounds(startDate, endDate)
+        return self.recordsAt(lo, hi)
+
+    def recordsAt(self, lo: int, hi: int, fields: tuple = None) -> list:
+        """
+        Records for array positions [lo, hi), with only `fields` (see DAY_FIELDS) if given
+        Element fields must have been loaded with SeriesCache.loadElements first
+        """
+        if fields is not None:
+            columns = [self._fieldValues(field, lo, hi) for field in fields]
+            return [dict(zip(fields, values)) for values in zip(*columns)]
+        fromordinal = datetime.date.fromordinal
+        stations = self.stations
+        return [
+            {
+                "city": self.city,
+                "station_id": stations[stationIndex],
+                "date": fromordinal(ordinal),
+                "minTemp": minTemp,
+                "maxTemp": maxTemp,
+                "precipitation": None if precip == MISSING_PRECIP else precip / 100
+            }
+            for ordinal, stationIndex, minTemp, maxTemp, precip in zip(
+                self.ordinals[lo:hi].tolist(),
+                self.stationIndex[lo:hi].tolist(),
+                self.minTemp[lo:hi].tolist(),
+                self.maxTemp[lo:hi].tolist(),
+                self.precipHundredths[lo:hi].tolist()
+            )
+        ]
+
+    def _fieldValues(self, field: str, lo: int, hi: int):
+        # one field's public values for positions [lo, hi)
+        if field == "city":
+            return itertools.repeat(self.city, hi - lo)
+        if field == "station_id":
+            stations = self.stations
+            return [stations[index] for index in self.stationIndex[lo:hi].tolist()]
+        if field == "date":
+            return [datetime.date.fromordinal(ordinal) for ordinal in self.ordinals[lo:hi].tolist()]
+        if field == "minTemp":
+            return self.minTemp[lo:hi].tolist()
+        if field == "maxTemp":
+            return self.maxTemp[lo:hi].tolist()
+        if field == "precipitation":
+            return [None if value == MISSING_PRECIP else value / 100 for value in self.precipHundredths[lo:hi].tolist()]
+        element = elements.ELEMENTS_BY_FIELD[field]
+        values = self.elements[field][lo:hi].tolist()
+        if element.scale == 1:
+            return [None if value == MISSING_ELEMENT else value for value in values]
+        return [None if value == MISSING_ELEMENT else value / element.scale for value in values]
+
+    def dateAt(self, index: int) -> datetime.date:
+        return datetime.date.fromordinal(int(self.ordinals[index]))
+
+def loadCitySeries(db: Session, city: str) -> Optional[CitySeries]:
+    """
+    Read a city's whole series with one primary key scan. Returns None for unknown cities
+    """
+    cityKey = db.query(models.City.id).filter(models.City.name == city).scalar()
+    if cityKey is None:
+        return None
+    rows = db.query(
+        # raw ordinals; skip the per-row date conversion
+        type_coerce(models.WeatherByDay.date, Integer),
+        models.WeatherByDay.station_key,
+        models.WeatherByDay.minTemp,
+        models.WeatherByDay.maxTemp,
+        models.WeatherByDay.precipHundredths
+    ).filter(
+        models.WeatherByDay.city_key == cityKey
+    ).order_by(models.WeatherByDay.date).all()
+
+    stationKeys = sorted({row[1] for row in rows})
+    stations = dict(db.query(models.Station.id, models.Station.sid).filter(models.Station.id.in_(stationKeys)).all())
+    stationPosition = {key: position for position, key in enumerate(stationKeys)}
+
+    count = len(rows)
+    ordinals = np.empty(count, dtype=np.int32)
+    stationIndex = np.empty(count, dtype=np.int16)
+    minTemp = np.empty(count, dtype=np.int16)
+    maxTemp = np.empty(count, dtype=np.int16)
+    precipHundredths = np.empty(count, dtype=np.int16)
+    for i, (ordinal, stationKey, low, high, precip) in enumerate(rows):
+        ordinals[i] = ordinal
+        stationIndex[i] = stationPosition[stationKey]
+        minTemp[i] = low
+        maxTemp[i] = high
+        precipHundredths[i] = MISSING_PRECIP if precip is None else precip
+
+    return CitySeries(
+        city, [stations[key] for key in stationKeys],
+        ordinals, stationIndex, minTemp, maxTemp, precipHundredths
+    )
+
+def loadElementColumns(db: Session, series: CitySeries, fields: list) -> dict:
+    """
+    Read just the date and the named element columns of a city, one primary key scan, as
+    {field: int16 array aligned with series.ordinals}
+    """
+    cityKey = db.query(models.City.id).filter(models.City.name == series.city).scalar()
+    columns = [getattr(models.WeatherByDay, elements.ELEMENTS_BY_FIELD[field].column) for field in fields]
+    rows = db.query(type_coerce(models.WeatherByDay.date, Integer), *columns).filter(
+        models.WeatherByDay.city_key == cityKey
+    ).order_by(models.WeatherByDay.date).all()
+
+    # align by date rather than position: a write may have landed since the series was loaded
+    ordinals = np.fromiter((row[0] for row in rows), dtype=np.int32, count=len(rows))
+    positions = np.minimum(np.searchsorted(series.ordinals, ordinals), max(len(series.ordinals) - 1, 0))
+    matched = series.ordinals[positions] == ordinals if len(series.ordinals) else np.zeros(len(rows), dtype=bool)
+    loaded = {}
+    for offset, field in enumerate(fields, start=1):
+        values = np.fromiter(
+            (MISSING_ELEMENT if row[offset] is None else row[offset] for row in rows), dtype=np.int16, count=len(rows)
+        )
+        column = np.full(len(series.ordinals), MISSING_ELEMENT, dtype=np.int16)
+        column[positions[matched]] = values[matched]
+        loaded[field] = column
+    return loaded
+
+class SeriesCache:
+    """
+    LRU of CitySeries bounded by total array bytes
+    """
+
+    def __init__(self, budgetBytes: int = DEFAULT_BUDGET_BYTES):
+        self.budgetBytes = budgetBytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._totalBytes = 0
+        # bumped on every invalidation so a load that raced a write is not cached
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def getSeries(self, db: Session, city: str) -> Optional[CitySeries]:
+        with self._lock:
+            series = self._entries.get(city)
+            if series is not None:
+                self._entries.move_to_end(city)
+                return series
+            generation = self._generations.get(city, 0)
+
+        series = loadCitySeries(db, city)
+        if series is None:
+            return None
+
+        with self._lock:
+            if self._generations.get(city, 0) == generation and city not in self._entries:
+                self._entries[city] = series
+                self._sizes[city] = series.nbytes
+                self._totalBytes += series.nbytes
+                self._evict()
+        return series
+
+    def loadElements(self, db: Session, series: CitySeries, fields):
+        """
+        Make sure series holds the element columns among `fields`, reading only those not loaded yet
+        """
+        missing = [field for field in fields if field in elements.ELEMENTS_BY_FIELD and field not in series.elements]
+        if not missing:
+            return
+        loaded = loadElementColumns(db, series, missing)
+        with self._lock:
+            for field, column in loaded.items():
+                series.elements.setdefault(field, column)
+            # the entry grew; charge it to the budget if it is still the cached one
+            if self._entries.get(series.city) is series:
+                self._totalBytes += series.nbytes - self._sizes[series.city]
+                self._sizes[series.city] = series.nbytes
+                self._evict()
+
+    def getWeatherByDays(self, db: Session, startDate: datetime.date, endDate: datetime.date, city: str) -> list:
+        series = self.getSeries(db, city)
+        if series is None:
+            return []
+        return series.records(startDate, endDate)
+
+    def invalidateCity(self, city: str):
+        with self._lock:
+            self._generations[city] = self._generations.get(city, 0) + 1
+            if city in self._entries:
+                del self._entries[city]
+                self._totalBytes -= self._sizes.pop(city)
+
+    def clear(self):
+        with self._lock:
+            for city in list(self._entries):
+                self._generations[city] = self._generations.get(city, 0) + 1
+            self._entries.clear()
+            self._sizes.clear()
+            self._totalBytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cities": len(self._entries),
+                "bytes": self._totalBytes,
+                "budget_bytes": self.budgetBytes
+            }
+
+    def _evict(self):
+        # always keep the most recent entry, even if it alone is over budget
+        while self._totalBytes > self.budgetBytes and len(self._entries) > 1:
+            city, _ = self._entries.popitem(last=False)
+            self._totalBytes -= self._sizes.pop(city)
+
+seriesCache = SeriesCache()
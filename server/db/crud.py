@@ -1,31 +1,598 @@
 from sqlalchemy.orm import Session
-from datetime import date
-from typing import Optional
+from sqlalchemy import exists, func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, datetime, timedelta
+import calendar
+from typing import Iterable, Optional
 
 import db.models as models
 import db.schema as schema
+from db import elements
+from db.cache import RECORD_FIELDS, seriesCache
+
+# rows written per transaction by upsertWeatherByDays
+UPSERT_CHUNK_SIZE = 1000
+
+# days with at least this much precipitation count as rain days in the rollups
+RAIN_DAY_HUNDREDTHS = 1
+
+# weatherByDay.date is a day ordinal; adding this gives the julian day SQLite date functions expect
+JULIAN_DAY_OFFSET = 1721424.5
+
+# plain DB-API statements for bulkInsertWeatherByDays; rows are (city_key, date ordinal,
+# station_key, minTemp, maxTemp, precipHundredths, *elements.COLUMNS)
+DAY_COLUMNS = ("city_key", "date", "station_key", "minTemp", "maxTemp", "precipHundredths") + elements.COLUMNS
+BULK_INSERT_DAY_SQL = '''
+INSERT INTO weatherByDay ({columns})
+VALUES ({placeholders})
+ON CONFLICT (city_key, date) DO NOTHING
+'''.format(columns=", ".join(DAY_COLUMNS), placeholders=", ".join("?" * len(DAY_COLUMNS)))
+BULK_UPSERT_DAY_SQL = '''
+INSERT INTO weatherByDay ({columns})
+VALUES ({placeholders})
+ON CONFLICT (city_key, date) DO UPDATE SET
+    {assignments}
+'''.format(
+    columns=", ".join(DAY_COLUMNS),
+    placeholders=", ".join("?" * len(DAY_COLUMNS)),
+    assignments=",\n    ".join(f"{column} = excluded.{column}" for column in DAY_COLUMNS[2:])
+)
+
+REFRESH_MONTHLY_ROLLUP_SQL = text('''
+INSERT INTO "monthlyRollup"
+    (city_key, year, month, days, "rainDays", "precipHundredths", "minTempSum", "maxTempSum", "minTemp", "maxTemp")
+SELECT city_key,
+    CAST(strftime('%Y', date + :julianOffset) AS INTEGER) AS year,
+    CAST(strftime('%m', date + :julianOffset) AS INTEGER) AS month,
+    COUNT(*),
+    SUM(COALESCE("precipHundredths", 0) >= :rainDay),
+    SUM(COALESCE("precipHundredths", 0)),
+    SUM("minTemp"),
+    SUM("maxTemp"),
+    MIN("minTemp"),
+    MAX("maxTemp")
+FROM "weatherByDay"
+WHERE city_key = :cityKey AND date >= :start AND date <= :end
+GROUP BY city_key, year, month
+ON CONFLICT (city_key, year, month) DO UPDATE SET
+    days = excluded.days,
+    "rainDays" = excluded."rainDays",
+    "precipHundredths" = excluded."precipHundredths",
+    "minTempSum" = excluded."minTempSum",
+    "maxTempSum" = excluded."maxTempSum",
+    "minTemp" = excluded."minTemp",
+    "maxTemp" = excluded."maxTemp"
+''')
+
+REFRESH_YEARLY_ROLLUP_SQL = text('''
+INSERT INTO "yearlyRollup"
+    (city_key, year, days, "rainDays", "precipHundredths", "minTempSum", "maxTempSum", "minTemp", "maxTemp")
+SELECT city_key, year,
+    SUM(days), SUM("rainDays"), SUM("precipHundredths"), SUM("minTempSum"), SUM("maxTempSum"),
+    MIN("minTemp"), MAX("maxTemp")
+FROM "monthlyRollup"
+WHERE city_key = :cityKey AND year >= :startYear AND year <= :endYear
+GROUP BY city_key, year
+ON CONFLICT (city_key, year) DO UPDATE SET
+    days = excluded.days,
+    "rainDays" = excluded."rainDays",
+    "precipHundredths" = excluded."precipHundredths",
+    "minTempSum" = excluded."minTempSum",
+    "maxTempSum" = excluded."maxTempSum",
+    "minTemp" = excluded."minTemp",
+    "maxTemp" = excluded."maxTemp"
+''')
+
+def getCityKey(db: Session, city: str) -> Optional[int]:
+    return db.query(models.City.id).filter(models.City.name == city).scalar()
 
 def getWeatherByDay(db: Session, day: date, city: str = "Anchorage, AK"):
-    return db.query(models.WeatherByDay).filter(
+    return db.query(models.WeatherByDay).join(
+        models.City, models.City.id == models.WeatherByDay.city_key
+    ).filter(
         models.WeatherByDay.date == day,
-        models.WeatherByDay.city == city
+        models.City.name == city
     ).first()
 
 # get weather by range of dates
 
 def getWeatherByDays(db: Session, startDate: date, endDate: date, city: str = "Anchorage, AK"):
-    return db.query(models.WeatherByDay).filter(
+    """
+    Days for one city in [startDate, endDate] as plain dicts in the public WeatherByDay shape,
+    read with a single primary key range scan
+    """
+    cityKey = getCityKey(db, city)
+    if cityKey is None:
+        return []
+    rows = db.query(
+        models.WeatherByDay.date,
+        models.Station.sid,
+        models.WeatherByDay.minTemp,
+        models.WeatherByDay.maxTemp,
+        models.WeatherByDay.precipHundredths
+    ).join(
+        models.Station, models.Station.id == models.WeatherByDay.station_key
+    ).filter(
+        models.WeatherByDay.city_key == cityKey,
         models.WeatherByDay.date >= startDate,
-        models.WeatherByDay.date <= endDate,
-        models.WeatherByDay.city == city
+        models.WeatherByDay.date <= endDate
     ).order_by(models.WeatherByDay.date).all()
+    return [
+        {
+            "city": city,
+            "station_id": sid,
+            "date": day,
+            "minTemp": minTemp,
+            "maxTemp": maxTemp,
+            "precipitation": _fromHundredths(precipHundredths)
+        }
+        for day, sid, minTemp, maxTemp, precipHundredths in rows
+    ]
+
+def getWeatherSnapshot(db: Session, startDate: date, endDate: date, fields: Optional[tuple] = None) -> list:
+    """
+    Every city's days in [startDate, endDate], ordered by date then city, as dicts with `fields`
+    (see cache.DAY_FIELDS; default the public WeatherByDay shape). The core columns come from the
+    date-first covering index in one range seek; element columns are only read when asked for
+    """
+    fields = fields or RECORD_FIELDS
+    extra = [elements.ELEMENTS_BY_FIELD[field] for field in fields if field in elements.ELEMENTS_BY_FIELD]
+    rows = db.query(
+        models.WeatherByDay.date,
+        models.City.name,
+        models.Station.sid,
+        models.WeatherByDay.minTemp,
+        models.WeatherByDay.maxTemp,
+        models.WeatherByDay.precipHundredths,
+        *(getattr(models.WeatherByDay, element.column) for element in extra)
+    ).join(
+        models.City, models.City.id == models.WeatherByDay.city_key
+    ).join(
+        models.Station, models.Station.id == models.WeatherByDay.station_key
+    ).filter(
+        models.WeatherByDay.date >= startDate,
+        models.WeatherByDay.date <= endDate
+    ).order_by(models.WeatherByDay.date, models.City.name).all()
+    days = []
+    for row in rows:
+        values = {
+            "date": row[0],
+            "city": row[1],
+            "station_id": row[2],
+            "minTemp": row[3],
+            "maxTemp": row[4],
+            "precipitation": _fromHundredths(row[5])
+        }
+        for offset, element in enumerate(extra, start=6):
+            values[element.field] = elements.fromStored(element, row[offset])
+        days.append({field: values[field] for field in fields})
+    return days
 
 def getAvailableCities(db: Session):
-    return db.query(models.WeatherByDay.city).distinct().all()
+    return db.query(models.City.name).filter(
+        exists().where(models.WeatherByDay.city_key == models.City.id)
+    ).all()
 
 def createWeatherByDay(db: Session, data: schema.WeatherByDayCreate):
-    weatherByDay = models.WeatherByDay(**data.dict())
-    db.add(weatherByDay)
+    upsertWeatherByDays(db, [data.dict()])
+    return getWeatherByDay(db, data.date, city=data.city)
+
+def _toHundredths(precipitation) -> Optional[int]:
+    if precipitation is None:
+        return None
+    return int(round(float(precipitation) * 100))
+
+def _fromHundredths(precipHundredths: Optional[int]) -> Optional[float]:
+    if precipHundredths is None:
+        return None
+    return precipHundredths / 100
+
+def _internKeys(db: Session, model, column, values) -> dict:
+    # add any unseen names to a dimension table and return {name: id}
+    values = set(values)
+    stmt = sqlite_insert(model.__table__).on_conflict_do_nothing(index_elements=[column.name])
+    db.execute(stmt, [{column.name: value} for value in values])
+    return dict(db.query(column, model.id).filter(column.in_(values)).all())
+
+def _countExistingDays(db: Session, rows: list) -> int:
+    keys = {(row["city_key"], row["date"]) for row in rows}
+    cityKeys = {cityKey for cityKey, _ in keys}
+    dates = [day for _, day in keys]
+    existing = db.query(models.WeatherByDay.city_key, models.WeatherByDay.date).filter(
+        models.WeatherByDay.city_key.in_(cityKeys),
+        models.WeatherByDay.date >= min(dates),
+        models.WeatherByDay.date <= max(dates)
+    ).all()
+    return len(keys.intersection((cityKey, day) for cityKey, day in existing))
+
+def _advanceSyncState(db: Session, chunk: list):
+    # move each city/station high-water mark forward in the same transaction as the rows
+    latest = {}
+    for record in chunk:
+        key = (record["city"], record["station_id"])
+        if key not in latest or record["date"] > latest[key]:
+            latest[key] = record["date"]
+    table = models.SyncState.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.city, table.c.station_id],
+        set_={
+            "lastDate": func.max(func.coalesce(table.c.lastDate, stmt.excluded.lastDate), stmt.excluded.lastDate)
+        }
+    )
+    db.execute(stmt, [
+        {"city": city, "station_id": station_id, "lastDate": lastDate}
+        for (city, station_id), lastDate in latest.items()
+    ])
+
+def _bumpDataVersions(db: Session, chunk: list):
+    # new version for every city/year touched, committed with the rows themselves
+    table = models.DataVersion.__table__
+    now = datetime.utcnow()
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.city, table.c.year],
+        set_={"version": table.c.version + 1, "updatedAt": stmt.excluded.updatedAt}
+    )
+    db.execute(stmt, [
+        {"city": city, "year": year, "version": 1, "updatedAt": now}
+        for city, year in {(record["city"], record["date"].year) for record in chunk}
+    ])
+
+def refreshRollups(db: Session, cityKey: int, startDate: date, endDate: date):
+    """
+    Recompute the monthly and yearly rollups for every month touching [startDate, endDate].
+    Does not commit; callers run it in the same transaction as the rows it summarises
+    """
+    monthStart = startDate.replace(day=1)
+    monthEnd = endDate.replace(day=calendar.monthrange(endDate.year, endDate.month)[1])
+    db.execute(REFRESH_MONTHLY_ROLLUP_SQL, {
+        "julianOffset": JULIAN_DAY_OFFSET,
+        "rainDay": RAIN_DAY_HUNDREDTHS,
+        "cityKey": cityKey,
+        "start": monthStart.toordinal(),
+        "end": monthEnd.toordinal()
+    })
+    db.execute(REFRESH_YEARLY_ROLLUP_SQL, {
+        "cityKey": cityKey,
+        "startYear": startDate.year,
+        "endYear": endDate.year
+    })
+
+def rebuildRollups(db: Session):
+    """
+    Recompute every rollup from weatherByDay (databases that predate the rollup tables)
+    """
+    spans = db.query(
+        models.WeatherByDay.city_key,
+        func.min(models.WeatherByDay.date),
+        func.max(models.WeatherByDay.date)
+    ).group_by(models.WeatherByDay.city_key).all()
+    for cityKey, startDate, endDate in spans:
+        refreshRollups(db, cityKey, startDate, endDate)
+    db.commit()
+
+def rollupsNeedRebuild(db: Session) -> bool:
+    hasDays = db.query(exists().where(models.WeatherByDay.city_key.isnot(None))).scalar()
+    hasRollups = db.query(exists().where(models.MonthlyRollup.city_key.isnot(None))).scalar()
+    return hasDays and not hasRollups
+
+def _refreshChunkRollups(db: Session, rows: list):
+    spans = {}
+    for row in rows:
+        span = spans.get(row["city_key"])
+        if span is None:
+            spans[row["city_key"]] = [row["date"], row["date"]]
+        elif row["date"] < span[0]:
+            span[0] = row["date"]
+        elif row["date"] > span[1]:
+            span[1] = row["date"]
+    for cityKey, (startDate, endDate) in spans.items():
+        refreshRollups(db, cityKey, startDate, endDate)
+
+def _upsertChunk(db: Session, chunk: list, counts: dict):
+    table = models.WeatherByDay.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.city_key, table.c.date],
+        set_={
+            "station_key": stmt.excluded.station_key,
+            "minTemp": stmt.excluded.minTemp,
+            "maxTemp": stmt.excluded.maxTemp,
+            "precipHundredths": stmt.excluded.precipHundredths,
+            **{column: stmt.excluded[column] for column in elements.COLUMNS}
+        }
+    )
+    try:
+        cityKeys = _internKeys(db, models.City, models.City.name, (record["city"] for record in chunk))
+        stationKeys = _internKeys(db, models.Station, models.Station.sid, (record["station_id"] for record in chunk))
+        rows = [
+            {
+                "city_key": cityKeys[record["city"]],
+                "date": record["date"],
+                "station_key": stationKeys[record["station_id"]],
+                "minTemp": int(record["minTemp"]),
+                "maxTemp": int(record["maxTemp"]),
+                "precipHundredths": _toHundredths(record["precipitation"]),
+                **dict(zip(elements.COLUMNS, elements.storedValues(record)))
+            }
+            for record in chunk
+        ]
+        updated = _countExistingDays(db, rows)
+        db.execute(stmt, rows)
+        _refreshChunkRollups(db, rows)
+        _advanceSyncState(db, chunk)
+        _bumpDataVersions(db, chunk)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for city in cityKeys:
+        seriesCache.invalidateCity(city)
+    counts["updated"] += updated
+    counts["added"] += len({(row["city_key"], row["date"]) for row in rows}) - updated
+
+def bulkInsertWeatherByDays(db: Session, records: list, overwrite: bool = False) -> int:
+    """
+    Load a batch of days with a single DB-API executemany (no per-row SQLAlchemy parameter
+    processing), keeping rollups, sync state and data versions in step.
+    Existing days are left alone unless overwrite is set.
+    Does not commit; bulk loaders call it for many batches inside one transaction.
+    Returns the number of rows written.
+    """
+    if not records:
+        return 0
+    cityKeys = _internKeys(db, models.City, models.City.name, (record["city"] for record in records))
+    stationKeys = _internKeys(db, models.Station, models.Station.sid, (record["station_id"] for record in records))
+    rows = [
+        (
+            cityKeys[record["city"]],
+            record["date"].toordinal(),
+            stationKeys[record["station_id"]],
+            int(record["minTemp"]),
+            int(record["maxTemp"]),
+            _toHundredths(record["precipitation"]),
+            *elements.storedValues(record)
+        )
+        for record in records
+    ]
+    sql = BULK_UPSERT_DAY_SQL if overwrite else BULK_INSERT_DAY_SQL
+    written = db.connection().connection.cursor().executemany(sql, rows).rowcount
+    spans = {}
+    for record in records:
+        span = spans.setdefault(record["city"], [record["date"], record["date"]])
+        span[0] = min(span[0], record["date"])
+        span[1] = max(span[1], record["date"])
+    for city, (startDate, endDate) in spans.items():
+        refreshRollups(db, cityKeys[city], startDate, endDate)
+    _advanceSyncState(db, records)
+    _bumpDataVersions(db, records)
+    for city in cityKeys:
+        seriesCache.invalidateCity(city)
+    return written
+
+def upsertWeatherByDays(db: Session, records: Iterable[Optional[dict]], chunk_size: int = UPSERT_CHUNK_SIZE):
+    """
+    Insert or update a batch of days keyed on (city, date), one transaction per chunk.
+    Each record is a dict with the WeatherByDayCreate fields; None or records without
+    both temperatures are counted as skipped.
+    Returns {"added": n, "updated": n, "skipped": n}.
+    """
+    counts = {"added": 0, "updated": 0, "skipped": 0}
+    chunk = []
+    for record in records:
+        if record is None or record.get("minTemp") is None or record.get("maxTemp") is None:
+            counts["skipped"] += 1
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            _upsertChunk(db, chunk, counts)
+            chunk = []
+    if chunk:
+        _upsertChunk(db, chunk, counts)
+    return counts
+
+def getSyncState(db: Session, city: str, station_id: str):
+    return db.query(models.SyncState).filter(
+        models.SyncState.city == city,
+        models.SyncState.station_id == station_id
+    ).first()
+
+def getSyncStates(db: Session):
+    return db.query(models.SyncState).order_by(models.SyncState.city).all()
+
+def getLastIngestedDate(db: Session, city: str, station_id: str) -> Optional[date]:
+    """
+    Newest stored day for a city/station. Falls back to scanning weatherByDay for data
+    ingested before the syncState table existed
+    """
+    state = getSyncState(db, city, station_id)
+    if state and state.lastDate:
+        return state.lastDate
+    return db.query(func.max(models.WeatherByDay.date)).join(
+        models.City, models.City.id == models.WeatherByDay.city_key
+    ).join(
+        models.Station, models.Station.id == models.WeatherByDay.station_key
+    ).filter(
+        models.City.name == city,
+        models.Station.sid == station_id
+    ).scalar()
+
+def recordSyncAttempt(db: Session, city: str, station_id: str, attemptedAt: datetime, error: Optional[str] = None):
+    table = models.SyncState.__table__
+    values = {"city": city, "station_id": station_id, "lastAttempt": attemptedAt, "lastError": error}
+    if error is None:
+        values["lastSuccess"] = attemptedAt
+    stmt = sqlite_insert(table).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.city, table.c.station_id],
+        set_={key: value for key, value in values.items() if key not in ("city", "station_id")}
+    )
+    db.execute(stmt)
+    db.commit()
+
+def getDataVersions(db: Session, city: Optional[str], startYear: int, endYear: int):
+    # city None returns every city's versions for the years
+    query = db.query(models.DataVersion).filter(
+        models.DataVersion.year >= startYear,
+        models.DataVersion.year <= endYear
+    )
+    if city is not None:
+        query = query.filter(models.DataVersion.city == city)
+    return query.order_by(models.DataVersion.year, models.DataVersion.city).all()
+
+def getRollups(db: Session, period: str, cities: Optional[list] = None, startYear: Optional[int] = None, endYear: Optional[int] = None):
+    """
+    Monthly ("month") or yearly ("year") rollup rows joined to their city name, ordered by city then time
+    """
+    model = models.MonthlyRollup if period == "month" else models.YearlyRollup
+    query = db.query(models.City.name, model).join(models.City, models.City.id == model.city_key)
+    if cities:
+        query = query.filter(models.City.name.in_(cities))
+    if startYear is not None:
+        query = query.filter(model.year >= startYear)
+    if endYear is not None:
+        query = query.filter(model.year <= endYear)
+    order = [models.City.name, model.year]
+    if period == "month":
+        order.append(model.month)
+    return query.order_by(*order).all()
+
+def getCityDataVersion(db: Session, city: str) -> int:
+    # versions only ever increase, so their sum changes whenever any year of the city does
+    return db.query(func.coalesce(func.sum(models.DataVersion.version), 0)).filter(
+        models.DataVersion.city == city
+    ).scalar()
+
+def replaceStationCatalog(db: Session, stations: list, syncedAt: datetime) -> int:
+    """
+    Replace the station catalog with a fresh StnMeta sync in one transaction.
+    Each station is a dict with the StationCatalog columns except syncedAt. Returns the row count.
+    """
+    table = models.StationCatalog.__table__
+    rows = [dict(station, syncedAt=syncedAt) for station in stations]
+    try:
+        db.execute(table.delete())
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            db.execute(sqlite_insert(table).on_conflict_do_nothing(), rows[start:start + UPSERT_CHUNK_SIZE])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+def getStationCatalog(db: Session):
+    return db.query(models.StationCatalog).order_by(models.StationCatalog.uid).all()
+
+def createIngestJob(db: Session, kind: str, dateRanges: dict, concurrency: int, cityTimeout: float, upToDate: Optional[dict] = None):
+    """
+    Queue a job for the cities in dateRanges ({city: (startDate, endDate)}, or {city: [(startDate,
+    endDate), ...]} to fetch several spans of a city). Cities in upToDate ({city: lastDate}) are
+    recorded as already done.
+    """
+    now = datetime.utcnow()
+    job = models.IngestJob(
+        kind=kind,
+        status="queued" if dateRanges else "succeeded",
+        concurrency=concurrency,
+        cityTimeout=cityTimeout,
+        createdAt=now,
+        finishedAt=None if dateRanges else now
+    )
+    db.add(job)
+    db.flush()
+    for city, spans in dateRanges.items():
+        spans = spans if isinstance(spans, list) else [spans]
+        db.add(models.IngestJobCity(
+            job_id=job.id, city=city, status="queued", startDate=spans[0][0], endDate=spans[-1][1],
+            added=0, updated=0, skipped=0, updatedAt=now
+        ))
+        if len(spans) > 1:
+            db.add_all(
+                models.IngestJobRange(job_id=job.id, city=city, startDate=startDate, endDate=endDate)
+                for startDate, endDate in spans
+            )
+    for city, lastDate in (upToDate or {}).items():
+        db.add(models.IngestJobCity(
+            job_id=job.id, city=city, status="up_to_date", endDate=lastDate,
+            added=0, updated=0, skipped=0, updatedAt=now
+        ))
+    db.commit()
+    return job
+
+def getIngestJob(db: Session, jobId: int):
+    return db.query(models.IngestJob).filter(models.IngestJob.id == jobId).first()
+
+def getIngestJobs(db: Session, limit: int = 50):
+    return db.query(models.IngestJob).order_by(models.IngestJob.id.desc()).limit(limit).all()
+
+def getIngestJobCities(db: Session, jobId: int):
+    return db.query(models.IngestJobCity).filter(
+        models.IngestJobCity.job_id == jobId
+    ).order_by(models.IngestJobCity.city).all()
+
+def getIngestJobRanges(db: Session, jobId: int) -> dict:
+    # {city: [(startDate, endDate), ...]} for the job's cities with several spans
+    ranges = {}
+    for jobRange in db.query(models.IngestJobRange).filter(
+        models.IngestJobRange.job_id == jobId
+    ).order_by(models.IngestJobRange.city, models.IngestJobRange.startDate):
+        ranges.setdefault(jobRange.city, []).append((jobRange.startDate, jobRange.endDate))
+    return ranges
+
+def getUnfinishedIngestJobIds(db: Session) -> list:
+    return [jobId for (jobId,) in db.query(models.IngestJob.id).filter(
+        models.IngestJob.status.in_(("queued", "running"))
+    ).order_by(models.IngestJob.id)]
+
+def getLatestIngestJob(db: Session, kind: str):
+    return db.query(models.IngestJob).filter(
+        models.IngestJob.kind == kind
+    ).order_by(models.IngestJob.id.desc()).first()
+
+def updateIngestJob(db: Session, jobId: int, **values):
+    db.query(models.IngestJob).filter(models.IngestJob.id == jobId).update(values)
+    db.commit()
+
+def updateIngestJobCity(db: Session, jobId: int, city: str, counts: Optional[dict] = None, **values):
+    """
+    Set fields of a job's city row; counts ({"added", "updated", "skipped"}) are added to its totals
+    """
+    table = models.IngestJobCity
+    values["updatedAt"] = datetime.utcnow()
+    for key, count in (counts or {}).items():
+        values[key] = getattr(table, key) + count
+    db.query(table).filter(table.job_id == jobId, table.city == city).update(values, synchronize_session=False)
+    db.commit()
+
+def getCheckedGaps(db: Session, city: Optional[str] = None):
+    query = db.query(models.CheckedGap)
+    if city is not None:
+        query = query.filter(models.CheckedGap.city == city)
+    return query.order_by(models.CheckedGap.city, models.CheckedGap.startDate).all()
+
+def replaceCheckedGaps(db: Session, city: str, spans: list, gaps: list, checkedAt: datetime):
+    """
+    Record what a backfill of spans found: within the spans, checked gaps are replaced by gaps
+    (the days still missing there); the parts of older checked gaps outside the spans are kept
+    """
+    table = models.CheckedGap
+    oneDay = timedelta(days=1)
+    for startDate, endDate in spans:
+        overlapping = db.query(table).filter(
+            table.city == city, table.startDate <= endDate, table.endDate >= startDate
+        ).all()
+        for gap in overlapping:
+            db.delete(gap)
+        db.flush()
+        for gap in overlapping:
+            if gap.startDate < startDate:
+                db.add(table(city=city, startDate=gap.startDate, endDate=startDate - oneDay, checkedAt=gap.checkedAt))
+            if gap.endDate > endDate:
+                db.add(table(city=city, startDate=endDate + oneDay, endDate=gap.endDate, checkedAt=gap.checkedAt))
+        db.flush()
+    db.add_all(
+        table(city=city, startDate=startDate, endDate=endDate, checkedAt=checkedAt)
+        for startDate, endDate in gaps
+    )
     db.commit()
-    db.refresh(weatherByDay)
-    return weatherByDay
\ No newline at end of file
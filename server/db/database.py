@@ -1,13 +1,70 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    import aiosqlite  # noqa: F401
+except ImportError:  # async reads are optional
+    AsyncSession = None
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./db/weatherquilt.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./db/weatherquilt.db"
+
+# connections kept open for the read endpoints
+READ_POOL_SIZE = 8
+# how long a writer waits for another writer's transaction before "database is locked"
+BUSY_TIMEOUT_MS = 30000
 
+def _pragmas(*pragmas):
+    def setPragmas(dbapiConnection, connectionRecord):
+        cursor = dbapiConnection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+    return setPragmas
+
+# writes: WAL lets readers keep reading the last committed snapshot while a write transaction
+# is open, and SQLite itself serialises writers (waiting up to BUSY_TIMEOUT_MS for the lock)
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+event.listen(engine, "connect", _pragmas(
+    "journal_mode = WAL", "synchronous = NORMAL", f"busy_timeout = {BUSY_TIMEOUT_MS}"
+))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# reads: a separate pool of query-only connections that never take the write lock
+read_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_SIZE
+)
+event.listen(read_engine, "connect", _pragmas("query_only = ON", f"busy_timeout = {BUSY_TIMEOUT_MS}"))
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# the same read pool over aiosqlite, so async endpoints can read without a threadpool hop
+if AsyncSession is not None:
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=READ_POOL_SIZE,
+        max_overflow=READ_POOL_SIZE
+    )
+    event.listen(async_read_engine.sync_engine, "connect", _pragmas(
+        "query_only = ON", f"busy_timeout = {BUSY_TIMEOUT_MS}"
+    ))
+    AsyncReadSessionLocal = sessionmaker(
+        async_read_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_read_engine = None
+    AsyncReadSessionLocal = None
+
 Base = declarative_base()
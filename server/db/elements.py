@@ -0,0 +1,101 @@
+"""
+ACIS StnData rows parsed into weatherByDay records, and the elements stored beyond minTemp,
+maxTemp and precipitation
+
+parseDay is the one parser for StnData rows: live ingestion, seedDB and the archive replay all use
+it, so a seeded or rebuilt day is stored exactly as a synced one.
+
+main.NOAA_ELEMS asks for maxt, mint, avgt, departure, hdd, cdd, pcpn, snow and snwd, so each
+StnData row is [date, [maxt], [mint], [avgt], [departure], [hdd], [cdd], [pcpn], [snow], [snwd]].
+The other six are kept as nullable SMALLINT columns in weatherByDay, scaled to whole units of
+their resolution like precipHundredths: a missing ("M") or unparseable value is NULL, and a
+trace ("T") is stored as one unit. They are never read unless a request asks for them by name.
+"""
+
+import datetime
+from typing import NamedTuple, Optional
+
+class Element(NamedTuple):
+    # public field name in records and responses
+    field: str
+    # weatherByDay column
+    column: str
+    # position in a StnData row
+    index: int
+    # stored units per public unit
+    scale: int
+
+ELEMENTS = (
+    Element("avgTemp", "avgTempTenths", 3, 10),
+    Element("avgTempDeparture", "departureTenths", 4, 10),
+    Element("hdd", "hdd", 5, 1),
+    Element("cdd", "cdd", 6, 1),
+    Element("snow", "snowTenths", 8, 10),
+    Element("snowDepth", "snowDepth", 9, 1),
+)
+ELEMENTS_BY_FIELD = {element.field: element for element in ELEMENTS}
+FIELDS = tuple(element.field for element in ELEMENTS)
+COLUMNS = tuple(element.column for element in ELEMENTS)
+
+def parseValue(element: Element, value) -> Optional[float]:
+    # one StnData value in public units
+    if value == 'T':
+        return 1 / element.scale
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+def parseElements(day) -> dict:
+    """
+    {field: value} for the extra elements of one StnData row; elements the row lacks are None
+    """
+    values = {}
+    for element in ELEMENTS:
+        try:
+            values[element.field] = parseValue(element, day[element.index][0])
+        except (IndexError, TypeError):
+            values[element.field] = None
+    return values
+
+def toStored(element: Element, value) -> Optional[int]:
+    if value is None:
+        return None
+    return int(round(float(value) * element.scale))
+
+def storedValues(record: dict) -> tuple:
+    # the record's extra elements in COLUMNS order, as stored
+    return tuple(toStored(element, record.get(element.field)) for element in ELEMENTS)
+
+def fromStored(element: Element, value: Optional[int]):
+    if value is None:
+        return None
+    return value if element.scale == 1 else value / element.scale
+
+def parseDay(day, city: str, stationId: str) -> Optional[dict]:
+    """
+    One StnData row as a record for crud.upsertWeatherByDays / crud.bulkInsertWeatherByDays
+    Days with missing temperatures, or that fail to parse, are None so they count as skipped
+    """
+    try:
+        maxTemp = day[1][0]
+        minTemp = day[2][0]
+        precipitation = day[7][0]
+        if maxTemp == 'M' or minTemp == 'M':
+            return None
+        # trace precipitation is stored as one hundredth, missing as zero
+        if precipitation == 'T':
+            precipitation = 0.01
+        elif precipitation == 'M':
+            precipitation = 0.0
+        return {
+            "city": city,
+            "station_id": stationId,
+            "date": datetime.date.fromisoformat(day[0]),
+            "minTemp": int(minTemp),
+            "maxTemp": int(maxTemp),
+            "precipitation": float(precipitation),
+            **parseElements(day)
+        }
+    except (ValueError, TypeError, IndexError):
+        return None
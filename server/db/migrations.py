@@ -0,0 +1,138 @@
+"""
+Schema migrations for existing SQLite databases
+
+Runs on a plain DB-API sqlite3 connection (engine.raw_connection() from the app) so it can also
+be used from scripts without the ORM. migrateSchema() runs every step in order.
+"""
+
+from db import elements
+
+# legacy rows written before city/station were populated (the original seed) are Anchorage
+LEGACY_DEFAULT_CITY = "Anchorage, AK"
+LEGACY_DEFAULT_STATION = "ANCthr 9"
+
+# julianday('0001-01-01') - 1, so julianday(d) - ORDINAL_EPOCH == date.toordinal()
+ORDINAL_EPOCH = 1721424.5
+
+def _columns(conn, table: str):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+def needsWeatherByDayMigration(conn) -> bool:
+    # the legacy layout has a surrogate id and text dates/Numeric values
+    return "id" in _columns(conn, "weatherByDay")
+
+def migrateWeatherByDayLayout(conn, vacuum: bool = True) -> bool:
+    """
+    Convert a legacy weatherByDay table (surrogate id, city/station strings, Numeric values) to the
+    clustered layout in models.WeatherByDay: interned city/station keys, ordinal dates, integer
+    temperatures and precipitation in hundredths, WITHOUT ROWID keyed on (city_key, date).
+    Duplicate (city, date) rows keep the most recently written one.
+    Returns True if a migration ran.
+    """
+    if not needsWeatherByDayMigration(conn):
+        return False
+
+    print("Migrating weatherByDay to the clustered layout...")
+    conn.execute("BEGIN")
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS city ('
+            'id INTEGER NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name))'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS station ('
+            'id INTEGER NOT NULL, sid VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (sid))'
+        )
+        conn.execute(
+            'INSERT OR IGNORE INTO city (name) '
+            'SELECT DISTINCT COALESCE(city, ?) FROM "weatherByDay" ORDER BY 1',
+            (LEGACY_DEFAULT_CITY,)
+        )
+        conn.execute(
+            'INSERT OR IGNORE INTO station (sid) '
+            'SELECT DISTINCT COALESCE(station_id, ?) FROM "weatherByDay" ORDER BY 1',
+            (LEGACY_DEFAULT_STATION,)
+        )
+
+        conn.execute('ALTER TABLE "weatherByDay" RENAME TO "weatherByDay_legacy"')
+        conn.execute(
+            'CREATE TABLE "weatherByDay" ('
+            'city_key SMALLINT NOT NULL, '
+            'date INTEGER NOT NULL, '
+            'station_key SMALLINT NOT NULL, '
+            '"minTemp" SMALLINT, '
+            '"maxTemp" SMALLINT, '
+            '"precipHundredths" SMALLINT, '
+            'PRIMARY KEY (city_key, date), '
+            'FOREIGN KEY(city_key) REFERENCES city (id), '
+            'FOREIGN KEY(station_key) REFERENCES station (id)'
+            ') WITHOUT ROWID'
+        )
+        conn.execute(
+            'INSERT INTO "weatherByDay" '
+            '(city_key, date, station_key, "minTemp", "maxTemp", "precipHundredths") '
+            'SELECT c.id, CAST(julianday(l.date) - ? AS INTEGER), s.id, '
+            'CAST(ROUND(l."minTemp") AS INTEGER), CAST(ROUND(l."maxTemp") AS INTEGER), '
+            'CAST(ROUND(COALESCE(l.precipitation, 0) * 100) AS INTEGER) '
+            'FROM "weatherByDay_legacy" l '
+            'JOIN city c ON c.name = COALESCE(l.city, ?) '
+            'JOIN station s ON s.sid = COALESCE(l.station_id, ?) '
+            'WHERE l.date IS NOT NULL AND l.id IN ('
+            '  SELECT MAX(id) FROM "weatherByDay_legacy" GROUP BY COALESCE(city, ?), date'
+            ') '
+            'ORDER BY c.id, 2',
+            (ORDINAL_EPOCH, LEGACY_DEFAULT_CITY, LEGACY_DEFAULT_STATION, LEGACY_DEFAULT_CITY)
+        )
+        conn.execute('DROP TABLE "weatherByDay_legacy"')
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if vacuum:
+        # give the pages freed by the legacy table and its indexes back to the filesystem
+        conn.execute("VACUUM")
+    print("weatherByDay migration complete")
+    return True
+
+def addWeatherElementColumns(conn) -> bool:
+    """
+    Add the nullable db.elements columns to a weatherByDay table created before they existed.
+    Existing rows read as NULL until re-ingested or rebuilt from the raw archive
+    (python -m db.archive rebuild). Returns True if any column was added.
+    """
+    existing = _columns(conn, "weatherByDay")
+    if not existing:
+        return False
+    missing = [column for column in elements.COLUMNS if column not in existing]
+    for column in missing:
+        conn.execute(f'ALTER TABLE "weatherByDay" ADD COLUMN "{column}" SMALLINT')
+    if missing:
+        conn.commit()
+        print(f"Added weatherByDay columns: {', '.join(missing)}")
+    return bool(missing)
+
+def addDateIndex(conn) -> bool:
+    """
+    Create the date-first covering index of models.WeatherByDay on an existing table
+    Returns True if it was built
+    """
+    if not _columns(conn, "weatherByDay"):
+        return False
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_weatherByDay_date'"
+    ).fetchone()
+    if exists:
+        return False
+    print("Building the weatherByDay date index...")
+    conn.execute(
+        'CREATE INDEX "ix_weatherByDay_date" ON "weatherByDay" '
+        '(date, city_key, station_key, "minTemp", "maxTemp", "precipHundredths")'
+    )
+    conn.commit()
+    return True
+
+def migrateSchema(conn):
+    migrateWeatherByDayLayout(conn)
+    addWeatherElementColumns(conn)
+    addDateIndex(conn)
@@ -1,12 +1,215 @@
-from sqlalchemy import Column, Integer, Numeric, Date, String
+import datetime
+from decimal import Decimal
+
+from sqlalchemy import Column, Integer, SmallInteger, Float, Date, DateTime, String, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from db.database import Base
+from db import elements
+
+class OrdinalDate(TypeDecorator):
+    """
+    Date stored as its proleptic Gregorian ordinal (date.toordinal()) in an INTEGER column,
+    so keys are a few bytes and sort numerically
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return value.toordinal() if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return datetime.date.fromordinal(value) if value is not None else None
+
+class City(Base):
+    __tablename__ = "city"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+class Station(Base):
+    __tablename__ = "station"
+    id = Column(Integer, primary_key=True)
+    sid = Column(String, unique=True, nullable=False)
 
 class WeatherByDay(Base):
+    """
+    One row per city per day, clustered on (city_key, date) in a WITHOUT ROWID table so a
+    city's date range is a single contiguous primary key scan.
+    Temperatures are whole degrees F, precipitation is stored in hundredths of an inch.
+    The remaining ACIS elements (db.elements) are nullable, in tenths or whole units.
+    ix_weatherByDay_date orders the core columns by date first, so every city's values for a
+    date range are one covering index seek (see crud.getWeatherSnapshot).
+    """
     __tablename__ = "weatherByDay"
-    id = Column(Integer, primary_key=True, index=True)
-    city = Column(String, index=True)
+    __table_args__ = (
+        Index("ix_weatherByDay_date", "date", "city_key", "station_key", "minTemp", "maxTemp", "precipHundredths"),
+        {"sqlite_with_rowid": False},
+    )
+    city_key = Column(SmallInteger, ForeignKey("city.id"), primary_key=True)
+    date = Column(OrdinalDate, primary_key=True)
+    station_key = Column(SmallInteger, ForeignKey("station.id"), nullable=False)
+    minTemp = Column(SmallInteger)
+    maxTemp = Column(SmallInteger)
+    precipHundredths = Column(SmallInteger)
+    avgTempTenths = Column(SmallInteger)
+    departureTenths = Column(SmallInteger)
+    hdd = Column(SmallInteger)
+    cdd = Column(SmallInteger)
+    snowTenths = Column(SmallInteger)
+    snowDepth = Column(SmallInteger)
+
+    cityRef = relationship(City, lazy="joined")
+    stationRef = relationship(Station, lazy="joined")
+
+    @property
+    def city(self):
+        return self.cityRef.name
+
+    @property
+    def station_id(self):
+        return self.stationRef.sid
+
+    @property
+    def precipitation(self):
+        if self.precipHundredths is None:
+            return None
+        return Decimal(self.precipHundredths).scaleb(-2)
+
+    @property
+    def avgTemp(self):
+        return elements.fromStored(elements.ELEMENTS_BY_FIELD["avgTemp"], self.avgTempTenths)
+
+    @property
+    def avgTempDeparture(self):
+        return elements.fromStored(elements.ELEMENTS_BY_FIELD["avgTempDeparture"], self.departureTenths)
+
+    @property
+    def snow(self):
+        return elements.fromStored(elements.ELEMENTS_BY_FIELD["snow"], self.snowTenths)
+
+class SyncState(Base):
+    """
+    Ingestion high-water mark per city/station: the newest day stored and the last fetch attempt
+    """
+    __tablename__ = "syncState"
+    city = Column(String, primary_key=True)
+    station_id = Column(String, primary_key=True)
+    lastDate = Column(Date)
+    lastAttempt = Column(DateTime)
+    lastSuccess = Column(DateTime)
+    lastError = Column(String)
+
+class DataVersion(Base):
+    """
+    Counter bumped whenever rows for a city/year are written; drives HTTP ETags for that year
+    """
+    __tablename__ = "dataVersion"
+    city = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(DateTime)
+
+class MonthlyRollup(Base):
+    """
+    Per city/month totals kept in step with weatherByDay by crud on every write.
+    Temperature sums let callers derive means; days counts stored days (missing = calendar days - days).
+    """
+    __tablename__ = "monthlyRollup"
+    __table_args__ = {"sqlite_with_rowid": False}
+    city_key = Column(SmallInteger, ForeignKey("city.id"), primary_key=True)
+    year = Column(SmallInteger, primary_key=True)
+    month = Column(SmallInteger, primary_key=True)
+    days = Column(SmallInteger, nullable=False)
+    rainDays = Column(SmallInteger, nullable=False)
+    precipHundredths = Column(Integer, nullable=False)
+    minTempSum = Column(Integer, nullable=False)
+    maxTempSum = Column(Integer, nullable=False)
+    minTemp = Column(SmallInteger)
+    maxTemp = Column(SmallInteger)
+
+class YearlyRollup(Base):
+    """
+    Per city/year totals, rebuilt from monthlyRollup for the years a write touched
+    """
+    __tablename__ = "yearlyRollup"
+    __table_args__ = {"sqlite_with_rowid": False}
+    city_key = Column(SmallInteger, ForeignKey("city.id"), primary_key=True)
+    year = Column(SmallInteger, primary_key=True)
+    days = Column(SmallInteger, nullable=False)
+    rainDays = Column(SmallInteger, nullable=False)
+    precipHundredths = Column(Integer, nullable=False)
+    minTempSum = Column(Integer, nullable=False)
+    maxTempSum = Column(Integer, nullable=False)
+    minTemp = Column(SmallInteger)
+    maxTemp = Column(SmallInteger)
+
+class StationCatalog(Base):
+    """
+    ACIS station metadata from the last bulk StnMeta sync, with the precomputed coverage score
+    station lookups rank candidates by
+    """
+    __tablename__ = "stationCatalog"
+    uid = Column(Integer, primary_key=True)
+    sid = Column(String, nullable=False)
+    name = Column(String)
+    state = Column(String)
+    lat = Column(Float, nullable=False)
+    lon = Column(Float, nullable=False)
+    startYear = Column(SmallInteger)
+    endYear = Column(SmallInteger)
+    score = Column(SmallInteger, nullable=False)
+    syncedAt = Column(DateTime)
+
+class IngestJob(Base):
+    """
+    A queued or running ingestion (fetch-city, fetch-all-cities, sync, nightly-sync) and its outcome
+    """
+    __tablename__ = "ingestJob"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    concurrency = Column(SmallInteger, nullable=False)
+    cityTimeout = Column(Float, nullable=False)
+    createdAt = Column(DateTime, nullable=False)
+    startedAt = Column(DateTime)
+    finishedAt = Column(DateTime)
+    error = Column(String)
+
+class IngestJobCity(Base):
+    """
+    Per-city progress of an ingestion job, updated as each chunk is written
+    """
+    __tablename__ = "ingestJobCity"
+    job_id = Column(Integer, ForeignKey("ingestJob.id"), primary_key=True)
+    city = Column(String, primary_key=True)
+    status = Column(String, nullable=False)
+    startDate = Column(Date)
+    endDate = Column(Date)
     station_id = Column(String)
-    date = Column(Date, index=True)
-    minTemp = Column(Numeric)
-    maxTemp = Column(Numeric)
-    precipitation = Column(Numeric(5, 2))
+    added = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    updatedAt = Column(DateTime)
+
+class IngestJobRange(Base):
+    """
+    The date spans of a job's city when it fetches more than one (gap backfills); the city's
+    IngestJobCity row then holds the first start and the last end
+    """
+    __tablename__ = "ingestJobRange"
+    job_id = Column(Integer, ForeignKey("ingestJob.id"), primary_key=True)
+    city = Column(String, primary_key=True)
+    startDate = Column(Date, primary_key=True)
+    endDate = Column(Date, nullable=False)
+
+class CheckedGap(Base):
+    """
+    Days a backfill asked ACIS for and still had no usable data afterwards (e.g. missing temperatures),
+    so later backfills don't request them again unless told to recheck
+    """
+    __tablename__ = "checkedGap"
+    city = Column(String, primary_key=True)
+    startDate = Column(Date, primary_key=True)
+    endDate = Column(Date, nullable=False)
+    checkedAt = Column(DateTime, nullable=False)
@@ -10,12 +10,16 @@ class WeatherByDayBase(BaseModel):
     minTemp: int
     maxTemp: int
     precipitation: Decimal
+    avgTemp: Optional[float] = None
+    avgTempDeparture: Optional[float] = None
+    hdd: Optional[int] = None
+    cdd: Optional[int] = None
+    snow: Optional[float] = None
+    snowDepth: Optional[int] = None
 
 class WeatherByDayCreate(WeatherByDayBase):
     pass
 
 class WeatherByDay(WeatherByDayBase):
-    id: int
-    
     class Config:
         orm_mode = True
@@ -1,39 +1,150 @@
-from database import Base, engine, SessionLocal
-from schema import WeatherByDayCreate
+"""
+Bulk seed loader for weatherByDay
 
-import crud, json, models
-import datetime
+Loads one or more ACIS StnData JSON files ({"meta": {...}, "data": [[date, [maxt], [mint], ...]]})
+in a single transaction, one executemany per file, with load-time SQLite pragmas. Seeding resumes
+by default: only days newer than each city/station's last ingested day are inserted, so re-running
+on a partly or fully seeded database is cheap. --overwrite reloads every day in the files.
 
-def get_db():
-    db = SessionLocal()
+Run from server/:
+    python -m db.seedDB                                       # every db/noaa_*.json
+    python -m db.seedDB path/to/boise.json --city "Boise, ID"
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.orm import Session
+
+from db import crud, elements, migrations, models
+from db.cities import US_CAPITALS
+from db.database import engine
+
+SEED_DATA_GLOB = os.path.join(os.path.dirname(__file__), "noaa_*.json")
+
+# applied for the duration of a load and restored afterwards; a failed load is rolled back, and
+# a crash mid-load can at worst lose the seed, which is simply run again. journal_mode stays WAL
+# (see db.database) so the app's readers are never locked out by a load
+LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": "-65536",
+    "temp_store": "MEMORY",
+}
+
+@contextmanager
+def loadPragmas(connection):
+    previous = {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in LOAD_PRAGMAS}
+    for name, value in LOAD_PRAGMAS.items():
+        connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+def resolveCity(path: str, meta: dict) -> str:
+    """
+    Capital a seed file belongs to: the one whose station is in the file's sids, else the one
+    whose name matches the file name (noaa_anchorage.json -> "Anchorage, AK")
+    """
+    sids = meta.get("sids") or []
+    for name, info in US_CAPITALS.items():
+        if info["station_id"] and info["station_id"] in sids:
+            return name
+    fileSlug = _slug(os.path.splitext(os.path.basename(path))[0])
+    for name in US_CAPITALS:
+        citySlug = _slug(name.rsplit(", ", 1)[0])
+        if fileSlug in (citySlug, f"noaa_{citySlug}", _slug(name), f"noaa_{_slug(name)}"):
+            return name
+    raise ValueError(f"can't tell which city {path} is for; pass --city")
+
+def resolveStation(city: str, meta: dict) -> str:
+    station = US_CAPITALS.get(city, {}).get("station_id")
+    sids = meta.get("sids") or []
+    if station and (not sids or station in sids):
+        return station
+    if not sids:
+        raise ValueError(f"no station id for {city}")
+    return sids[0]
+
+def seedFile(db: Session, path: str, city: str = None, resume: bool = True) -> dict:
+    with open(path) as f:
+        fileData = json.load(f)
+    meta = fileData.get("meta") or {}
+    city = city or resolveCity(path, meta)
+    stationId = resolveStation(city, meta)
+    since = crud.getLastIngestedDate(db, city, stationId) if resume else None
+
+    # ISO dates compare as strings, so already stored days are dropped before parsing
+    sinceText = since.isoformat() if since else ""
+    records = []
+    skipped = 0
+    for day in fileData.get("data", []):
+        if day[0] <= sinceText:
+            continue
+        record = elements.parseDay(day, city, stationId)
+        if record is None:
+            skipped += 1
+        else:
+            records.append(record)
+    written = crud.bulkInsertWeatherByDays(db, records, overwrite=not resume)
+    return {
+        "path": path,
+        "city": city,
+        "station_id": stationId,
+        "resumed_after": sinceText or None,
+        "written": written,
+        "skipped": skipped
+    }
+
+def seedFiles(paths: list, city: str = None, resume: bool = True) -> list:
+    """
+    Seed every file in one transaction. Creates or migrates the schema first, like app startup
+    """
+    connection = engine.raw_connection()
     try:
-        yield db
+        migrations.migrateSchema(connection)
     finally:
-        db.close()
+        connection.close()
+    models.Base.metadata.create_all(bind=engine)
 
-SEED_DATA_FILENAME = "./noaa_anchorage.json"
+    with engine.connect() as connection:
+        with loadPragmas(connection):
+            db = Session(bind=connection)
+            try:
+                results = [seedFile(db, path, city, resume) for path in paths]
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+    return results
 
 if __name__ == "__main__":
-    # prod step: shouldn't need to drop and create all, then load all the data everytime the server is spun up.
-    # also will be migrating away from the local sqlite db 
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-
-    f = open(SEED_DATA_FILENAME)
-    fileData = json.load(f)
-    weatherData = fileData["data"]
-
-    # [DATE, [MAX, MIN, AVG, DEPARTURE, HDD, CDD, PRECIPITATION, NEW SNOW, SNOW_DEPTH]]
-    print(len(weatherData))
-
-    for day in weatherData:
-        date = datetime.datetime.strptime(day[0], '%Y-%m-%d')
-        maxTemp = day[1][0]
-        minTemp = day[2][0]
-        precipitation = day[7][0]
-        if precipitation == 'T':
-            precipitation = 0.01
-        try:
-            crud.createWeatherByDay(next(get_db()), data=WeatherByDayCreate(date=date, minTemp=minTemp, maxTemp=maxTemp, precipitation=precipitation))
-        except:
-            print("d", date, "min", minTemp, "max", maxTemp, "precip", precipitation)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bulk load ACIS StnData JSON files into weatherByDay")
+    parser.add_argument("paths", nargs="*", help=f"seed files (default: {SEED_DATA_GLOB})")
+    parser.add_argument("--city", help="city the file belongs to, when loading a single file")
+    parser.add_argument("--overwrite", action="store_true", help="reload every day instead of resuming")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(SEED_DATA_GLOB))
+    if args.city and len(paths) != 1:
+        parser.error("--city needs exactly one seed file")
+
+    started = time.perf_counter()
+    results = seedFiles(paths, city=args.city, resume=not args.overwrite)
+    for result in results:
+        resumed = f" after {result['resumed_after']}" if result["resumed_after"] else ""
+        print(f"{result['city']} ({result['station_id']}): {result['written']} days written{resumed}, "
+              f"{result['skipped']} skipped from {result['path']}")
+    print(f"seeded {sum(result['written'] for result in results)} days from {len(results)} files "
+          f"in {time.perf_counter() - started:.2f}s")
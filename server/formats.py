@@ -0,0 +1,198 @@
+"""
+Compact response formats for day-series endpoints
+
+The default JSON format is a list of per-day objects. Two opt-in formats carry the same days as
+dense parallel columns, one slot per calendar day from `start` (days without data are null/missing):
+
+- columnar: JSON object with the columns as arrays
+- binary:   b"WQC1", uint32 header length, JSON header, zero padding to an 8 byte boundary, then
+            each column as raw little-endian int16, in header order
+
+Clients pick a format with ?format= or the Accept header (see negotiate_format). ?fields= limits
+both the per-day objects and the columns to the named fields.
+
+JSON bodies are encoded here (encode_json / json_response) rather than by FastAPI, whose
+jsonable_encoder walks every value of every day object before json.dumps sees it. orjson is used
+when installed; the standard json fallback produces the same document.
+"""
+
+import datetime
+import decimal
+import json
+import struct
+
+import numpy as np
+from fastapi import HTTPException, Request, Response
+
+from db import elements
+from db.cache import RECORD_FIELDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON = "json"
+COLUMNAR = "columnar"
+BINARY = "binary"
+FORMATS = (JSON, COLUMNAR, BINARY)
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.weatherquilt.columnar+json"
+BINARY_MEDIA_TYPE = "application/vnd.weatherquilt.columns"
+
+ACCEPT_FORMATS = {
+    COLUMNAR_MEDIA_TYPE: COLUMNAR,
+    BINARY_MEDIA_TYPE: BINARY,
+    "application/octet-stream": BINARY,
+}
+
+BINARY_MAGIC = b"WQC1"
+MISSING_INT16 = -32768
+
+def _encode_default(value):
+    # the types jsonable_encoder would have converted that neither encoder handles natively
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_json(content) -> bytes:
+    """
+    Compact UTF-8 JSON, with dates as YYYY-MM-DD, in the same shape FastAPI would have produced
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_encode_default)
+    return json.dumps(content, default=_encode_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+def json_response(content, headers: dict = None) -> Response:
+    # a prebuilt body: FastAPI passes Response objects through without serializing them again
+    return Response(content=encode_json(content), media_type="application/json", headers=headers)
+
+def negotiate_format(format: str, request: Request) -> str:
+    """
+    Explicit ?format= wins; otherwise the first Accept media type we recognise; otherwise JSON
+    """
+    if format is not None:
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+        return format
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in ACCEPT_FORMATS:
+            return ACCEPT_FORMATS[media_type]
+    return JSON
+
+class DayColumns:
+    """
+    Dense per-calendar-day columns for one city, built straight from a CitySeries slice
+    """
+
+    def __init__(self, city: str, start: datetime.date, days: int, stations: list, columns: list, stationIndex, extras=None):
+        self.city = city
+        self.start = start
+        self.days = days
+        self.stations = stations
+        # (name, int16 array, scale) in output order
+        self.columns = columns
+        self.stationIndex = stationIndex
+        # optional float columns (e.g. climatology departures), NaN where missing; columnar JSON only
+        self.extras = extras or {}
+
+    @classmethod
+    def from_series(cls, series, startDate: datetime.date, endDate: datetime.date, extras: dict = None, fields: tuple = None):
+        """
+        Columns covering startDate up to the last stored day <= endDate, or None if there is no data
+        extras maps column name -> float array aligned with the series arrays
+        fields (see cache.DAY_FIELDS) picks the value columns; station_id adds stationIndex, and
+        city and date are always implied by the header. Element fields must already be loaded
+        """
+        lo, hi = series.bounds(startDate, endDate)
+        if lo == hi:
+            return None
+        ordinals = series.ordinals[lo:hi]
+        offsets = ordinals - startDate.toordinal()
+        days = int(offsets[-1]) + 1
+
+        def dense(values):
+            column = np.full(days, MISSING_INT16, dtype="<i2")
+            column[offsets] = values
+            return column
+
+        def dense_float(values):
+            column = np.full(days, np.nan)
+            column[offsets] = values
+            return column
+
+        if fields is None:
+            fields = RECORD_FIELDS
+        columns = []
+        for field in fields:
+            if field == "minTemp":
+                columns.append((field, dense(series.minTemp[lo:hi]), 1))
+            elif field == "maxTemp":
+                columns.append((field, dense(series.maxTemp[lo:hi]), 1))
+            elif field == "precipitation":
+                precip = series.precipHundredths[lo:hi]
+                columns.append((field, dense(np.where(precip < 0, MISSING_INT16, precip)), 0.01))
+            elif field in elements.ELEMENTS_BY_FIELD:
+                # element arrays already use MISSING_ELEMENT == MISSING_INT16 for missing days
+                scale = elements.ELEMENTS_BY_FIELD[field].scale
+                columns.append((field, dense(series.elements[field][lo:hi]), 1 if scale == 1 else 1 / scale))
+        stationIndex = None
+        if "station_id" in fields and len(series.stations) > 1:
+            stationIndex = dense(series.stationIndex[lo:hi])
+        return cls(
+            series.city,
+            startDate,
+            days,
+            list(series.stations),
+            columns,
+            stationIndex,
+            {name: dense_float(values[lo:hi]) for name, values in (extras or {}).items()},
+        )
+
+    def _columns(self):
+        columns = list(self.columns)
+        if self.stationIndex is not None:
+            columns.append(("stationIndex", self.stationIndex, 1))
+        return columns
+
+    def _header(self) -> dict:
+        return {
+            "city": self.city,
+            "start": self.start.isoformat(),
+            "days": self.days,
+            "stations": self.stations,
+        }
+
+    def to_columnar(self) -> dict:
+        payload = self._header()
+        for name, column, scale in self._columns():
+            values = column.tolist()
+            if scale == 1:
+                payload[name] = [None if value == MISSING_INT16 else value for value in values]
+            else:
+                payload[name] = [None if value == MISSING_INT16 else round(value * scale, 2) for value in values]
+        for name, column in self.extras.items():
+            payload[name] = [None if value != value else round(value, 1) for value in column.tolist()]
+        return payload
+
+    def to_binary(self) -> bytes:
+        header = self._header()
+        header["columns"] = [
+            {"name": name, "dtype": "int16", "scale": scale, "missing": MISSING_INT16}
+            for name, _, scale in self._columns()
+        ]
+        header_bytes = json.dumps(header, separators=(",", ":")).encode()
+        prefix = BINARY_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes
+        padding = b"\0" * (-len(prefix) % 8)
+        return b"".join([prefix, padding] + [column.tobytes() for _, column, _ in self._columns()])
+
+def render_columns(columns: DayColumns, format: str, headers: dict) -> Response:
+    """
+    Response for the columnar or binary format
+    """
+    if format == BINARY:
+        return Response(content=columns.to_binary(), media_type=BINARY_MEDIA_TYPE, headers=headers)
+    return Response(content=encode_json(columns.to_columnar()), media_type=COLUMNAR_MEDIA_TYPE, headers=headers)
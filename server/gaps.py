@@ -0,0 +1,133 @@
+"""
+Gap index over a city's stored series, for coverage reports and targeted backfills
+
+Ingestion skips days whose temperatures ACIS reports as missing, and a failed or partial fetch
+leaves holes, so a city's stored days are not always contiguous. find_gaps() reads the holes
+straight off the SeriesCache ordinals (one np.diff per city) and returns them as inclusive
+(start, end) date ranges. A backfill then asks ACIS only for those ranges, with gaps separated by
+at most BACKFILL_MERGE_DAYS stored days fetched as one request, since refetching a few stored
+days costs less than another round trip.
+
+Some days are missing at the source too. After a backfill the days still missing in the ranges it
+fetched are recorded as checked gaps (db.models.CheckedGap), and later backfills skip them unless
+asked to recheck.
+"""
+
+import datetime
+
+import numpy as np
+
+from db.cache import CitySeries
+
+# stored days between two gaps that are refetched rather than spent on a second request
+BACKFILL_MERGE_DAYS = 14
+
+def find_gaps(series: CitySeries, start: datetime.date = None, end: datetime.date = None) -> list:
+    """
+    Runs of days without a stored row in [start, end], as inclusive (start, end) date pairs
+    The window defaults to the first and last stored day, so only interior holes are gaps
+    """
+    if series is None or len(series.ordinals) == 0:
+        if start is None or end is None or start > end:
+            return []
+        return [(start, end)]
+    first = start.toordinal() if start is not None else int(series.ordinals[0])
+    last = end.toordinal() if end is not None else int(series.ordinals[-1])
+    if first > last:
+        return []
+    lo = int(np.searchsorted(series.ordinals, first, side="left"))
+    hi = int(np.searchsorted(series.ordinals, last, side="right"))
+    # sentinels just outside the window turn the leading and trailing holes into ordinary gaps
+    ordinals = np.concatenate(([first - 1], series.ordinals[lo:hi], [last + 1]))
+    breaks = np.nonzero(np.diff(ordinals) > 1)[0]
+    fromordinal = datetime.date.fromordinal
+    return [
+        (fromordinal(int(ordinals[i]) + 1), fromordinal(int(ordinals[i + 1]) - 1))
+        for i in breaks.tolist()
+    ]
+
+def span_days(span) -> int:
+    return (span[1] - span[0]).days + 1
+
+def subtract_spans(gaps: list, spans: list) -> list:
+    """
+    The parts of sorted, disjoint gaps not covered by any of spans (inclusive date pairs)
+    """
+    spans = sorted(spans)
+    remaining = []
+    for gap_start, gap_end in gaps:
+        cursor = gap_start
+        for span_start, span_end in spans:
+            if span_end < cursor or span_start > gap_end:
+                continue
+            if span_start > cursor:
+                remaining.append((cursor, span_start - datetime.timedelta(days=1)))
+            cursor = max(cursor, span_end + datetime.timedelta(days=1))
+            if cursor > gap_end:
+                break
+        if cursor <= gap_end:
+            remaining.append((cursor, gap_end))
+    return remaining
+
+def fetch_ranges(gaps: list, merge_days: int = BACKFILL_MERGE_DAYS) -> list:
+    """
+    Sorted gaps coalesced into the date ranges to request: gaps separated by at most merge_days
+    stored days share one range
+    """
+    ranges = []
+    for gap_start, gap_end in gaps:
+        if ranges and (gap_start - ranges[-1][1]).days - 1 <= merge_days:
+            ranges[-1] = (ranges[-1][0], gap_end)
+        else:
+            ranges.append((gap_start, gap_end))
+    return ranges
+
+def coverage(series: CitySeries, checked: list, start: datetime.date = None, end: datetime.date = None, include_gaps: bool = True) -> dict:
+    """
+    Coverage report for one city over [start, end] (default: first to last stored day)
+    checked is the city's CheckedGap rows; a gap they cover entirely carries its checked_at
+    """
+    stored = series is not None and len(series.ordinals) > 0
+    if start is None and stored:
+        start = series.dateAt(0)
+    if end is None and stored:
+        end = series.dateAt(len(series.ordinals) - 1)
+    if start is None or end is None or start > end:
+        report = {"start": start, "end": end, "expected_days": 0, "stored_days": 0, "missing_days": 0, "coverage": None}
+        report.update({"gaps": []} if include_gaps else {"gap_count": 0, "unchecked_days": 0})
+        return report
+
+    lo, hi = series.bounds(start, end) if stored else (0, 0)
+    gaps = find_gaps(series, start, end)
+    checked_spans = [(gap.startDate, gap.endDate) for gap in checked]
+    unchecked = subtract_spans(gaps, checked_spans)
+    expected = span_days((start, end))
+    report = {
+        "start": start,
+        "end": end,
+        "expected_days": expected,
+        "stored_days": hi - lo,
+        "missing_days": expected - (hi - lo),
+        "coverage": round((hi - lo) / expected, 4),
+    }
+    if not include_gaps:
+        report["gap_count"] = len(gaps)
+        report["unchecked_days"] = sum(span_days(gap) for gap in unchecked)
+        return report
+
+    entries = []
+    for gap_start, gap_end in gaps:
+        checked_at = None
+        # unchecked pieces are sub-ranges of the gaps, so a gap containing none is fully checked
+        if not any(gap_start <= piece[0] <= gap_end for piece in unchecked):
+            checked_at = max(
+                gap.checkedAt for gap in checked if gap.startDate <= gap_end and gap.endDate >= gap_start
+            )
+        entries.append({
+            "start": gap_start,
+            "end": gap_end,
+            "days": span_days((gap_start, gap_end)),
+            "checked_at": checked_at
+        })
+    report["gaps"] = entries
+    return report
@@ -0,0 +1,64 @@
+"""
+In-process runner for queued ingestion jobs
+
+Jobs are rows in the ingestJob table (see db.crud.createIngestJob); the runner only holds their
+ids. A fixed number of worker tasks take ids off a queue and hand them to the handler registered
+with start(), so at most JOB_CONCURRENCY jobs run at once however many are queued. Unfinished
+jobs are re-queued when the app starts, so a restart resumes them rather than losing them.
+"""
+
+import asyncio
+
+# jobs run at the same time; each job bounds its own per-city fetch concurrency
+JOB_CONCURRENCY = 1
+
+class JobRunner:
+    """
+    Fixed pool of worker tasks running queued job ids through one handler
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._handler = None
+
+    def start(self, handler, job_ids=()):
+        """
+        Start the workers; handler is an async callable taking a job id. job_ids are queued first
+        """
+        self._handler = handler
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, job_id: int):
+        # callable from threadpool endpoints as well as the event loop
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._handler(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # the handler records its own failures; this only keeps the worker alive
+                print(f"Ingestion job {job_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+jobRunner = JobRunner()
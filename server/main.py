@@ -15,24 +15,79 @@ Request body:
 
 '''
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi_utils.tasks import repeat_every
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
-from db import crud, models, schema
-from db.database import SessionLocal, engine
+import acis
+import climatology
+import formats
+import gaps
+import jobs
+import metrics
+import quilt
+import stations
+from db import archive, crud, elements, migrations, models, schema
+from db.database import AsyncReadSessionLocal, ReadSessionLocal, SessionLocal, async_read_engine, engine, read_engine
+from climatology import climatologyCache
+from db.cache import DAY_FIELDS, seriesCache
 from db.cities import US_CAPITALS
 from sqlalchemy.orm import Session
+import asyncio
 import datetime
 import calendar
-import httpx
+import email.utils
+import functools
+import hashlib
+import inspect
 import json
-from sqlalchemy import func
+import os
+import time
+from typing import List
 
 app = FastAPI()
 
+# city used by the single-station (Anchorage) endpoints
+DEFAULT_CITY = "Anchorage, AK"
+
+# multi-city backfill: concurrent NOAA fetches and seconds allowed per city
+FETCH_CONCURRENCY = 8
+MAX_FETCH_CONCURRENCY = 16
+CITY_FETCH_TIMEOUT = 300.0
+
+# first year fetched for cities with no stored data
+DEFAULT_START_YEAR = 2000
+
+# job kind of /weather/backfill; its finished cities record the gaps ACIS could not fill
+BACKFILL_JOB = "backfill"
+
+# incremental syncs fetch cities whose window is at most MULTI_STN_MAX_DAYS together, up to
+# MULTI_STN_MAX_STATIONS stations per MultiStnData request; longer windows use one StnData each
+MULTI_STN_JOB_KINDS = ("sync", "nightly-sync")
+MULTI_STN_MAX_DAYS = 31
+MULTI_STN_MAX_STATIONS = 50
+
+# the nightly delta sync is queued once a day at or after this hour (UTC); checked this often.
+# WEATHER_NIGHTLY_SYNC_HOUR_UTC=24 turns it off (e.g. for benchmarks)
+NIGHTLY_SYNC_HOUR_UTC = int(os.environ.get("WEATHER_NIGHTLY_SYNC_HOUR_UTC", "10"))
+NIGHTLY_SYNC_CHECK_SECONDS = 15 * 60
+
+# /weather/range page cap (about 27 years of days) and /weather/years cap
+RANGE_MAX_DAYS = 10000
+RANGE_MAX_YEARS = 30
+RANGE_STREAM_CHUNK_DAYS = 366
+
+# /weather/snapshot range cap: a year of every city's days
+SNAPSHOT_MAX_DAYS = 366
+
+# Cache-Control max-age (seconds) for months/years that have ended vs the current month
+CLOSED_PERIOD_MAX_AGE = 7 * 24 * 60 * 60
+OPEN_PERIOD_MAX_AGE = 5 * 60
+
 # Add CORS middleware to allow frontend to access backend
 app.add_middleware(
     CORSMiddleware,
@@ -42,6 +97,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# per-route latency and per-request query stats for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine, "write")
+metrics.instrument_engine(read_engine, "read")
+if async_read_engine is not None:
+    metrics.instrument_engine(async_read_engine.sync_engine, "async_read")
+
 # Mount static files from React build at root
 app.mount("/static", StaticFiles(directory="static/static"), name="react-static")
 
@@ -57,21 +119,90 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# WEATHER_ASYNC_READS=1 runs query-only read endpoints on an aiosqlite session on the event loop
+# instead of a threadpool worker
+ASYNC_READS = AsyncReadSessionLocal is not None and os.environ.get("WEATHER_ASYNC_READS", "0") != "0"
+
+def read_endpoint(endpoint):
+    """
+    Serve a sync read endpoint (one taking `db: Session = Depends(get_read_db)`) from an async
+    read-only session when ASYNC_READS; otherwise it stays a threadpool endpoint on the sync read pool
+    run_sync only moves the database I/O off the event loop, so this is for endpoints that do little
+    besides a query. Ones that load series, render quilts or build climatologies stay undecorated on
+    the threadpool, where their CPU time doesn't stall other requests or ingestion
+    """
+    if not ASYNC_READS:
+        return endpoint
+    signature = inspect.signature(endpoint)
+    
+    @functools.wraps(endpoint)
+    async def async_endpoint(**kwargs):
+        async with AsyncReadSessionLocal() as session:
+            return await session.run_sync(lambda db: endpoint(db=db, **kwargs))
+    
+    async_endpoint.__signature__ = signature.replace(
+        parameters=[param for param in signature.parameters.values() if param.name != "db"]
+    )
+    return async_endpoint
+
 @app.on_event("startup")
-def startup():
+async def startup():
     print("starting up app")
+    connection = engine.raw_connection()
+    try:
+        migrations.migrateSchema(connection)
+    finally:
+        connection.close()
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if crud.rollupsNeedRebuild(db):
+            print("building monthly/yearly rollups")
+            crud.rebuildRollups(db)
+        stations.stationIndex.load(db)
+        unfinished_jobs = crud.getUnfinishedIngestJobIds(db)
+    finally:
+        db.close()
+    await acis.start_client()
+    if unfinished_jobs:
+        print(f"resuming ingestion jobs {unfinished_jobs}")
+    jobs.jobRunner.start(run_ingest_job, unfinished_jobs)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await jobs.jobRunner.stop()
+    await acis.close_client()
 
 @app.get("/healthcheck")
 async def root():
     return {"message": "Healthy!"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus text exposition of this process's request, query, ACIS and ingestion metrics
+    """
+    cache_stats = seriesCache.stats()
+    metrics.seriesCacheBytes.set(cache_stats["bytes"])
+    metrics.seriesCacheCities.set(cache_stats["cities"])
+    metrics.ingestJobsPending.set(jobs.jobRunner.pending())
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/weatherByDay")
 async def weatherByDay(data: schema.WeatherByDayCreate):
     pass
 
 # day format: YYYY-MM-DD
 @app.get("/weather/day/{day}", response_model=schema.WeatherByDay)
-def getWeatherByDay(day: str, db: Session = Depends(get_db)):
+@read_endpoint
+def getWeatherByDay(day: str, db: Session = Depends(get_read_db)):
     day_obj = datetime.datetime.strptime(day, '%Y-%m-%d').date()
     print(day_obj)
     data = crud.getWeatherByDay(db, day_obj)
@@ -80,8 +211,134 @@ def getWeatherByDay(day: str, db: Session = Depends(get_db)):
     return data
 
 
+def cache_validators(db: Session, city: str, startDate: datetime.date, endDate: datetime.date, variant: str = formats.JSON):
+    """
+    ETag, Last-Modified and Cache-Control headers for one city's [startDate, endDate], or every
+    city's when city is None. The ETag changes whenever ingestion bumps a city/year data version
+    in the span; variant distinguishes response formats and pages of the same span
+    """
+    versions = crud.getDataVersions(db, city, startDate.year, endDate.year)
+    if city is None:
+        numbers = ",".join(f"{version.city}:{version.year}:{version.version}" for version in versions)
+    else:
+        numbers = ",".join(f"{version.year}:{version.version}" for version in versions)
+    tag = hashlib.sha1(f"{city}|{startDate}|{endDate}|{numbers}|{variant}".encode()).hexdigest()[:20]
+    headers = {"ETag": f'"{tag}"', "Vary": "Accept"}
+    updated = [version.updatedAt for version in versions if version.updatedAt]
+    if updated:
+        headers["Last-Modified"] = email.utils.format_datetime(
+            max(updated).replace(tzinfo=datetime.timezone.utc), usegmt=True
+        )
+    # anything ending before the current month is closed; the current month still gets new days
+    closed = endDate < datetime.date.today().replace(day=1)
+    max_age = CLOSED_PERIOD_MAX_AGE if closed else OPEN_PERIOD_MAX_AGE
+    headers["Cache-Control"] = f"public, max-age={max_age}"
+    return headers
+
+def is_not_modified(request: Request, validators: dict) -> bool:
+    """
+    True when the client's If-None-Match (or, without one, If-Modified-Since) matches validators
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        etag = validators["ETag"]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in validators:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return email.utils.parsedate_to_datetime(validators["Last-Modified"]) <= since
+    return False
+
+def parse_fields(fields: str):
+    """
+    ?fields= as a tuple of DAY_FIELDS in their canonical order with date always first,
+    or None (the default record shape) when absent. "all" selects every field
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    if names == {"all"}:
+        names = set(DAY_FIELDS)
+    unknown = sorted(names.difference(DAY_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"unknown fields: {', '.join(unknown)}; choose from {', '.join(DAY_FIELDS)}"
+        )
+    return ("date",) + tuple(field for field in DAY_FIELDS if field in names and field != "date")
+
+FIELDS_DESCRIPTION = "Comma-separated day fields to return (date is always included), or all"
+
+def serve_days(
+    request: Request,
+    db: Session,
+    city: str,
+    startDate: datetime.date,
+    endDate: datetime.date,
+    format: str,
+    include_climatology: bool,
+    not_found: str,
+    fields: str = None
+):
+    """
+    Shared body of the year/month endpoints: conditional GET, then the days in the negotiated format,
+    optionally with each day's departure from normal and percentile rank
+    """
+    response_format = formats.negotiate_format(format, request)
+    fields = parse_fields(fields)
+    variant = response_format
+    if fields is not None:
+        variant += f"|fields:{','.join(fields)}"
+    if include_climatology:
+        if response_format == formats.BINARY:
+            raise HTTPException(status_code=400, detail="climatology is not available in the binary format")
+        # normals pool every year, so any new data for the city changes them
+        variant += f"|climatology:{crud.getCityDataVersion(db, city)}"
+    validators = cache_validators(db, city, startDate, endDate, variant)
+    if include_climatology:
+        validators["Cache-Control"] = f"public, max-age={OPEN_PERIOD_MAX_AGE}"
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=validators)
+    
+    # Fetch data from the in-memory series
+    series = seriesCache.getSeries(db, city)
+    lo, hi = series.bounds(startDate, endDate) if series else (0, 0)
+    if lo == hi:
+        raise HTTPException(status_code=404, detail=not_found)
+    if fields is not None:
+        seriesCache.loadElements(db, series, fields)
+    normals = climatologyCache.for_series(series) if include_climatology else None
+    
+    if response_format == formats.JSON:
+        data = series.recordsAt(lo, hi, fields)
+        if normals is not None:
+            for day, departure, percentile in zip(
+                data, normals.departure[lo:hi].tolist(), normals.percentile[lo:hi].tolist()
+            ):
+                day["departure"] = round(departure, 1)
+                day["percentile"] = round(percentile, 1)
+        return formats.json_response(data, validators)
+    
+    extras = None
+    if normals is not None:
+        extras = {"departure": normals.departure, "percentile": normals.percentile}
+    columns = formats.DayColumns.from_series(series, startDate, endDate, extras, fields)
+    return formats.render_columns(columns, response_format, validators)
+
 @app.get("/weather/month/{year}/{month}")
-def getMonth(year: int, month: int, city: str = Query(default="Anchorage, AK"), db: Session = Depends(get_db)):
+def getMonth(
+    year: int,
+    month: int,
+    request: Request,
+    city: str = Query(default="Anchorage, AK"),
+    format: str = Query(default=None, description="json (default), columnar or binary"),
+    climatology: bool = Query(default=False, description="Add departure from normal and percentile per day"),
+    fields: str = Query(default=None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
     # Validate month
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
@@ -91,128 +348,540 @@ def getMonth(year: int, month: int, city: str = Query(default="Anchorage, AK"),
     lastDay = calendar.monthrange(year, month)[1]
     endDate = datetime.date(year, month, lastDay)
     
-    # Fetch data for the month
-    data = crud.getWeatherByDays(db, startDate, endDate, city=city)
-    
-    if not data:
-        raise HTTPException(status_code=404, detail="No data found for this month")
-    
-    return data
+    return serve_days(
+        request, db, city, startDate, endDate, format, climatology, "No data found for this month", fields
+    )
 
 @app.get("/weather/year/{year}")
-def getYear(year: int, city: str = Query(default="Anchorage, AK"), db: Session = Depends(get_db)):
+def getYear(
+    year: int,
+    request: Request,
+    city: str = Query(default="Anchorage, AK"),
+    format: str = Query(default=None, description="json (default), columnar or binary"),
+    climatology: bool = Query(default=False, description="Add departure from normal and percentile per day"),
+    fields: str = Query(default=None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
     # Get the first and last day of the year
     startDate = datetime.date(year, 1, 1)
     endDate = datetime.date(year, 12, 31)
     
-    # Fetch data for the year
-    data = crud.getWeatherByDays(db, startDate, endDate, city=city)
+    return serve_days(
+        request, db, city, startDate, endDate, format, climatology, "No data found for this year", fields
+    )
+
+def parse_day(value: str, name: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date in YYYY-MM-DD format")
+
+def stream_json_days(head: dict, series, lo: int, hi: int, fields: tuple = None):
+    """
+    Stream {...head, "days": [...]} without materialising the whole list of day objects
+    """
+    yield formats.encode_json(head)[:-1] + b',"days":['
+    for chunk_start in range(lo, hi, RANGE_STREAM_CHUNK_DAYS):
+        chunk = series.recordsAt(chunk_start, min(chunk_start + RANGE_STREAM_CHUNK_DAYS, hi), fields)
+        body = formats.encode_json(chunk)[1:-1]
+        yield body if chunk_start == lo else b"," + body
+    yield b"]}"
+
+@app.get("/weather/range")
+def getRange(
+    request: Request,
+    city: str = Query(default="Anchorage, AK"),
+    start: str = Query(..., description="First day, YYYY-MM-DD"),
+    end: str = Query(..., description="Last day, YYYY-MM-DD"),
+    limit: int = Query(default=RANGE_MAX_DAYS, ge=1, le=RANGE_MAX_DAYS, description="Max days per page"),
+    cursor: str = Query(default=None, description="next_cursor from the previous page"),
+    format: str = Query(default=None, description="json (default), columnar or binary"),
+    fields: str = Query(default=None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Any span of days for one city in a single response, sliced from the in-memory series
+    Spans longer than `limit` stored days are paged: follow next_cursor (also sent as X-Next-Cursor)
+    """
+    startDate = parse_day(start, "start")
+    endDate = parse_day(end, "end")
+    if endDate < startDate:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    pageStart = startDate
+    if cursor is not None:
+        pageStart = parse_day(cursor, "cursor")
+        if not startDate <= pageStart <= endDate:
+            raise HTTPException(status_code=400, detail="cursor is outside the requested range")
+    
+    response_format = formats.negotiate_format(format, request)
+    fields = parse_fields(fields)
+    variant = f"{response_format}|{limit}"
+    if fields is not None:
+        variant += f"|fields:{','.join(fields)}"
+    validators = cache_validators(db, city, pageStart, endDate, variant)
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=validators)
+    
+    series = seriesCache.getSeries(db, city)
+    lo, hi = series.bounds(pageStart, endDate) if series else (0, 0)
+    if lo == hi:
+        raise HTTPException(status_code=404, detail="No data found for this range")
+    
+    headers = dict(validators)
+    next_cursor = None
+    if hi - lo > limit:
+        hi = lo + limit
+        next_cursor = series.dateAt(hi).isoformat()
+        headers["X-Next-Cursor"] = next_cursor
+    pageEnd = series.dateAt(hi - 1)
+    if fields is not None:
+        seriesCache.loadElements(db, series, fields)
+    
+    if response_format != formats.JSON:
+        columns = formats.DayColumns.from_series(series, pageStart, pageEnd, fields=fields)
+        return formats.render_columns(columns, response_format, headers)
+    
+    head = {
+        "city": city,
+        "start": pageStart,
+        "end": pageEnd,
+        "next_cursor": next_cursor
+    }
+    return StreamingResponse(stream_json_days(head, series, lo, hi, fields), media_type="application/json", headers=headers)
+
+@app.get("/weather/years/{start_year}/{end_year}")
+def getYears(
+    start_year: int,
+    end_year: int,
+    request: Request,
+    city: str = Query(default="Anchorage, AK"),
+    fields: str = Query(default=None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Several whole years for one city in one streamed response, grouped by year:
+    {"city": ..., "years": {"2000": [...], "2001": [...], ...}}
+    At most RANGE_MAX_YEARS years per request
+    """
+    if end_year < start_year:
+        raise HTTPException(status_code=400, detail="end_year must not be before start_year")
+    if end_year - start_year + 1 > RANGE_MAX_YEARS:
+        raise HTTPException(status_code=400, detail=f"At most {RANGE_MAX_YEARS} years per request")
+    
+    startDate = datetime.date(start_year, 1, 1)
+    endDate = datetime.date(end_year, 12, 31)
+    fields = parse_fields(fields)
+    variant = "years" if fields is None else f"years|fields:{','.join(fields)}"
+    validators = cache_validators(db, city, startDate, endDate, variant)
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=validators)
+    
+    series = seriesCache.getSeries(db, city)
+    lo, hi = series.bounds(startDate, endDate) if series else (0, 0)
+    if lo == hi:
+        raise HTTPException(status_code=404, detail="No data found for these years")
+    if fields is not None:
+        seriesCache.loadElements(db, series, fields)
+    
+    def stream():
+        yield formats.encode_json({"city": city})[:-1] + b',"years":{'
+        for year in range(start_year, end_year + 1):
+            lo, hi = series.bounds(datetime.date(year, 1, 1), datetime.date(year, 12, 31))
+            days = formats.encode_json(series.recordsAt(lo, hi, fields))
+            yield (b"" if year == start_year else b",") + f'"{year}":'.encode() + days
+        yield b"}}"
+    
+    return StreamingResponse(stream(), media_type="application/json", headers=validators)
+
+def snapshot_fields(fields: str):
+    # parse_fields for snapshots, where city is always included alongside date
+    fields = parse_fields(fields)
+    if fields is not None and "city" not in fields:
+        fields = fields[:1] + ("city",) + fields[1:]
+    return fields
+
+@app.get("/weather/snapshot/{day}")
+@read_endpoint
+def getSnapshot(
+    day: str,
+    request: Request,
+    fields: str = Query(default=None, description=FIELDS_DESCRIPTION + "; city is always included"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Every city's values on one day, ordered by city, from one seek on the date-first index
+    """
+    dayDate = parse_day(day, "day")
+    fields = snapshot_fields(fields)
+    variant = "snapshot" if fields is None else f"snapshot|fields:{','.join(fields)}"
+    validators = cache_validators(db, None, dayDate, dayDate, variant)
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=validators)
     
+    data = crud.getWeatherSnapshot(db, dayDate, dayDate, fields)
     if not data:
-        raise HTTPException(status_code=404, detail="No data found for this year")
+        raise HTTPException(status_code=404, detail="No data found for this day")
+    return formats.json_response(data, validators)
+
+@app.get("/weather/snapshot")
+def getSnapshotRange(
+    request: Request,
+    start: str = Query(..., description="First day, YYYY-MM-DD"),
+    end: str = Query(..., description="Last day, YYYY-MM-DD"),
+    fields: str = Query(default=None, description=FIELDS_DESCRIPTION + "; city is always included"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Every city's values for each day in [start, end], grouped by day:
+    {"start": ..., "end": ..., "days": {"2024-01-01": [...], ...}}
+    At most SNAPSHOT_MAX_DAYS days per request; days without any data are left out
+    """
+    startDate = parse_day(start, "start")
+    endDate = parse_day(end, "end")
+    if endDate < startDate:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (endDate - startDate).days + 1 > SNAPSHOT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {SNAPSHOT_MAX_DAYS} days per request")
+    fields = snapshot_fields(fields)
+    variant = "snapshots" if fields is None else f"snapshots|fields:{','.join(fields)}"
+    validators = cache_validators(db, None, startDate, endDate, variant)
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=validators)
     
-    return data
+    days = {}
+    for record in crud.getWeatherSnapshot(db, startDate, endDate, fields):
+        days.setdefault(record["date"].isoformat(), []).append(record)
+    if not days:
+        raise HTTPException(status_code=404, detail="No data found for this range")
+    return formats.json_response({"start": startDate, "end": endDate, "days": days}, validators)
+
+def expected_days(year: int, month: int = None) -> int:
+    """
+    Calendar days in a month or year, not counting days after today
+    """
+    start = datetime.date(year, month or 1, 1)
+    if month:
+        end = datetime.date(year, month, calendar.monthrange(year, month)[1])
+    else:
+        end = datetime.date(year, 12, 31)
+    end = min(end, datetime.date.today())
+    return max((end - start).days + 1, 0)
+
+@app.get("/weather/aggregates")
+@read_endpoint
+def getAggregates(
+    period: str = Query(default="month", description="month or year"),
+    city: List[str] = Query(default=None, description="Repeat to select several cities (default: all)"),
+    start_year: int = Query(default=None),
+    end_year: int = Query(default=None),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Precomputed monthly or yearly rollups (precipitation totals, temperature means/extremes,
+    rain and missing day counts) for overlaying years and cities without reading daily rows
+    Temperatures are degrees F, precipitation inches
+    """
+    if period not in ("month", "year"):
+        raise HTTPException(status_code=400, detail="period must be month or year")
+    
+    aggregates = []
+    for city_name, rollup in crud.getRollups(db, period, city, start_year, end_year):
+        month = rollup.month if period == "month" else None
+        days = rollup.days
+        aggregates.append({
+            "city": city_name,
+            "year": rollup.year,
+            "month": month,
+            "days": days,
+            "missing_days": max(expected_days(rollup.year, month) - days, 0),
+            "rain_days": rollup.rainDays,
+            "precipitation": rollup.precipHundredths / 100,
+            "mean_temp": round((rollup.minTempSum + rollup.maxTempSum) / (2 * days), 1),
+            "mean_min_temp": round(rollup.minTempSum / days, 1),
+            "mean_max_temp": round(rollup.maxTempSum / days, 1),
+            "min_temp": rollup.minTemp,
+            "max_temp": rollup.maxTemp
+        })
+    
+    return {"period": period, "aggregates": aggregates}
+
+@app.get("/weather/climatology")
+def getClimatology(city: str = Query(default="Anchorage, AK"), db: Session = Depends(get_read_db)):
+    """
+    Smoothed daily normals (mean/min/max temperature) and percentile thresholds of the daily mean
+    for every calendar day, pooled over all stored years
+    """
+    series, normals = climatologyCache.get(db, city)
+    if normals is None:
+        raise HTTPException(status_code=404, detail="No data found for this city")
+    
+    def value(number):
+        return None if number != number else round(number, 1)
+    
+    days = []
+    leap_year = datetime.date(2000, 1, 1)
+    for index in range(climatology.DAYS_IN_LEAP_YEAR):
+        day = leap_year + datetime.timedelta(days=index)
+        entry = {
+            "month": day.month,
+            "day": day.day,
+            "normal_mean": value(normals.normalMean[index]),
+            "normal_min": value(normals.normalMin[index]),
+            "normal_max": value(normals.normalMax[index])
+        }
+        for q, threshold in zip(climatology.THRESHOLD_PERCENTILES, normals.thresholds[index].tolist()):
+            entry[f"p{q}"] = value(threshold)
+        days.append(entry)
+    
+    return {
+        "city": city,
+        "first_year": normals.firstYear,
+        "last_year": normals.lastYear,
+        "window_days": 2 * climatology.SMOOTHING_HALF_WINDOW + 1,
+        "days": days
+    }
+
+@app.get("/quilt/{city}/{year}.{image_format}")
+def getQuiltImage(
+    city: str,
+    year: int,
+    image_format: str,
+    request: Request,
+    mode: str = Query(default=quilt.TEMPERATURE, description="temperature or precipitation"),
+    dynamic_range: bool = Query(default=False, description="Stretch the temperature colors over the year's own range"),
+    cell: int = Query(default=quilt.DEFAULT_CELL_PX, ge=1, le=60, description="Patch size in pixels"),
+    gap: int = Query(default=quilt.DEFAULT_GAP_PX, ge=0, le=10, description="Space between patches in pixels"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    One year's quilt as a PNG or SVG image, colored like the client. Default-size images are
+    rendered once per data version and then served from the render cache; other sizes are
+    rendered on every request
+    """
+    if image_format not in quilt.IMAGE_FORMATS:
+        raise HTTPException(status_code=404, detail=f"image format must be one of {', '.join(quilt.IMAGE_FORMATS)}")
+    if mode not in quilt.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(quilt.MODES)}")
+    # the range only changes temperature colors
+    dynamic_range = dynamic_range and mode == quilt.TEMPERATURE
+    variant = f"{mode}-{'dynamic' if dynamic_range else 'fixed'}-c{cell}-g{gap}"
+
+    startDate = datetime.date(year, 1, 1)
+    endDate = datetime.date(year, 12, 31)
+    validators = cache_validators(db, city, startDate, endDate, f"quilt|{image_format}|{variant}")
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=validators)
+
+    media_type = quilt.MEDIA_TYPES[image_format]
+    # only the default size is cached; any other cell/gap would put a file on disk per request
+    cacheable = cell == quilt.DEFAULT_CELL_PX and gap == quilt.DEFAULT_GAP_PX
+    if cacheable:
+        versions = crud.getDataVersions(db, city, year, year)
+        version = versions[0].version if versions else 0
+        cached = quilt.quiltCache.get(city, year, variant, version, image_format)
+        if cached is not None:
+            return Response(content=cached, media_type=media_type, headers=validators)
+
+    colors, _ = quilt.year_colors(seriesCache.getSeries(db, city), year, mode, dynamic_range)
+    if colors is None:
+        raise HTTPException(status_code=404, detail="No data found for this year")
+    if image_format == quilt.PNG:
+        image = quilt.render_png(colors, cell, gap)
+    else:
+        image = quilt.render_svg(colors, year, cell, gap)
+    if cacheable:
+        try:
+            quilt.quiltCache.put(city, year, variant, version, image_format, image)
+        except OSError as e:
+            print(f"Could not cache quilt image for {city} {year}: {e}")
+    return Response(content=image, media_type=media_type, headers=validators)
 
 @app.get("/weather/cities")
-def getCities(db: Session = Depends(get_db)):
+@read_endpoint
+def getCities(db: Session = Depends(get_read_db)):
     """
     Get list of available cities in the database
     """
     cities = crud.getAvailableCities(db)
     return {"cities": [city[0] for city in cities]}
 
-async def fetch_noaa_data(start_date: str, end_date: str, station_id: str = "ANCthr 9"):
+NOAA_ELEMS = [
+    {"name": "maxt", "add": "t"},
+    {"name": "mint", "add": "t"},
+    {"name": "avgt", "add": "t"},
+    {"name": "avgt", "normal": "departure91", "add": "t"},
+    {"name": "hdd", "add": "t"},
+    {"name": "cdd", "add": "t"},
+    {"name": "pcpn", "add": "t"},
+    {"name": "snow", "add": "t"},
+    {"name": "snwd", "add": "t"}
+]
+
+async def stream_noaa_data(start_date: str, end_date: str, station_id: str = "ANCthr 9"):
     """
-    Fetch weather data from NOAA RCC-ACIS API
+    Stream daily rows from the NOAA RCC-ACIS API as they arrive
     start_date and end_date should be in format: YYYY-MM-DD
     station_id: NOAA station identifier
     """
-    url = "https://data.rcc-acis.org/StnData"
-    
     request_body = {
-        "elems": [
-            {"name": "maxt", "add": "t"},
-            {"name": "mint", "add": "t"},
-            {"name": "avgt", "add": "t"},
-            {"name": "avgt", "normal": "departure91", "add": "t"},
-            {"name": "hdd", "add": "t"},
-            {"name": "cdd", "add": "t"},
-            {"name": "pcpn", "add": "t"},
-            {"name": "snow", "add": "t"},
-            {"name": "snwd", "add": "t"}
-        ],
+        "elems": NOAA_ELEMS,
         "sid": station_id,
         "sDate": start_date,
         "eDate": end_date
     }
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(url, json=request_body)
-        response.raise_for_status()
-        return response.json()
+    async for day in acis.stream_array("/StnData", request_body, key="data", timeout=60.0):
+        yield day
+
+async def fetch_noaa_multi(station_ids: list, start_date: str, end_date: str, timeout: float = 60.0) -> dict:
+    """
+    Daily rows for several stations from one MultiStnData request, as {station_id: rows}
+    MultiStnData rows carry only the element values, one row per day from start_date to end_date,
+    so each gets its date back to match StnData rows. Stations ACIS returns nothing for are absent
+    """
+    request_body = {
+        "elems": NOAA_ELEMS,
+        "sids": ",".join(station_ids),
+        "sDate": start_date,
+        "eDate": end_date
+    }
+    result = await acis.post("/MultiStnData", request_body, timeout=timeout)
+    if "error" in result:
+        raise ValueError(result["error"])
+    first = datetime.date.fromisoformat(start_date)
+    requested = set(station_ids)
+    rows = {}
+    for station in result.get("data", []):
+        # meta.sids lists every id of the station; find the one we asked for
+        station_id = next((sid for sid in station.get("meta", {}).get("sids", []) if sid in requested), None)
+        if station_id is None:
+            continue
+        rows[station_id] = [
+            [(first + datetime.timedelta(days=offset)).isoformat()] + values
+            for offset, values in enumerate(station.get("data", []))
+        ]
+    return rows
+
+def multi_station_groups(date_ranges: dict):
+    """
+    (groups, singles): cities to fetch together, as lists sharing a date window of at most
+    MULTI_STN_MAX_DAYS, and the cities left to fetch on their own
+    """
+    windows = {}
+    singles = []
+    for city_name, date_range in date_ranges.items():
+        spans = date_spans(date_range)
+        start, end = (datetime.date.fromisoformat(str(day)) for day in (spans[0][0], spans[-1][1]))
+        if len(spans) == 1 and (end - start).days + 1 <= MULTI_STN_MAX_DAYS:
+            windows[city_name] = (start, end)
+        else:
+            singles.append(city_name)
+    groups = []
+    group_start = group_end = None
+    for city_name in sorted(windows, key=lambda name: windows[name]):
+        start, end = windows[city_name]
+        if groups and len(groups[-1]) < MULTI_STN_MAX_STATIONS and (max(end, group_end) - group_start).days + 1 <= MULTI_STN_MAX_DAYS:
+            groups[-1].append(city_name)
+            group_end = max(end, group_end)
+        else:
+            groups.append([city_name])
+            group_start, group_end = start, end
+    # a lone city gains nothing from MultiStnData
+    singles.extend(group[0] for group in groups if len(group) == 1)
+    return [group for group in groups if len(group) > 1], singles
+
+def parse_noaa_days(weather_data, city: str, station_id: str):
+    for day in weather_data:
+        yield elements.parseDay(day, city, station_id)
+
+async def stream_noaa_chunks(city: str, station_id: str, start_date: str, end_date: str):
+    """
+    Stream a station's days from ACIS in chunks of at most crud.UPSERT_CHUNK_SIZE, so only one
+    chunk is ever held in memory
+    Yields (raw_rows, records): the ACIS rows as received and their parsed records
+    """
+    raw_rows = []
+    async for day in stream_noaa_data(start_date, end_date, station_id):
+        raw_rows.append(day)
+        if len(raw_rows) >= crud.UPSERT_CHUNK_SIZE:
+            yield raw_rows, [elements.parseDay(row, city, station_id) for row in raw_rows]
+            raw_rows = []
+    if raw_rows:
+        yield raw_rows, [elements.parseDay(row, city, station_id) for row in raw_rows]
+
+def store_noaa_chunk(db: Session, city: str, station_id: str, raw_rows: list, records: list):
+    """
+    Archive a fetched chunk's raw rows, then upsert its records. Returns the upsert counts
+    """
+    started = time.perf_counter()
+    archive.appendRows(city, station_id, raw_rows)
+    counts = crud.upsertWeatherByDays(db, records)
+    metrics.ingestWriteDuration.inc(time.perf_counter() - started)
+    for outcome, count in counts.items():
+        metrics.ingestRows.labels(outcome).inc(count)
+    return counts
+
+async def ingest_noaa_stream(db: Session, city: str, station_id: str, start_date: str, end_date: str):
+    """
+    Stream a station's days from ACIS straight into the raw archive and chunked upserts
+    Returns the summed {"added", "updated", "skipped"} counts
+    """
+    counts = {"added": 0, "updated": 0, "skipped": 0}
+    async for raw_rows, records in stream_noaa_chunks(city, station_id, start_date, end_date):
+        chunk_counts = await run_in_threadpool(store_noaa_chunk, db, city, station_id, raw_rows, records)
+        for key in counts:
+            counts[key] += chunk_counts[key]
+    return counts
 
 async def find_station_for_city(lat: float, lon: float, city_name: str):
     """
     Find the best weather station for a given city by coordinates
+    Uses the local station catalog when it has been synced, otherwise asks ACIS
     Returns the station ID
     """
-    url = "https://data.rcc-acis.org/StnMeta"
+    index = stations.stationIndex.get()
+    if index:
+        best_station = index.best_station(lat, lon)
+        if not best_station:
+            print(f"No catalog stations found for {city_name}")
+            return None
+        print(f"Found station for {city_name}: {best_station['sid']} ({best_station['name']})")
+        return best_station["sid"]
     
     # Create a small bounding box around the city (roughly 0.5 degrees)
-    bbox = f"{lon-0.5},{lat-0.5},{lon+0.5},{lat+0.5}"
+    half_width = stations.SEARCH_HALF_WIDTH
+    bbox = f"{lon-half_width},{lat-half_width},{lon+half_width},{lat+half_width}"
     
     request_body = {
         "bbox": bbox,
-        "elems": "pcpn,maxt,mint",
+        "elems": stations.CATALOG_ELEMS,
         "meta": "name,sids,ll,valid_daterange"
     }
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=request_body)
-            response.raise_for_status()
-            data = response.json()
-            
-            stations = data.get("meta", [])
-            if not stations:
-                print(f"No stations found for {city_name}")
-                return None
-            
-            # Find the station with the longest date range and best data coverage
-            best_station = None
-            best_score = 0
-            
-            for station in stations:
-                # Check if station has valid date range
-                valid_range = station.get("valid_daterange", [])
-                if not valid_range or len(valid_range) < 2:
-                    continue
-                
-                # Parse date range
-                try:
-                    start_year = int(valid_range[0][0][:4])
-                    end_year = int(valid_range[-1][1][:4]) if valid_range[-1][1] else 2024
-                    years_of_data = end_year - start_year
-                    
-                    # Prefer stations with data starting before 2005 and still active
-                    score = years_of_data
-                    if start_year <= 2000:
-                        score += 10
-                    if end_year >= 2023:
-                        score += 5
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_station = station
-                except:
-                    continue
-            
-            if best_station and best_station.get("sids"):
-                station_id = best_station["sids"][0]
-                print(f"Found station for {city_name}: {station_id} ({best_station.get('name', 'Unknown')})")
-                return station_id
-            
+        data = await acis.post("/StnMeta", request_body, timeout=30.0)
+        
+        candidates = data.get("meta", [])
+        if not candidates:
+            print(f"No stations found for {city_name}")
             return None
+        
+        # Find the station with the longest date range and best data coverage
+        best_station = None
+        best_score = 0
+        
+        for station in candidates:
+            coverage = stations.coverage_score(station.get("valid_daterange"))
+            if coverage is not None and coverage[2] > best_score:
+                best_score = coverage[2]
+                best_station = station
+        
+        if best_station and best_station.get("sids"):
+            station_id = best_station["sids"][0]
+            print(f"Found station for {city_name}: {station_id} ({best_station.get('name', 'Unknown')})")
+            return station_id
+        
+        return None
     except Exception as e:
         print(f"Error finding station for {city_name}: {e}")
         return None
@@ -221,11 +890,11 @@ async def find_station_for_city(lat: float, lon: float, city_name: str):
 async def fetch_latest_weather(db: Session = Depends(get_db)):
     """
     Fetch the latest weather data from NOAA and update the database
-    Also appends new data to the noaa_anchorage.json file
+    New rows are also appended to the raw archive
     """
     try:
-        # Get the latest date in the database
-        latest_record = db.query(func.max(models.WeatherByDay.date)).scalar()
+        # Get the latest date stored for this city/station
+        latest_record = crud.getLastIngestedDate(db, DEFAULT_CITY, US_CAPITALS[DEFAULT_CITY]["station_id"])
         
         if latest_record:
             # Start from the day after the latest record
@@ -239,79 +908,20 @@ async def fetch_latest_weather(db: Session = Depends(get_db)):
         
         print(f"Fetching weather data from {start_date} to {end_date}")
         
-        # Fetch data from NOAA
-        data = await fetch_noaa_data(start_date, end_date)
-        
-        if "data" not in data:
-            raise HTTPException(status_code=500, detail="Invalid response from NOAA API")
-        
-        weather_data = data["data"]
-        records_added = 0
-        records_skipped = 0
-        
-        # Process and store each day's data
-        for day in weather_data:
-            try:
-                date = datetime.datetime.strptime(day[0], '%Y-%m-%d').date()
-                max_temp = day[1][0]
-                min_temp = day[2][0]
-                precipitation = day[7][0]
-                
-                # Skip records with missing temperature data
-                if max_temp == 'M' or min_temp == 'M':
-                    print(f"Skipping day {day[0]}: missing temperature data")
-                    records_skipped += 1
-                    continue
-                
-                # Handle trace amounts and missing precipitation
-                if precipitation == 'T':
-                    precipitation = 0.01
-                elif precipitation == 'M':
-                    precipitation = 0.0
-                
-                # Create weather record
-                weather_record = schema.WeatherByDayCreate(
-                    date=date,
-                    minTemp=min_temp,
-                    maxTemp=max_temp,
-                    precipitation=precipitation
-                )
-                
-                crud.createWeatherByDay(db, data=weather_record)
-                records_added += 1
-            except Exception as e:
-                print(f"Error processing day {day[0]}: {e}")
-                records_skipped += 1
-                continue
-        
-        # Update the JSON file by fetching all data
-        if records_added > 0:
-            try:
-                # Fetch all data to update the JSON file
-                all_data = await fetch_noaa_data("2000-01-01", end_date)
-                json_path = "db/noaa_anchorage.json"
-                json_data = {
-                    "meta": all_data.get("meta", {
-                        "state": "AK",
-                        "sids": ["ANCthr 9"],
-                        "uid": 32645,
-                        "name": "Anchorage Area"
-                    }),
-                    "data": all_data["data"]
-                }
-                
-                with open(json_path, 'w') as f:
-                    json.dump(json_data, f)
-                
-                print(f"Updated {json_path} with latest data")
-            except Exception as e:
-                print(f"Error updating JSON file: {e}")
+        # Stream data from NOAA into the raw archive and the database
+        counts = await ingest_noaa_stream(
+            db, DEFAULT_CITY, US_CAPITALS[DEFAULT_CITY]["station_id"], start_date, end_date
+        )
+        records_added = counts["added"]
+        records_updated = counts["updated"]
+        records_skipped = counts["skipped"]
         
         return {
             "message": "Weather data fetched successfully",
             "start_date": start_date,
             "end_date": end_date,
             "records_added": records_added,
+            "records_updated": records_updated,
             "records_skipped": records_skipped
         }
         
@@ -324,7 +934,7 @@ async def fetch_all_weather(db: Session = Depends(get_db)):
     """
     Fetch all available weather data from NOAA (2000-01-01 to today)
     This will fetch everything regardless of what's in the database
-    Also updates the noaa_anchorage.json file
+    Every fetched row is also appended to the raw archive
     """
     try:
         start_date = "2000-01-01"
@@ -332,82 +942,13 @@ async def fetch_all_weather(db: Session = Depends(get_db)):
         
         print(f"Fetching all weather data from {start_date} to {end_date}")
         
-        # Fetch data from NOAA
-        data = await fetch_noaa_data(start_date, end_date)
-        
-        if "data" not in data:
-            raise HTTPException(status_code=500, detail="Invalid response from NOAA API")
-        
-        weather_data = data["data"]
-        records_added = 0
-        records_updated = 0
-        records_skipped = 0
-        
-        # Process and store each day's data
-        for day in weather_data:
-            try:
-                date = datetime.datetime.strptime(day[0], '%Y-%m-%d').date()
-                max_temp = day[1][0]
-                min_temp = day[2][0]
-                precipitation = day[7][0]
-                
-                # Skip records with missing temperature data
-                if max_temp == 'M' or min_temp == 'M':
-                    print(f"Skipping day {day[0]}: missing temperature data")
-                    records_skipped += 1
-                    continue
-                
-                # Handle trace amounts and missing precipitation
-                if precipitation == 'T':
-                    precipitation = 0.01
-                elif precipitation == 'M':
-                    precipitation = 0.0
-                
-                # Check if record already exists
-                existing_record = crud.getWeatherByDay(db, date)
-                
-                if existing_record:
-                    # Update existing record
-                    existing_record.minTemp = min_temp
-                    existing_record.maxTemp = max_temp
-                    existing_record.precipitation = precipitation
-                    db.commit()
-                    records_updated += 1
-                else:
-                    # Create new weather record
-                    weather_record = schema.WeatherByDayCreate(
-                        date=date,
-                        minTemp=min_temp,
-                        maxTemp=max_temp,
-                        precipitation=precipitation
-                    )
-                    crud.createWeatherByDay(db, data=weather_record)
-                    records_added += 1
-                    
-            except Exception as e:
-                print(f"Error processing day {day[0]}: {e}")
-                records_skipped += 1
-                continue
-        
-        # Update the JSON file
-        try:
-            json_path = "db/noaa_anchorage.json"
-            json_data = {
-                "meta": data.get("meta", {
-                    "state": "AK",
-                    "sids": ["ANCthr 9"],
-                    "uid": 32645,
-                    "name": "Anchorage Area"
-                }),
-                "data": weather_data
-            }
-            
-            with open(json_path, 'w') as f:
-                json.dump(json_data, f)
-            
-            print(f"Updated {json_path} with latest data")
-        except Exception as e:
-            print(f"Error updating JSON file: {e}")
+        # Stream data from NOAA into the raw archive and the database
+        counts = await ingest_noaa_stream(
+            db, DEFAULT_CITY, US_CAPITALS[DEFAULT_CITY]["station_id"], start_date, end_date
+        )
+        records_added = counts["added"]
+        records_updated = counts["updated"]
+        records_skipped = counts["skipped"]
         
         return {
             "message": "All weather data fetched successfully",
@@ -431,8 +972,6 @@ async def get_stations(state: str = "AK", bbox: str = None):
     bbox: Bounding box coordinates in format "west,south,east,north"
     """
     try:
-        url = "https://data.rcc-acis.org/StnMeta"
-        
         request_body = {
             "elems": "pcpn,maxt,mint"
         }
@@ -444,33 +983,60 @@ async def get_stations(state: str = "AK", bbox: str = None):
             # Use state filter
             request_body["state"] = state
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=request_body)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Format the response for easier reading
-            stations = []
-            for station in data.get("meta", []):
-                stations.append({
-                    "name": station.get("name"),
-                    "sids": station.get("sids", []),
-                    "state": station.get("state"),
-                    "ll": station.get("ll"),  # latitude, longitude
-                    "elev": station.get("elev"),  # elevation
-                    "uid": station.get("uid"),
-                    "valid_daterange": station.get("valid_daterange", [])
-                })
-            
-            return {
-                "count": len(stations),
-                "stations": stations
-            }
-            
+        data = await acis.post("/StnMeta", request_body, timeout=30.0)
+        
+        # Format the response for easier reading
+        stations = []
+        for station in data.get("meta", []):
+            stations.append({
+                "name": station.get("name"),
+                "sids": station.get("sids", []),
+                "state": station.get("state"),
+                "ll": station.get("ll"),  # latitude, longitude
+                "elev": station.get("elev"),  # elevation
+                "uid": station.get("uid"),
+                "valid_daterange": station.get("valid_daterange", [])
+            })
+        
+        return {
+            "count": len(stations),
+            "stations": stations
+        }
+        
     except Exception as e:
         print(f"Error fetching stations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/weather/stations/sync")
+async def sync_stations(db: Session = Depends(get_db)):
+    """
+    Refresh the local station catalog with one bulk StnMeta request for every capital's state
+    """
+    states = {city_name.rsplit(", ", 1)[1] for city_name in US_CAPITALS}
+    try:
+        count = await stations.sync_station_catalog(db, states)
+    except Exception as e:
+        print(f"Error syncing station catalog: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "message": "Station catalog synced",
+        "states": len(states),
+        "stations": count
+    }
+
+@app.get("/weather/stations/nearest")
+def get_nearest_station(lat: float, lon: float, half_width: float = Query(stations.SEARCH_HALF_WIDTH, gt=0, le=5)):
+    """
+    Best-scoring catalog station within half_width degrees of a point, resolved without NOAA
+    """
+    index = stations.stationIndex.get()
+    if not index:
+        raise HTTPException(status_code=503, detail="Station catalog has not been synced")
+    station = index.best_station(lat, lon, half_width)
+    if not station:
+        raise HTTPException(status_code=404, detail="No station found near that point")
+    return station
+
 @app.get("/weather/find-stations")
 async def find_all_stations():
     """
@@ -509,146 +1075,552 @@ async def find_all_stations():
     
     return results
 
-@app.post("/weather/fetch-city")
-async def fetch_city_weather(
+async def resolve_station(city: str) -> str:
+    """
+    Station ID for a capital, looking one up from ACIS if the city has none
+    """
+    city_info = US_CAPITALS[city]
+    
+    # If no station ID, try to find one
+    if not city_info["station_id"]:
+        print(f"Finding station for {city}...")
+        station_id = await find_station_for_city(
+            city_info["lat"],
+            city_info["lon"],
+            city
+        )
+        if not station_id:
+            raise HTTPException(status_code=404, detail=f"No weather station found for {city}")
+        return station_id
+    return city_info["station_id"]
+
+@app.post("/weather/fetch-city", status_code=202)
+def fetch_city_weather(
     city: str = Query(..., description="City name (e.g., 'Atlanta, GA')"),
     start_year: int = Query(default=2000),
+    city_timeout: float = Query(default=CITY_FETCH_TIMEOUT, gt=0, description="Seconds allowed for the fetch"),
     db: Session = Depends(get_db)
 ):
     """
-    Fetch weather data for a specific city from start_year to today
+    Queue a job fetching weather data for a specific city from start_year to today
+    Returns 202 with the job; follow its Location (/jobs/{id}) for progress
     """
-    try:
-        # Check if city is in our capitals list
-        if city not in US_CAPITALS:
-            raise HTTPException(status_code=404, detail=f"City '{city}' not found in capitals list")
-        
-        city_info = US_CAPITALS[city]
-        
-        # If no station ID, try to find one
-        if not city_info["station_id"]:
-            print(f"Finding station for {city}...")
-            station_id = await find_station_for_city(
-                city_info["lat"],
-                city_info["lon"],
-                city
-            )
-            if not station_id:
-                raise HTTPException(status_code=404, detail=f"No weather station found for {city}")
-        else:
-            station_id = city_info["station_id"]
-        
-        # Fetch data
-        start_date = f"{start_year}-01-01"
-        end_date = datetime.date.today().strftime('%Y-%m-%d')
-        
-        print(f"Fetching weather data for {city} from {start_date} to {end_date}")
-        
-        data = await fetch_noaa_data(start_date, end_date, station_id)
-        
-        if "data" not in data:
-            raise HTTPException(status_code=500, detail="Invalid response from NOAA API")
-        
-        weather_data = data["data"]
-        records_added = 0
-        records_updated = 0
-        records_skipped = 0
-        
-        # Process and store each day's data
-        for day in weather_data:
+    # Check if city is in our capitals list
+    if city not in US_CAPITALS:
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found in capitals list")
+    
+    date_ranges = {city: (datetime.date(start_year, 1, 1), datetime.date.today())}
+    return queue_ingest_job(db, "fetch-city", date_ranges, 1, city_timeout)
+
+def date_spans(date_range) -> list:
+    # a date_ranges value, either one (start, end) pair or a list of them, as a list
+    return date_range if isinstance(date_range, list) else [date_range]
+
+async def ingest_cities(db: Session, date_ranges: dict, concurrency: int, city_timeout: float, job_id: int = None, batch: bool = False):
+    """
+    Fetch and store several capitals at once
+    date_ranges maps city name -> (start_date, end_date), or to a list of such spans fetched in
+    turn. Cities are streamed from NOAA concurrently
+    (at most `concurrency` at a time) and their chunks handed to a single writer so only one
+    transaction touches SQLite at once. With a job_id, each city's progress is saved to that job
+    as its chunks are written. With batch, cities with short windows share MultiStnData requests
+    (see multi_station_groups); a failed batch falls back to fetching its cities one by one, as
+    does any city whose station the batch response leaves out.
+    Returns per-city results in date_ranges order
+    """
+    results = {}
+    totals = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    # small queue so streamed chunks wait for the writer instead of piling up in memory
+    write_queue = asyncio.Queue(maxsize=concurrency)
+    
+    async def stream_city(city_name, station_id):
+        for start_date, end_date in date_spans(date_ranges[city_name]):
+            print(f"Fetching weather data for {city_name} from {start_date} to {end_date}")
+            async for chunk in stream_noaa_chunks(city_name, station_id, start_date, end_date):
+                await write_queue.put(("chunk", city_name, station_id, chunk))
+    
+    async def fetch_one(city_name):
+        async with semaphore:
+            attempted_at = datetime.datetime.utcnow()
+            station_id = US_CAPITALS[city_name]["station_id"]
+            error = None
             try:
-                date = datetime.datetime.strptime(day[0], '%Y-%m-%d').date()
-                max_temp = day[1][0]
-                min_temp = day[2][0]
-                precipitation = day[7][0]
-                
-                # Skip records with missing temperature data
-                if max_temp == 'M' or min_temp == 'M':
-                    records_skipped += 1
-                    continue
-                
-                # Handle trace amounts and missing precipitation
-                if precipitation == 'T':
-                    precipitation = 0.01
-                elif precipitation == 'M':
-                    precipitation = 0.0
-                
-                # Check if record already exists
-                existing_record = crud.getWeatherByDay(db, date, city=city)
-                
-                if existing_record:
-                    # Update existing record
-                    existing_record.station_id = station_id
-                    existing_record.minTemp = min_temp
-                    existing_record.maxTemp = max_temp
-                    existing_record.precipitation = precipitation
-                    db.commit()
-                    records_updated += 1
-                else:
-                    # Create new weather record
-                    weather_record = schema.WeatherByDayCreate(
-                        city=city,
-                        station_id=station_id,
-                        date=date,
-                        minTemp=min_temp,
-                        maxTemp=max_temp,
-                        precipitation=precipitation
-                    )
-                    crud.createWeatherByDay(db, data=weather_record)
-                    records_added += 1
-                    
+                station_id = await resolve_station(city_name)
+                await write_queue.put(("start", city_name, station_id, None))
+                await asyncio.wait_for(stream_city(city_name, station_id), timeout=city_timeout)
+            except asyncio.TimeoutError:
+                error = f"Timed out after {city_timeout} seconds"
+            except Exception as e:
+                error = str(e)
+            await write_queue.put(("done", city_name, station_id, (attempted_at, error)))
+    
+    async def fetch_group(city_names):
+        async with semaphore:
+            attempted_at = datetime.datetime.utcnow()
+            station_ids = {}
+            for city_name in city_names:
+                try:
+                    station_ids[city_name] = await resolve_station(city_name)
+                except Exception as e:
+                    await write_queue.put(("done", city_name, None, (attempted_at, str(e))))
+            if not station_ids:
+                return
+            windows = {}
+            for city_name in station_ids:
+                spans = date_spans(date_ranges[city_name])
+                windows[city_name] = (str(spans[0][0]), str(spans[-1][1]))
+            start_date = min(start for start, _ in windows.values())
+            end_date = max(end for _, end in windows.values())
+            print(f"Fetching weather data for {len(station_ids)} cities from {start_date} to {end_date}")
+            try:
+                rows = await asyncio.wait_for(
+                    fetch_noaa_multi(list(station_ids.values()), start_date, end_date), timeout=city_timeout
+                )
             except Exception as e:
-                print(f"Error processing day {day[0]} for {city}: {e}")
-                records_skipped += 1
+                print(f"MultiStnData request failed ({e!r}); fetching {len(station_ids)} cities one by one")
+                rows = None
+        if rows is None:
+            await asyncio.gather(*(fetch_one(city_name) for city_name in station_ids))
+            return
+        # a station missing from the response isn't a sync with no new days; fetch it on its own
+        missing = [city_name for city_name, station_id in station_ids.items() if station_id not in rows]
+        if missing:
+            print(f"MultiStnData returned no data for {', '.join(missing)}; fetching them one by one")
+        for city_name, station_id in station_ids.items():
+            if city_name in missing:
                 continue
-        
+            await write_queue.put(("start", city_name, station_id, None))
+            city_start, city_end = windows[city_name]
+            # ISO dates compare in date order; drop the days outside this city's own window
+            city_rows = [row for row in rows.get(station_id, ()) if city_start <= row[0] <= city_end]
+            for offset in range(0, len(city_rows), crud.UPSERT_CHUNK_SIZE):
+                raw_rows = city_rows[offset:offset + crud.UPSERT_CHUNK_SIZE]
+                records = [elements.parseDay(row, city_name, station_id) for row in raw_rows]
+                await write_queue.put(("chunk", city_name, station_id, (raw_rows, records)))
+            await write_queue.put(("done", city_name, station_id, (attempted_at, None)))
+        await asyncio.gather(*(fetch_one(city_name) for city_name in missing))
+    
+    def write_chunk(city_name, station_id, chunk):
+        raw_rows, records = chunk
+        counts = store_noaa_chunk(db, city_name, station_id, raw_rows, records)
+        city_totals = totals.setdefault(city_name, {"added": 0, "updated": 0, "skipped": 0})
+        for key in city_totals:
+            city_totals[key] += counts[key]
+        if job_id is not None:
+            crud.updateIngestJobCity(db, job_id, city_name, counts=counts)
+    
+    def start_city(city_name, station_id):
+        if job_id is not None:
+            crud.updateIngestJobCity(db, job_id, city_name, status="running", station_id=station_id)
+    
+    def finish_city(city_name, station_id, attempted_at, error):
+        spans = date_spans(date_ranges[city_name])
+        start_date, end_date = spans[0][0], spans[-1][1]
+        if station_id:
+            crud.recordSyncAttempt(db, city_name, station_id, attempted_at, error=error)
+        if job_id is not None:
+            crud.updateIngestJobCity(
+                db, job_id, city_name, status="failed" if error else "succeeded", station_id=station_id, error=error
+            )
+        if error is not None:
+            return {
+                "status": "error",
+                "error": error
+            }
+        counts = totals.get(city_name, {"added": 0, "updated": 0, "skipped": 0})
         return {
-            "message": f"Weather data fetched successfully for {city}",
-            "city": city,
-            "station_id": station_id,
+            "status": "success",
             "start_date": start_date,
             "end_date": end_date,
-            "records_added": records_added,
-            "records_updated": records_updated,
-            "records_skipped": records_skipped
+            "records_added": counts["added"],
+            "records_updated": counts["updated"],
+            "records_skipped": counts["skipped"],
+            "station_id": station_id
         }
-        
-    except Exception as e:
-        print(f"Error fetching weather data for {city}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def writer():
+        failed = {}
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            kind, city_name, station_id, payload = item
+            if kind == "start":
+                try:
+                    await run_in_threadpool(start_city, city_name, station_id)
+                except Exception as e:
+                    print(f"Error saving progress for {city_name}: {e}")
+                continue
+            if kind == "chunk":
+                if city_name in failed:
+                    continue
+                try:
+                    await run_in_threadpool(write_chunk, city_name, station_id, payload)
+                except Exception as e:
+                    failed[city_name] = str(e)
+                continue
+            attempted_at, error = payload
+            error = error or failed.get(city_name)
+            try:
+                results[city_name] = await run_in_threadpool(finish_city, city_name, station_id, attempted_at, error)
+            except Exception as e:
+                results[city_name] = {
+                    "status": "error",
+                    "error": str(e)
+                }
+    
+    writer_task = asyncio.create_task(writer())
+    try:
+        groups, singles = multi_station_groups(date_ranges) if batch else ([], list(date_ranges))
+        await asyncio.gather(
+            *(fetch_group(city_names) for city_names in groups),
+            *(fetch_one(city_name) for city_name in singles)
+        )
+    finally:
+        await write_queue.put(None)
+        await writer_task
+    
+    return {city_name: results[city_name] for city_name in date_ranges}
 
-@app.post("/weather/fetch-all-cities")
-async def fetch_all_cities_weather(
-    start_year: int = Query(default=2000),
+def queue_ingest_job(db: Session, kind: str, date_ranges: dict, concurrency: int, city_timeout: float, up_to_date: dict = None):
+    """
+    Save an ingestion job, hand it to the job runner and answer 202 with its status
+    date_ranges maps city name -> (start date, end date); up_to_date maps cities with nothing to
+    fetch to their last stored day
+    """
+    job = crud.createIngestJob(db, kind, date_ranges, concurrency, city_timeout, up_to_date)
+    if job.status == "queued":
+        jobs.jobRunner.enqueue(job.id)
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(job_status(db, job.id)),
+        headers={"Location": f"/jobs/{job.id}", "Cache-Control": "no-store"}
+    )
+
+async def run_ingest_job(job_id: int):
+    """
+    Job runner handler: ingest the job's cities that haven't finished yet and record the outcome
+    """
+    db = SessionLocal()
+    try:
+        job = await run_in_threadpool(crud.getIngestJob, db, job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return
+        kind, concurrency, city_timeout = job.kind, job.concurrency, job.cityTimeout
+        job_cities = await run_in_threadpool(crud.getIngestJobCities, db, job_id)
+        job_ranges = await run_in_threadpool(crud.getIngestJobRanges, db, job_id)
+        spans = {
+            job_city.city: job_ranges.get(job_city.city, [(job_city.startDate, job_city.endDate)])
+            for job_city in job_cities
+            if job_city.status in ("queued", "running")
+        }
+        date_ranges = {
+            city_name: [(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) for start, end in city_spans]
+            for city_name, city_spans in spans.items()
+        }
+        await run_in_threadpool(
+            crud.updateIngestJob, db, job_id, status="running", startedAt=datetime.datetime.utcnow()
+        )
+        print(f"Running ingestion job {job_id} for {len(date_ranges)} cities")
+        started = time.perf_counter()
+        try:
+            results = await ingest_cities(
+                db, date_ranges, concurrency, city_timeout, job_id=job_id, batch=kind in MULTI_STN_JOB_KINDS
+            )
+        except Exception as e:
+            metrics.ingestJobs.labels(kind, "failed").inc()
+            await run_in_threadpool(
+                crud.updateIngestJob, db, job_id,
+                status="failed", finishedAt=datetime.datetime.utcnow(), error=str(e)
+            )
+            raise
+        elapsed = time.perf_counter() - started
+        rows = sum(
+            result["records_added"] + result["records_updated"]
+            for result in results.values() if result["status"] == "success"
+        )
+        if elapsed > 0:
+            metrics.ingestRowsPerSecond.labels(kind).set(rows / elapsed)
+        failed = sum(1 for result in results.values() if result["status"] == "error")
+        if not failed:
+            status = "succeeded"
+        elif failed == len(results):
+            status = "failed"
+        else:
+            status = "completed_with_errors"
+        if kind == BACKFILL_JOB:
+            await run_in_threadpool(record_checked_gaps, db, spans, results)
+        metrics.ingestJobs.labels(kind, status).inc()
+        await run_in_threadpool(
+            crud.updateIngestJob, db, job_id, status=status, finishedAt=datetime.datetime.utcnow()
+        )
+    finally:
+        db.close()
+
+def job_status(db: Session, job_id: int):
+    job = crud.getIngestJob(db, job_id)
+    if job is None:
+        return None
+    cities = []
+    totals = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0, "up_to_date": 0}
+    records = {"added": 0, "updated": 0, "skipped": 0}
+    job_ranges = crud.getIngestJobRanges(db, job_id)
+    for job_city in crud.getIngestJobCities(db, job_id):
+        totals[job_city.status] = totals.get(job_city.status, 0) + 1
+        for key in records:
+            records[key] += getattr(job_city, key)
+        cities.append({
+            "city": job_city.city,
+            "status": job_city.status,
+            "station_id": job_city.station_id,
+            "start_date": job_city.startDate,
+            "end_date": job_city.endDate,
+            "ranges": [{"start": start, "end": end} for start, end in job_ranges[job_city.city]]
+                if job_city.city in job_ranges else None,
+            "records_added": job_city.added,
+            "records_updated": job_city.updated,
+            "records_skipped": job_city.skipped,
+            "error": job_city.error,
+            "updated_at": job_city.updatedAt
+        })
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "created_at": job.createdAt,
+        "started_at": job.startedAt,
+        "finished_at": job.finishedAt,
+        "error": job.error,
+        "progress": {
+            "cities": len(cities),
+            "finished": totals["succeeded"] + totals["failed"] + totals["up_to_date"],
+            **totals,
+            "records_added": records["added"],
+            "records_updated": records["updated"],
+            "records_skipped": records["skipped"]
+        },
+        "cities": cities
+    }
+
+@app.post("/weather/fetch-all-cities", status_code=202)
+def fetch_all_cities_weather(
+    start_year: int = Query(default=DEFAULT_START_YEAR),
+    concurrency: int = Query(default=FETCH_CONCURRENCY, ge=1, le=MAX_FETCH_CONCURRENCY),
+    city_timeout: float = Query(default=CITY_FETCH_TIMEOUT, gt=0, description="Seconds allowed per city fetch"),
     db: Session = Depends(get_db)
 ):
     """
-    Fetch weather data for all US state capitals from start_year to present
-    Warning: This will take a long time!
+    Queue a job fetching weather data for all US state capitals from start_year to present
+    Returns 202 with the job; follow its Location (/jobs/{id}) for progress
     """
-    results = {}
+    start_date = datetime.date(start_year, 1, 1)
+    end_date = datetime.date.today()
+    date_ranges = {city_name: (start_date, end_date) for city_name in US_CAPITALS}
+    return queue_ingest_job(db, "fetch-all-cities", date_ranges, concurrency, city_timeout)
+
+def delta_sync_ranges(db: Session, cities):
+    """
+    (date_ranges, up_to_date) for an incremental sync: the days after each city's high-water mark,
+    up to today. Cities with no data yet are fetched from DEFAULT_START_YEAR
+    """
+    today = datetime.date.today()
+    date_ranges = {}
+    up_to_date = {}
+    for city_name in cities:
+        last_date = crud.getLastIngestedDate(db, city_name, US_CAPITALS[city_name]["station_id"])
+        start = last_date + datetime.timedelta(days=1) if last_date else datetime.date(DEFAULT_START_YEAR, 1, 1)
+        if start > today:
+            up_to_date[city_name] = last_date
+            continue
+        date_ranges[city_name] = (start, today)
+    return date_ranges, up_to_date
+
+@app.post("/weather/sync", status_code=202)
+def sync_weather(
+    city: str = Query(default=None, description="Only sync this city (default: all capitals)"),
+    concurrency: int = Query(default=FETCH_CONCURRENCY, ge=1, le=MAX_FETCH_CONCURRENCY),
+    city_timeout: float = Query(default=CITY_FETCH_TIMEOUT, gt=0, description="Seconds allowed per city fetch"),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue an incremental sync: fetch only the days after each city's high-water mark, up to today
+    Returns 202 with the job; follow its Location (/jobs/{id}) for progress
+    """
+    if city is not None and city not in US_CAPITALS:
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found in capitals list")
     
-    for city_name in US_CAPITALS.keys():
-        try:
-            result = await fetch_city_weather(city=city_name, start_year=start_year, db=db)
-            results[city_name] = {
-                "status": "success",
-                "records_added": result["records_added"],
-                "records_updated": result["records_updated"],
-                "station_id": result["station_id"]
-            }
-        except Exception as e:
-            results[city_name] = {
-                "status": "error",
-                "error": str(e)
-            }
+    date_ranges, up_to_date = delta_sync_ranges(db, [city] if city else US_CAPITALS)
+    return queue_ingest_job(db, "sync", date_ranges, concurrency, city_timeout, up_to_date)
+
+def backfill_ranges(db: Session, cities, start: datetime.date, end: datetime.date, recheck: bool, merge_days: int):
+    """
+    (date_ranges, up_to_date) for a gap backfill: each city's gaps in [start, end] (default: its
+    first to last stored day) less the ones already checked, coalesced into fetch ranges.
+    Cities without stored data are only backfilled when start is given
+    """
+    today = datetime.date.today()
+    date_ranges = {}
+    up_to_date = {}
+    for city_name in cities:
+        series = seriesCache.getSeries(db, city_name)
+        if series is None and start is None:
+            continue
+        missing = gaps.find_gaps(series, start, end or (None if series else today))
+        if not recheck:
+            checked = [(gap.startDate, gap.endDate) for gap in crud.getCheckedGaps(db, city_name)]
+            missing = gaps.subtract_spans(missing, checked)
+        if missing:
+            date_ranges[city_name] = gaps.fetch_ranges(missing, merge_days)
+        else:
+            up_to_date[city_name] = series.dateAt(len(series.ordinals) - 1) if series else None
+    return date_ranges, up_to_date
+
+def record_checked_gaps(db: Session, spans: dict, results: dict):
+    """
+    After a backfill, remember the days each successfully fetched city still lacks in its spans
+    """
+    checked_at = datetime.datetime.utcnow()
+    for city_name, city_spans in spans.items():
+        if results[city_name]["status"] != "success":
+            continue
+        series = seriesCache.getSeries(db, city_name)
+        missing = [gap for start, end in city_spans for gap in gaps.find_gaps(series, start, end)]
+        crud.replaceCheckedGaps(db, city_name, city_spans, missing, checked_at)
+
+@app.post("/weather/backfill", status_code=202)
+def backfill_weather(
+    city: str = Query(default=None, description="Only backfill this city (default: all capitals)"),
+    start: str = Query(default=None, description="First day, YYYY-MM-DD (default: each city's first stored day)"),
+    end: str = Query(default=None, description="Last day, YYYY-MM-DD (default: each city's last stored day)"),
+    recheck: bool = Query(default=False, description="Also refetch gaps an earlier backfill found missing at the source"),
+    merge_days: int = Query(default=gaps.BACKFILL_MERGE_DAYS, ge=0, le=366, description="Stored days between gaps refetched to save a request"),
+    concurrency: int = Query(default=FETCH_CONCURRENCY, ge=1, le=MAX_FETCH_CONCURRENCY),
+    city_timeout: float = Query(default=CITY_FETCH_TIMEOUT, gt=0, description="Seconds allowed per city fetch"),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a job fetching only the missing days inside each city's stored history (see /weather/coverage)
+    Returns 202 with the job; follow its Location (/jobs/{id}) for progress
+    """
+    if city is not None and city not in US_CAPITALS:
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found in capitals list")
+    startDate = parse_day(start, "start") if start else None
+    endDate = min(parse_day(end, "end"), datetime.date.today()) if end else None
+    if startDate and endDate and endDate < startDate:
+        raise HTTPException(status_code=400, detail="end must not be before start")
     
-    return results
+    date_ranges, up_to_date = backfill_ranges(
+        db, [city] if city else US_CAPITALS, startDate, endDate, recheck, merge_days
+    )
+    return queue_ingest_job(db, BACKFILL_JOB, date_ranges, concurrency, city_timeout, up_to_date)
+
+@app.get("/weather/coverage")
+def get_coverage(
+    response: Response,
+    city: str = Query(default=None, description="One city with its gap list (default: every stored city, summarised)"),
+    start: str = Query(default=None, description="First day, YYYY-MM-DD (default: first stored day)"),
+    end: str = Query(default=None, description="Last day, YYYY-MM-DD (default: last stored day)"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Stored versus expected days per city and the gaps between them; gaps a backfill already
+    asked ACIS for carry checked_at
+    """
+    startDate = parse_day(start, "start") if start else None
+    endDate = parse_day(end, "end") if end else None
+    response.headers["Cache-Control"] = "no-store"
+    if city is not None:
+        series = seriesCache.getSeries(db, city)
+        if series is None:
+            raise HTTPException(status_code=404, detail=f"No data for {city}")
+        return {"city": city, **gaps.coverage(series, crud.getCheckedGaps(db, city), startDate, endDate)}
+    
+    checked = {}
+    for gap in crud.getCheckedGaps(db):
+        checked.setdefault(gap.city, []).append(gap)
+    return [
+        {
+            "city": city_name,
+            **gaps.coverage(
+                seriesCache.getSeries(db, city_name), checked.get(city_name, []), startDate, endDate, include_gaps=False
+            )
+        }
+        for (city_name,) in crud.getAvailableCities(db)
+    ]
+
+@app.get("/jobs/{job_id}")
+@read_endpoint
+def get_job(job_id: int, response: Response, db: Session = Depends(get_read_db)):
+    """
+    Status and per-city progress of an ingestion job
+    """
+    status = job_status(db, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    response.headers["Cache-Control"] = "no-store"
+    return status
+
+@app.get("/jobs")
+@read_endpoint
+def get_jobs(response: Response, limit: int = Query(default=20, ge=1, le=100), db: Session = Depends(get_read_db)):
+    """
+    Most recent ingestion jobs, newest first, without their per-city detail
+    """
+    response.headers["Cache-Control"] = "no-store"
+    return [
+        {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "created_at": job.createdAt,
+            "started_at": job.startedAt,
+            "finished_at": job.finishedAt,
+            "error": job.error
+        }
+        for job in crud.getIngestJobs(db, limit)
+    ]
+
+@app.get("/weather/sync-state")
+@read_endpoint
+def get_sync_state(db: Session = Depends(get_read_db)):
+    """
+    Per city/station high-water marks and the last sync attempt
+    """
+    return [
+        {
+            "city": state.city,
+            "station_id": state.station_id,
+            "last_date": state.lastDate,
+            "last_attempt": state.lastAttempt,
+            "last_success": state.lastSuccess,
+            "last_error": state.lastError
+        }
+        for state in crud.getSyncStates(db)
+    ]
 
 @app.on_event("startup")
-@repeat_every(seconds=60)
+@repeat_every(seconds=NIGHTLY_SYNC_CHECK_SECONDS)
 def fetchWeatherData() -> None:
-    print("fetching weather data")
+    """
+    Nightly delta sync: once a day, at or after NIGHTLY_SYNC_HOUR_UTC, queue a sync of every capital
+    The last nightly job is read from the database, so restarts don't queue a second one
+    """
+    now = datetime.datetime.utcnow()
+    if now.hour < NIGHTLY_SYNC_HOUR_UTC:
+        return
+    db = SessionLocal()
+    try:
+        last_job = crud.getLatestIngestJob(db, "nightly-sync")
+        if last_job and last_job.createdAt.date() == now.date():
+            return
+        print("queueing nightly weather sync")
+        date_ranges, up_to_date = delta_sync_ranges(db, US_CAPITALS)
+        job = crud.createIngestJob(db, "nightly-sync", date_ranges, FETCH_CONCURRENCY, CITY_FETCH_TIMEOUT, up_to_date)
+        if job.status == "queued":
+            jobs.jobRunner.enqueue(job.id)
+    finally:
+        db.close()
 
 # TODO: set up db and use sqlalchemy as orm
 # figure out how to store the weather data in sql (model)
@@ -0,0 +1,304 @@
+"""
+Process-local metrics in the Prometheus text exposition format
+
+MetricsMiddleware times every HTTP request by route template, and instrument_engine() hooks an
+SQLAlchemy engine's cursor events so each query is timed and charged to the request that ran it.
+acis.py records its own call timings and bytes, and ingestion records rows written. /metrics
+renders everything with registry.render().
+
+Recording is a dict lookup, a bisect and a few additions under a per-metric lock, so the read
+path pays a few microseconds per request and per query. Like the series cache, values are per
+process: with several uvicorn workers each worker reports its own.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+ACIS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# route label for requests that matched no route, so unknown paths can't grow the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = list(self._samples())
+        for suffix, names, values, value in samples:
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self, lock):
+        self.value = 0
+        self.lock = lock
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def set(self, value: float):
+        with self.lock:
+            self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield "_total", self.labelnames, values, child.value
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield "", self.labelnames, values, child.value
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets, lock):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = lock
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = REQUEST_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets, self._lock)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self):
+        names = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                yield "_bucket", names, values + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, values, child.sum
+            yield "_count", self.labelnames, values, cumulative
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# HTTP
+httpRequests = registry.register(Counter(
+    "weatherquilt_http_requests", "HTTP requests by route and status", ("method", "route", "status")
+))
+httpRequestDuration = registry.register(Histogram(
+    "weatherquilt_http_request_duration_seconds", "HTTP request latency, including the response body",
+    ("method", "route"), REQUEST_BUCKETS
+))
+httpRequestQueries = registry.register(Histogram(
+    "weatherquilt_http_request_db_queries", "Database queries run per HTTP request",
+    ("method", "route"), QUERY_COUNT_BUCKETS
+))
+httpRequestQueryDuration = registry.register(Histogram(
+    "weatherquilt_http_request_db_seconds", "Time spent in database queries per HTTP request",
+    ("method", "route"), REQUEST_BUCKETS
+))
+
+# database
+dbQueryDuration = registry.register(Histogram(
+    "weatherquilt_db_query_duration_seconds", "Database query latency by engine", ("engine",), QUERY_BUCKETS
+))
+
+# NOAA ACIS
+acisRequests = registry.register(Counter(
+    "weatherquilt_acis_requests", "ACIS request attempts by outcome", ("endpoint", "outcome")
+))
+acisRequestDuration = registry.register(Histogram(
+    "weatherquilt_acis_request_duration_seconds", "ACIS request attempt latency, including the streamed body",
+    ("endpoint",), ACIS_BUCKETS
+))
+acisResponseBytes = registry.register(Counter(
+    "weatherquilt_acis_response_bytes", "ACIS response bytes received", ("endpoint",)
+))
+acisRetries = registry.register(Counter(
+    "weatherquilt_acis_retries", "ACIS requests retried after a transient failure", ("endpoint",)
+))
+
+# ingestion
+ingestRows = registry.register(Counter(
+    "weatherquilt_ingest_rows", "Days written by ingestion, by upsert outcome", ("outcome",)
+))
+ingestWriteDuration = registry.register(Counter(
+    "weatherquilt_ingest_write_seconds", "Time spent archiving and upserting ingested chunks"
+))
+ingestJobs = registry.register(Counter(
+    "weatherquilt_ingest_jobs", "Finished ingestion jobs by kind and status", ("kind", "status")
+))
+ingestRowsPerSecond = registry.register(Gauge(
+    "weatherquilt_ingest_rows_per_second", "Days added or updated per second by the last finished job of each kind",
+    ("kind",)
+))
+
+# state sampled when /metrics is scraped
+seriesCacheBytes = registry.register(Gauge(
+    "weatherquilt_series_cache_bytes", "Bytes of city series held by the in-memory series cache"
+))
+seriesCacheCities = registry.register(Gauge(
+    "weatherquilt_series_cache_cities", "Cities held by the in-memory series cache"
+))
+ingestJobsPending = registry.register(Gauge(
+    "weatherquilt_ingest_jobs_pending", "Ingestion jobs queued in this process and not yet started"
+))
+
+class RequestStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+# set by the middleware for the duration of a request; the threadpool and SQLAlchemy's async
+# greenlets both run in a copy of the request's context, so they see the same RequestStats
+_requestStats = contextvars.ContextVar("requestStats", default=None)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (BaseHTTPMiddleware would add a task and a queue per request)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _requestStats.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _requestStats.reset(token)
+            # FastAPI puts the matched route in the scope; its path is the template, not the URL
+            route = scope.get("route")
+            path = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            httpRequests.labels(method, path, status).inc()
+            httpRequestDuration.labels(method, path).observe(elapsed)
+            httpRequestQueries.labels(method, path).observe(stats.queries)
+            httpRequestQueryDuration.labels(method, path).observe(stats.seconds)
+
+def instrument_engine(engine, name: str):
+    """
+    Time every query the engine runs, under the engine label `name`
+    """
+    histogram = dbQueryDuration.labels(name)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed)
+        stats = _requestStats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    def handle_error(exception_context):
+        # a failed query never reaches after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
@@ -0,0 +1,262 @@
+"""
+Server-side quilt images (PNG and SVG) for one city and year
+
+Colors come from lookup tables built once per palette with NumPy, reproducing the client's
+getColorForTemp / getColorForPrecip (WeatherQuilt/index.js) exactly, including its
+Math.round channel rounding and the dynamic temperature range. The daily mean is
+(minTemp + maxTemp) / 2 with whole-degree temperatures, so the temperature table is indexed by
+minTemp + maxTemp and the precipitation table by hundredths of an inch; coloring a year is one
+fancy-indexing pass.
+
+Cells are laid out one per calendar day, QUILT_COLUMNS to a row, like the client's year grid.
+Default-size images (DEFAULT_CELL_PX, DEFAULT_GAP_PX) are written to QUILT_CACHE_DIR under a
+name carrying the city/year data version, so they are rendered once per ingest and every later
+request is one file read. Other sizes are rendered on demand and never cached, so the cache holds
+at most a few files per city and year.
+"""
+
+import datetime
+import functools
+import math
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from db.cache import MISSING_PRECIP, CitySeries
+
+QUILT_CACHE_DIR = os.environ.get("WEATHER_QUILT_CACHE_DIR", "db/quilts")
+
+PNG = "png"
+SVG = "svg"
+IMAGE_FORMATS = (PNG, SVG)
+MEDIA_TYPES = {PNG: "image/png", SVG: "image/svg+xml"}
+
+TEMPERATURE = "temperature"
+PRECIPITATION = "precipitation"
+MODES = (TEMPERATURE, PRECIPITATION)
+
+# the client's year view: 30px patches, 2px gaps on a #d4d4d4 background, numCols = 16
+QUILT_COLUMNS = 16
+DEFAULT_CELL_PX = 30
+DEFAULT_GAP_PX = 2
+BACKGROUND_COLOR = "#d4d4d4"
+PNG_COMPRESSION_LEVEL = 6
+
+# getColorForTemp
+TEMPERATURE_COLORS = (
+    "#0d1b4d", "#1a237e", "#1565C0", "#1976D2", "#2196F3", "#42A5F5", "#64B5F6", "#81C784", "#AED581",
+    "#DCE775", "#FFF176", "#FFD54F", "#FFB74D", "#FF9800", "#F57C00", "#E64A19", "#D32F2F", "#B71C1C"
+)
+FIXED_TEMPERATURE_RANGE = (-20, 110)
+MISSING_TEMPERATURE_COLOR = "#cccccc"
+
+# getColorForPrecip: [inches, color], linear between stops, the last color above the last stop
+PRECIPITATION_STOPS = (
+    (0, "#f5f5f5"), (0.01, "#e3f2fd"), (0.1, "#bbdefb"), (0.25, "#90caf9"), (0.5, "#64b5f6"),
+    (0.75, "#42a5f5"), (1.0, "#2196f3"), (1.5, "#1976d2"), (2.0, "#1565c0"), (3.0, "#0d47a1")
+)
+MISSING_PRECIPITATION_COLOR = "#f5f5f5"
+
+def _rgb(color: str) -> np.ndarray:
+    return np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)], dtype=np.float64)
+
+def _interpolate(lower: np.ndarray, upper: np.ndarray, factor: np.ndarray) -> np.ndarray:
+    # interpolateColor: Math.round(c1 + (c2 - c1) * factor) per channel, halves rounding up
+    channels = lower + (upper - lower) * factor[:, None]
+    return np.floor(channels + 0.5).astype(np.uint8)
+
+@functools.lru_cache(maxsize=64)
+def temperature_lut(low: int, high: int) -> np.ndarray:
+    """
+    (2 * (high - low) + 1, 3) uint8 colors for minTemp + maxTemp = 2 * low .. 2 * high
+    Sums outside that span clamp to the end colors, so clip the index rather than extend the table
+    """
+    mean = np.arange(2 * low, 2 * high + 1) / 2
+    normalized = np.clip((mean - low) / (high - low), 0, 1)
+    color_index = normalized * (len(TEMPERATURE_COLORS) - 1)
+    lower_index = np.floor(color_index).astype(np.intp)
+    upper_index = np.ceil(color_index).astype(np.intp)
+    stops = np.array([_rgb(color) for color in TEMPERATURE_COLORS])
+    return _interpolate(stops[lower_index], stops[upper_index], color_index - lower_index)
+
+@functools.lru_cache(maxsize=1)
+def precipitation_lut() -> np.ndarray:
+    """
+    (301, 3) uint8 colors for 0 .. 3.00 inches in hundredths; more than 3 inches uses the last row
+    """
+    last = round(PRECIPITATION_STOPS[-1][0] * 100)
+    inches = np.arange(last + 1) / 100
+    stop_inches = np.array([stop for stop, _ in PRECIPITATION_STOPS])
+    stop_colors = np.array([_rgb(color) for _, color in PRECIPITATION_STOPS])
+    # the client takes the first segment with p1 <= value <= p2, so a value on a stop ends a segment
+    segment = np.clip(np.searchsorted(stop_inches, inches, side="left") - 1, 0, len(PRECIPITATION_STOPS) - 2)
+    factor = (inches - stop_inches[segment]) / (stop_inches[segment + 1] - stop_inches[segment])
+    return _interpolate(stop_colors[segment], stop_colors[segment + 1], factor)
+
+def dynamic_temperature_range(low_sum: int, high_sum: int):
+    """
+    getTempRange for daily means spanning low_sum / 2 .. high_sum / 2: 5% padding, whole degrees
+    """
+    low, high = low_sum / 2, high_sum / 2
+    buffer = (high - low) * 0.05
+    low, high = math.floor(low - buffer), math.ceil(high + buffer)
+    # a flat year would divide by zero in the client; give it a one-degree span
+    return low, max(high, low + 1)
+
+def year_colors(series: CitySeries, year: int, mode: str, dynamic_range: bool = False):
+    """
+    (days in year, 3) uint8 cell colors from Jan 1, and the temperature range used (or None)
+    Returns (None, None) when the year has no stored days
+    """
+    start = datetime.date(year, 1, 1)
+    end = datetime.date(year, 12, 31)
+    lo, hi = series.bounds(start, end) if series else (0, 0)
+    if lo == hi:
+        return None, None
+    positions = series.ordinals[lo:hi] - start.toordinal()
+    days = end.toordinal() - start.toordinal() + 1
+
+    temperature_range = None
+    if mode == TEMPERATURE:
+        sums = series.minTemp[lo:hi].astype(np.int32) + series.maxTemp[lo:hi]
+        if dynamic_range:
+            temperature_range = dynamic_temperature_range(int(sums.min()), int(sums.max()))
+        else:
+            temperature_range = FIXED_TEMPERATURE_RANGE
+        low, high = temperature_range
+        lut = temperature_lut(low, high)
+        colors = np.empty((days, 3), dtype=np.uint8)
+        colors[:] = _rgb(MISSING_TEMPERATURE_COLOR)
+        colors[positions] = lut[np.clip(sums - 2 * low, 0, len(lut) - 1)]
+    else:
+        lut = precipitation_lut()
+        precip = series.precipHundredths[lo:hi]
+        colors = np.empty((days, 3), dtype=np.uint8)
+        colors[:] = _rgb(MISSING_PRECIPITATION_COLOR)
+        stored = precip != MISSING_PRECIP
+        colors[positions[stored]] = lut[np.minimum(precip[stored], len(lut) - 1)]
+    return colors, temperature_range
+
+def _layout(days: int, cell: int, gap: int):
+    rows = -(-days // QUILT_COLUMNS)
+    width = QUILT_COLUMNS * cell + (QUILT_COLUMNS + 1) * gap
+    height = rows * cell + (rows + 1) * gap
+    return rows, width, height
+
+def _pixel_cells(length: int, cell: int, gap: int, count: int) -> np.ndarray:
+    # cell number under each pixel along one axis, or count for the gaps between cells
+    offset = np.arange(length) - gap
+    stride = cell + gap
+    index = offset // stride
+    inside = (offset >= 0) & (offset % stride < cell) & (index < count)
+    return np.where(inside, index, count)
+
+def render_png(colors: np.ndarray, cell: int = DEFAULT_CELL_PX, gap: int = DEFAULT_GAP_PX) -> bytes:
+    """
+    8-bit RGB PNG of the cell colors laid out QUILT_COLUMNS wide
+    """
+    days = len(colors)
+    rows, width, height = _layout(days, cell, gap)
+    # one extra row and column hold the background, which every gap pixel points at
+    cells = np.empty((rows * QUILT_COLUMNS, 3), dtype=np.uint8)
+    cells[:] = _rgb(BACKGROUND_COLOR)
+    cells[:days] = colors
+    grid = np.empty((rows + 1, QUILT_COLUMNS + 1, 3), dtype=np.uint8)
+    grid[:] = _rgb(BACKGROUND_COLOR)
+    grid[:-1, :-1] = cells.reshape(rows, QUILT_COLUMNS, 3)
+    pixels = grid[_pixel_cells(height, cell, gap, rows)[:, None], _pixel_cells(width, cell, gap, QUILT_COLUMNS)[None, :]]
+
+    # every scanline uses filter type 0 (none)
+    scanlines = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(scanlines.tobytes(), PNG_COMPRESSION_LEVEL)),
+        chunk(b"IEND", b"")
+    ))
+
+def render_svg(colors: np.ndarray, year: int, cell: int = DEFAULT_CELL_PX, gap: int = DEFAULT_GAP_PX) -> bytes:
+    """
+    SVG of the cell colors laid out QUILT_COLUMNS wide, with each day's date as its tooltip
+    """
+    days = len(colors)
+    rows, width, height = _layout(days, cell, gap)
+    fills = ["#%02x%02x%02x" % tuple(color) for color in colors.tolist()]
+    start = datetime.date(year, 1, 1).toordinal()
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" shape-rendering="crispEdges">',
+        f'<rect width="{width}" height="{height}" fill="{BACKGROUND_COLOR}"/>'
+    ]
+    for day, fill in enumerate(fills):
+        row, column = divmod(day, QUILT_COLUMNS)
+        x = gap + column * (cell + gap)
+        y = gap + row * (cell + gap)
+        parts.append(
+            f'<rect x="{x}" y="{y}" width="{cell}" height="{cell}" fill="{fill}">'
+            f'<title>{datetime.date.fromordinal(start + day).isoformat()}</title></rect>'
+        )
+    parts.append("</svg>")
+    return "".join(parts).encode()
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")
+
+class QuiltCache:
+    """
+    Rendered quilts on disk, one file per city/year/variant/data version
+    Writing an image for a new version removes every image of that city/year from other versions
+    """
+
+    def __init__(self, root: str = QUILT_CACHE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _directory(self, city: str, year: int) -> str:
+        return os.path.join(self.root, _slug(city), str(year))
+
+    def path(self, city: str, year: int, variant: str, version: int, image_format: str) -> str:
+        return os.path.join(self._directory(city, year), f"{variant}-v{version}.{image_format}")
+
+    def get(self, city: str, year: int, variant: str, version: int, image_format: str):
+        """
+        The cached image's bytes, or None
+        Read here rather than handed out as a path: a put() for a newer version may remove the file
+        before a response could open it
+        """
+        try:
+            with open(self.path(city, year, variant, version, image_format), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, city: str, year: int, variant: str, version: int, image_format: str, image: bytes) -> str:
+        path = self.path(city, year, variant, version, image_format)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # write then rename, so a concurrent reader never sees a partial image
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            f.write(image)
+        os.replace(temporary, path)
+        with self._lock:
+            current = f"-v{version}."
+            for name in os.listdir(directory):
+                if current not in name and not name.endswith(".tmp"):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except FileNotFoundError:
+                        pass
+        return path
+
+quiltCache = QuiltCache()
@@ -0,0 +1,171 @@
+"""
+Offline station resolution from the persisted ACIS station catalog
+
+One bulk StnMeta request fills the stationCatalog table with every station's location and a
+coverage score computed once at sync time. StationIndex buckets the catalog on a lat/lon grid
+whose cells are as wide as the search box, so resolving the best station for a point reads at
+most 3 x 3 cells in memory instead of making a bounding-box StnMeta request per city.
+"""
+
+import datetime
+import math
+import threading
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import acis
+from db import crud
+
+# half width in degrees of the box searched around a city (the old per-city StnMeta bbox)
+SEARCH_HALF_WIDTH = 0.5
+GRID_CELL_DEGREES = SEARCH_HALF_WIDTH
+
+# coverage scoring: years on record, plus bonuses for a long and a current record
+OPEN_END_YEAR = 2024
+LONG_RECORD_START_YEAR = 2000
+LONG_RECORD_BONUS = 10
+ACTIVE_END_YEAR = 2023
+ACTIVE_BONUS = 5
+
+CATALOG_ELEMS = "pcpn,maxt,mint"
+CATALOG_META = "uid,name,state,sids,ll,valid_daterange"
+
+def coverage_score(valid_daterange):
+    """
+    (start_year, end_year, score) for a StnMeta valid_daterange, or None if it has no usable range
+    """
+    if not valid_daterange or len(valid_daterange) < 2:
+        return None
+    try:
+        start_year = int(valid_daterange[0][0][:4])
+        end_year = int(valid_daterange[-1][1][:4]) if valid_daterange[-1][1] else OPEN_END_YEAR
+    except (TypeError, ValueError, IndexError):
+        return None
+    score = end_year - start_year
+    if start_year <= LONG_RECORD_START_YEAR:
+        score += LONG_RECORD_BONUS
+    if end_year >= ACTIVE_END_YEAR:
+        score += ACTIVE_BONUS
+    return start_year, end_year, score
+
+def catalog_entry(meta: dict):
+    """
+    StationCatalog row for one StnMeta station, or None if it can't be located or scored
+    """
+    coverage = coverage_score(meta.get("valid_daterange"))
+    if coverage is None or not meta.get("sids") or not meta.get("ll") or meta.get("uid") is None:
+        return None
+    lon, lat = meta["ll"]
+    start_year, end_year, score = coverage
+    return {
+        "uid": meta["uid"],
+        "sid": meta["sids"][0],
+        "name": meta.get("name"),
+        "state": meta.get("state"),
+        "lat": lat,
+        "lon": lon,
+        "startYear": start_year,
+        "endYear": end_year,
+        "score": score
+    }
+
+async def fetch_station_catalog(states):
+    """
+    Every station in the given states from a single streamed StnMeta request, as catalog rows
+    """
+    request_body = {
+        "state": ",".join(sorted(states)),
+        "elems": CATALOG_ELEMS,
+        "meta": CATALOG_META
+    }
+    stations = []
+    async for meta in acis.stream_array("/StnMeta", request_body, key="meta", timeout=120.0):
+        entry = catalog_entry(meta)
+        if entry is not None:
+            stations.append(entry)
+    return stations
+
+class StationIndex:
+    """
+    Catalog stations bucketed by GRID_CELL_DEGREES lat/lon cell
+    """
+
+    def __init__(self, stations):
+        self.stations = list(stations)
+        self._cells = {}
+        for index, station in enumerate(self.stations):
+            self._cells.setdefault(self._cell(station["lat"], station["lon"]), []).append(index)
+
+    def __len__(self):
+        return len(self.stations)
+
+    @staticmethod
+    def _cell(lat: float, lon: float):
+        return math.floor(lat / GRID_CELL_DEGREES), math.floor(lon / GRID_CELL_DEGREES)
+
+    def best_station(self, lat: float, lon: float, half_width: float = SEARCH_HALF_WIDTH):
+        """
+        Highest-scoring station within +/- half_width degrees of (lat, lon), nearest first on ties
+        Returns the catalog row dict, or None
+        """
+        low_lat, low_lon = self._cell(lat - half_width, lon - half_width)
+        high_lat, high_lon = self._cell(lat + half_width, lon + half_width)
+        best = None
+        best_key = None
+        for cell_lat in range(low_lat, high_lat + 1):
+            for cell_lon in range(low_lon, high_lon + 1):
+                for index in self._cells.get((cell_lat, cell_lon), ()):
+                    station = self.stations[index]
+                    if abs(station["lat"] - lat) > half_width or abs(station["lon"] - lon) > half_width:
+                        continue
+                    if station["score"] <= 0:
+                        continue
+                    key = (-station["score"], (station["lat"] - lat) ** 2 + (station["lon"] - lon) ** 2)
+                    if best_key is None or key < best_key:
+                        best, best_key = station, key
+        return best
+
+class StationIndexCache:
+    """
+    The StationIndex for the current catalog, rebuilt from the database after a sync
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> StationIndex:
+        index = StationIndex(
+            {
+                "uid": row.uid,
+                "sid": row.sid,
+                "name": row.name,
+                "state": row.state,
+                "lat": row.lat,
+                "lon": row.lon,
+                "startYear": row.startYear,
+                "endYear": row.endYear,
+                "score": row.score
+            }
+            for row in crud.getStationCatalog(db)
+        )
+        with self._lock:
+            self._index = index
+        return index
+
+    def get(self):
+        # None until load() has run; an empty index means the catalog hasn't been synced yet
+        with self._lock:
+            return self._index
+
+async def sync_station_catalog(db: Session, states) -> int:
+    """
+    Refill the station catalog from ACIS and swap in the rebuilt index. Returns the station count
+    """
+    stations = await fetch_station_catalog(states)
+    count = await run_in_threadpool(crud.replaceStationCatalog, db, stations, datetime.datetime.utcnow())
+    await run_in_threadpool(stationIndex.load, db)
+    return count
+
+stationIndex = StationIndexCache()
@@ -0,0 +1,106 @@
+"""
+Shared fixtures: the local ACIS stand-in (benchmarks.fake_acis) served in-process, and the app
+running from a scratch working directory
+
+Run from the server directory:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import acis
+from benchmarks import fake_acis
+
+class FakeACIS(httpx.AsyncBaseTransport):
+    """
+    httpx transport answering ACIS requests from benchmarks.fake_acis, recording the path of
+    every request it receives
+
+    failures maps a path to the responses served before the stand-in's own, in order: an HTTP
+    status code, or "truncate" for the stand-in's body cut off halfway. Sids in omit_sids are
+    dropped from MultiStnData requests, so the batch response leaves those stations out.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failures = {}
+        self.omit_sids = set()
+        self._transport = httpx.ASGITransport(app=fake_acis.create_app())
+
+    def count(self, path: str) -> int:
+        return self.requests.count(path)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append(path)
+        failures = self.failures.get(path)
+        failure = failures.pop(0) if failures else None
+        if isinstance(failure, int):
+            return httpx.Response(failure, json={"error": "injected failure"}, request=request)
+        if path == "/MultiStnData" and self.omit_sids:
+            body = json.loads(request.content)
+            body["sids"] = ",".join(sid for sid in body["sids"].split(",") if sid not in self.omit_sids)
+            request = httpx.Request(request.method, request.url, json=body)
+        response = await self._transport.handle_async_request(request)
+        if failure == "truncate":
+            content = await response.aread()
+            return httpx.Response(response.status_code, content=content[:len(content) // 2], request=request)
+        return response
+
+@pytest.fixture
+def fake_acis_transport(monkeypatch):
+    # retries go straight through instead of sleeping out the backoff
+    monkeypatch.setattr(acis, "BACKOFF_BASE", 0)
+    return FakeACIS()
+
+@pytest.fixture
+def run_with_acis(fake_acis_transport):
+    """
+    Run a coroutine function with the shared ACIS client pointed at the stand-in
+    """
+    def run(coroutine_function):
+        async def run_coroutine():
+            await acis.start_client(base_url="http://acis.test", transport=fake_acis_transport)
+            try:
+                return await coroutine_function()
+            finally:
+                await acis.close_client()
+        return asyncio.run(run_coroutine())
+    return run
+
+@pytest.fixture(scope="session")
+def app_main(tmp_path_factory):
+    """
+    The main module, imported in a scratch working directory (the app resolves db/ and static/
+    relative to it, as in benchmarks.suite) with its schema created
+    SQLAlchemy fixes the database path when db.database creates its engines, so test modules reach
+    the db package through this module (app_main.crud, ...) rather than importing it themselves
+    """
+    workdir = tmp_path_factory.mktemp("weatherquilt")
+    (workdir / "db").mkdir()
+    (workdir / "static" / "static").mkdir(parents=True)
+    (workdir / "static" / "index.html").write_text("<html></html>")
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+        from db import migrations, models
+        from db.database import engine
+        connection = engine.raw_connection()
+        try:
+            migrations.migrateSchema(connection)
+        finally:
+            connection.close()
+        models.Base.metadata.create_all(bind=engine)
+        yield main
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,94 @@
+"""
+The shared ACIS client against the local ACIS stand-in: retries, the retry budget and streamed
+responses
+"""
+
+import httpx
+import pytest
+
+import acis
+
+BODY = {"sid": "ANCthr 9", "sDate": "2024-01-01", "eDate": "2024-01-31"}
+
+@pytest.fixture
+def backoff_ceilings(monkeypatch):
+    # the upper bound of every jittered delay drawn, which must start at zero (full jitter)
+    ceilings = []
+    def uniform(low, high):
+        assert low == 0
+        ceilings.append(high)
+        return 0
+    monkeypatch.setattr(acis.random, "uniform", uniform)
+    return ceilings
+
+async def collect(path: str, body: dict, members: dict = None) -> list:
+    return [row async for row in acis.stream_array(path, body, members=members)]
+
+def test_post_retries_5xx(run_with_acis, fake_acis_transport, backoff_ceilings):
+    fake_acis_transport.failures["/StnData"] = [503, 502]
+    result = run_with_acis(lambda: acis.post("/StnData", BODY))
+    assert len(result["data"]) == 31
+    assert fake_acis_transport.count("/StnData") == 3
+    assert backoff_ceilings == [0, 0]
+
+def test_backoff_is_capped_full_jitter(monkeypatch, backoff_ceilings):
+    monkeypatch.setattr(acis, "BACKOFF_BASE", 0.5)
+    for attempt in range(8):
+        acis._backoff(attempt)
+    assert backoff_ceilings == [0.5, 1.0, 2.0, 4.0, 8.0, acis.BACKOFF_MAX, acis.BACKOFF_MAX, acis.BACKOFF_MAX]
+
+def test_post_gives_up_after_retry_budget(run_with_acis, fake_acis_transport, backoff_ceilings):
+    fake_acis_transport.failures["/StnData"] = [503] * (acis.MAX_RETRIES + 1)
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with_acis(lambda: acis.post("/StnData", BODY))
+    assert fake_acis_transport.count("/StnData") == acis.MAX_RETRIES + 1
+    assert len(backoff_ceilings) == acis.MAX_RETRIES
+
+def test_post_does_not_retry_client_errors(run_with_acis, fake_acis_transport, backoff_ceilings):
+    fake_acis_transport.failures["/StnData"] = [400]
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with_acis(lambda: acis.post("/StnData", BODY))
+    assert fake_acis_transport.count("/StnData") == 1
+    assert backoff_ceilings == []
+
+def test_stream_array_retries_5xx(run_with_acis, fake_acis_transport, backoff_ceilings):
+    fake_acis_transport.failures["/StnData"] = [500]
+    members = {}
+    rows = run_with_acis(lambda: collect("/StnData", BODY, members))
+    assert [row[0] for row in rows[:2]] == ["2024-01-01", "2024-01-02"]
+    assert len(rows) == 31
+    assert members["meta"]["sids"] == ["ANCthr 9"]
+    assert fake_acis_transport.count("/StnData") == 2
+
+def test_stream_array_gives_up_after_retry_budget(run_with_acis, fake_acis_transport, backoff_ceilings):
+    fake_acis_transport.failures["/StnData"] = [503] * (acis.MAX_RETRIES + 1)
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with_acis(lambda: collect("/StnData", BODY))
+    assert fake_acis_transport.count("/StnData") == acis.MAX_RETRIES + 1
+
+def test_stream_array_detects_truncated_response(run_with_acis, fake_acis_transport):
+    fake_acis_transport.failures["/StnData"] = ["truncate"]
+    with pytest.raises(ValueError, match="Truncated"):
+        run_with_acis(lambda: collect("/StnData", BODY))
+
+def test_parser_yields_elements_across_chunks():
+    text = '{"meta": {"sids": ["ANCthr 9"]}, "data": [["2024-01-01", ["12", 24]], ["2024-01-02", ["-3", 24]]]}'
+    parser = acis.ArrayStreamParser("data")
+    rows = []
+    for offset in range(0, len(text), 7):
+        rows.extend(parser.feed(text[offset:offset + 7]))
+    rows.extend(parser.close())
+    assert rows == [["2024-01-01", ["12", 24]], ["2024-01-02", ["-3", 24]]]
+    assert parser.members == {"meta": {"sids": ["ANCthr 9"]}}
+
+def test_parser_detects_truncation():
+    parser = acis.ArrayStreamParser("data")
+    assert parser.feed('{"data": [["2024-01-01", ["12", 24]], ["2024-01') == [["2024-01-01", ["12", 24]]]
+    with pytest.raises(ValueError, match="Truncated"):
+        parser.close()
+
+def test_parser_reports_acis_error():
+    parser = acis.ArrayStreamParser("data")
+    parser.feed('{"error": "unknown sid"}')
+    with pytest.raises(ValueError, match="unknown sid"):
+        parser.close()
@@ -0,0 +1,93 @@
+"""
+Batched incremental syncs (main.ingest_cities with batch=True) against the local ACIS stand-in
+"""
+
+import datetime
+
+import pytest
+
+from db.cities import US_CAPITALS
+
+START = datetime.date(2024, 6, 1)
+
+def window(days: int) -> tuple:
+    return (START.isoformat(), (START + datetime.timedelta(days=days - 1)).isoformat())
+
+def cities(count: int) -> list:
+    return sorted(city for city, info in US_CAPITALS.items() if info["station_id"])[:count]
+
+def stored_days(result: dict) -> int:
+    return result["records_added"] + result["records_updated"] + result["records_skipped"]
+
+@pytest.fixture
+def ingest(app_main, run_with_acis):
+    def run(date_ranges: dict):
+        db = app_main.SessionLocal()
+        try:
+            return run_with_acis(lambda: app_main.ingest_cities(db, date_ranges, 8, 30.0, batch=True))
+        finally:
+            db.close()
+    return run
+
+def sync_state(app_main, city: str, station_id: str):
+    db = app_main.SessionLocal()
+    try:
+        return app_main.crud.getSyncState(db, city, station_id)
+    finally:
+        db.close()
+
+def test_short_windows_share_one_request(ingest, fake_acis_transport):
+    date_ranges = {city: window(10) for city in cities(5)}
+    results = ingest(date_ranges)
+    assert fake_acis_transport.count("/MultiStnData") == 1
+    assert fake_acis_transport.count("/StnData") == 0
+    for city in date_ranges:
+        assert results[city]["status"] == "success"
+        assert stored_days(results[city]) == 10
+
+def test_one_request_per_batch(ingest, fake_acis_transport, app_main, monkeypatch):
+    monkeypatch.setattr(app_main, "MULTI_STN_MAX_STATIONS", 2)
+    long_city, *short_cities = cities(5)
+    date_ranges = {city: window(10) for city in short_cities}
+    date_ranges[long_city] = window(app_main.MULTI_STN_MAX_DAYS + 1)
+    results = ingest(date_ranges)
+    # four short windows in batches of two, and the long window on its own
+    assert fake_acis_transport.count("/MultiStnData") == 2
+    assert fake_acis_transport.count("/StnData") == 1
+    assert stored_days(results[long_city]) == app_main.MULTI_STN_MAX_DAYS + 1
+    for city in short_cities:
+        assert stored_days(results[city]) == 10
+
+def test_station_missing_from_batch_is_fetched_alone(ingest, fake_acis_transport, app_main):
+    date_ranges = {city: window(10) for city in cities(3)}
+    omitted = list(date_ranges)[1]
+    fake_acis_transport.omit_sids.add(US_CAPITALS[omitted]["station_id"])
+    results = ingest(date_ranges)
+    assert fake_acis_transport.count("/MultiStnData") == 1
+    assert fake_acis_transport.count("/StnData") == 1
+    assert results[omitted]["status"] == "success"
+    assert stored_days(results[omitted]) == 10
+
+def test_station_unknown_to_acis_fails(ingest, fake_acis_transport, app_main, monkeypatch):
+    date_ranges = {city: window(10) for city in cities(3)}
+    unknown = list(date_ranges)[2]
+    monkeypatch.setitem(US_CAPITALS[unknown], "station_id", "NOSUCH 9")
+    results = ingest(date_ranges)
+    assert fake_acis_transport.count("/MultiStnData") == 1
+    assert fake_acis_transport.count("/StnData") == 1
+    assert results[unknown]["status"] == "error"
+    state = sync_state(app_main, unknown, "NOSUCH 9")
+    assert state.lastError
+    assert state.lastSuccess is None
+    for city in list(date_ranges)[:2]:
+        assert results[city]["status"] == "success"
+
+def test_failed_batch_falls_back_to_single_fetches(ingest, fake_acis_transport, app_main):
+    date_ranges = {city: window(10) for city in cities(3)}
+    fake_acis_transport.failures["/MultiStnData"] = [503] * (app_main.acis.MAX_RETRIES + 1)
+    results = ingest(date_ranges)
+    assert fake_acis_transport.count("/MultiStnData") == app_main.acis.MAX_RETRIES + 1
+    assert fake_acis_transport.count("/StnData") == 3
+    for city in date_ranges:
+        assert results[city]["status"] == "success"
+        assert stored_days(results[city]) == 10
@@ -0,0 +1,11 @@
+"""
+The /metrics endpoint as a Prometheus scrape target
+"""
+
+from fastapi.testclient import TestClient
+
+def test_metrics_content_type(app_main):
+    response = TestClient(app_main.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert "# TYPE weatherquilt_http_requests counter" in response.text
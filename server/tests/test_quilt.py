@@ -0,0 +1,12 @@
+"""
+The on-disk quilt render cache
+"""
+
+def test_cache_serves_bytes_until_a_newer_version_replaces_them(app_main, tmp_path):
+    cache = app_main.quilt.QuiltCache(str(tmp_path))
+    cache.put("Juneau, AK", 2024, "temperature-fixed", 1, "png", b"first")
+    assert cache.get("Juneau, AK", 2024, "temperature-fixed", 1, "png") == b"first"
+    cache.put("Juneau, AK", 2024, "temperature-fixed", 2, "png", b"second")
+    # the older version's file is gone, so a request still holding version 1 renders afresh
+    assert cache.get("Juneau, AK", 2024, "temperature-fixed", 1, "png") is None
+    assert cache.get("Juneau, AK", 2024, "temperature-fixed", 2, "png") == b"second"